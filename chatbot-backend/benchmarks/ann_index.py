@@ -0,0 +1,160 @@
+"""
+Recall@k, queries/s and memory of the memory-mapped int8 HNSW index (ann_index.py) against the
+embedded Chroma store.
+
+Embeddings are synthetic: --dim dimensional vectors with a low-rank structure plus noise, which
+like real text embeddings have a much lower intrinsic dimension than their length, grouped
+around --clusters topics as chunks of one source are (0 for no clusters). For each
+size both backends index the same chunks. Then --processes spawned processes per backend open the
+collection at the same time, like server workers, and each runs --queries searches. Reported per
+backend: recall@k against exact search, queries/s of one process, and per process the growth in
+resident memory (RSS) and in proportional memory (PSS, shared pages divided between the
+processes that map them) from opening the collection and searching it. Run from chatbot-backend/:
+
+    python -m benchmarks.ann_index
+    python -m benchmarks.ann_index --sizes 10000,50000 --processes 4 --k 10
+    python -m benchmarks.ann_index --clusters 0 --backends mmap
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.core.ann_index import AnnConnection
+from src.core.vectorstore import EmbeddedChroma
+
+COLLECTION = "bench"
+CHROMA_BATCH = 5000
+
+
+class TableEmbedding(Embeddings):
+    """Looks up precomputed vectors: "chunk-<i>" and "query-<i>" rows of two .npy files."""
+
+    def __init__(self, directory):
+        self.chunks = np.load(Path(directory) / "chunks.npy", mmap_mode="r")
+        self.queries = np.load(Path(directory) / "queries.npy", mmap_mode="r")
+
+    def _vector(self, text):
+        kind, row = text.split("-")
+        return (self.chunks if kind == "chunk" else self.queries)[int(row)].tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def make_vectors(count, queries, dim, rank, seed, clusters=0, spread=0.15):
+    rng = np.random.default_rng(seed)
+    basis = rng.normal(size=(rank, dim)).astype(np.float32)
+    centres = rng.normal(size=(clusters, rank)).astype(np.float32)
+
+    def latent(rows):
+        if not clusters:
+            return rng.normal(size=(rows, rank)).astype(np.float32)
+        return centres[rng.integers(0, clusters, rows)] + spread * rng.normal(size=(rows, rank)).astype(np.float32)
+
+    chunks = latent(count) @ basis
+    chunks += 0.3 * rng.normal(size=chunks.shape).astype(np.float32)
+    return chunks, latent(queries) @ basis
+
+
+def memory_kb():
+    fields = {}
+    for line in Path("/proc/self/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0])
+    return fields["Rss"], fields["Pss"]
+
+
+def connect(mode, data_dir, store_dir):
+    embeddings = TableEmbedding(data_dir)
+    if mode == "chroma":
+        return EmbeddedChroma(embeddings, store_dir)
+    return AnnConnection(embeddings, store_dir)
+
+
+def searcher(mode, data_dir, store_dir, queries, k, barrier, results):
+    """One worker-like process: open the collection, search, report recall, speed and memory."""
+    connection = connect(mode, data_dir, store_dir)
+    truth = np.load(Path(data_dir) / "truth.npy")
+    rss_before, pss_before = memory_kb()
+    store = connection.collection(COLLECTION)
+    start = time.perf_counter()
+    hits = 0
+    for i in range(queries):
+        docs = store.similarity_search(f"query-{i}", k=k)
+        found = {int(doc.page_content.split("-")[1]) for doc in docs}
+        hits += len(found & set(truth[i, :k].tolist()))
+    elapsed = time.perf_counter() - start
+    barrier.wait()  # every process has its collection open when memory is read
+    rss, pss = memory_kb()
+    results.put((hits / (queries * k), queries / elapsed, (rss - rss_before) / 1024, (pss - pss_before) / 1024))
+    barrier.wait()
+
+
+def build(mode, connection, documents):
+    if mode == "mmap":
+        connection.create_collection(COLLECTION, documents)
+        return
+    # Chroma limits how many records one call may add.
+    store = connection.create_collection(COLLECTION, documents[:CHROMA_BATCH])
+    for start in range(CHROMA_BATCH, len(documents), CHROMA_BATCH):
+        store.add_documents(documents[start:start + CHROMA_BATCH])
+
+
+def run(mode, data_dir, store_dir, args):
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(args.processes), context.Queue()
+    processes = [context.Process(target=searcher, args=(mode, data_dir, store_dir, args.queries, args.k, barrier, results))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    measured = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    recall, qps, rss, pss = (float(np.mean(column)) for column in zip(*measured))
+    print(f"  {mode:<8} recall@{args.k} {recall:6.3f}   {qps:8.1f} q/s per process   "
+          f"per process: RSS +{rss:7.1f} MiB, PSS +{pss:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="5000,20000", help="chunks per run")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--rank", type=int, default=32, help="intrinsic dimension of the synthetic embeddings")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--clusters", type=int, default=50, help="topics the embeddings are grouped around (0: none)")
+    parser.add_argument("--backends", default="chroma,mmap")
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as store_dir:
+            chunks, queries = make_vectors(size, args.queries, args.dim, args.rank, seed=size, clusters=args.clusters)
+            np.save(Path(data_dir) / "chunks.npy", chunks)
+            np.save(Path(data_dir) / "queries.npy", queries)
+            norms = np.einsum("ij,ij->i", chunks, chunks)
+            truth = np.stack([np.argsort(norms - 2 * chunks @ q)[:args.k] for q in queries])
+            np.save(Path(data_dir) / "truth.npy", truth)
+            documents = [Document(page_content=f"chunk-{i}", metadata={"track": "General"}) for i in range(size)]
+
+            print(f"{size} chunks of dimension {args.dim} in {args.clusters or 'no'} clusters, "
+                  f"{args.processes} processes:")
+            for mode in args.backends.split(","):
+                start = time.perf_counter()
+                build(mode, connect(mode, data_dir, store_dir), documents)
+                print(f"  {mode:<8} built in {time.perf_counter() - start:.1f}s")
+                run(mode, data_dir, store_dir, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cohort queries: scanning every LearningAnalyzer profile vs the incremental CohortAnalytics counters.
+
+Synthetic students log interactions on a fixed set of topics (a share of them "correct").
+For each cohort size, the time to answer "top struggling topics + completion rate per topic"
+is measured both ways, plus the per-event cost the counters add to log_performance.
+Run from chatbot-backend/:
+
+    python -m benchmarks.cohort_analytics
+    python -m benchmarks.cohort_analytics --students 1000,10000 --topics 500
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import time
+from collections import Counter
+
+from src.core.analytics import CohortAnalytics
+from src.core.components import LearningAnalyzer
+
+
+def scan_profiles(analyzer, top):
+    """What a cohort view costs without the counters: one pass over every profile."""
+    students, completed, struggling = Counter(), Counter(), Counter()
+    for profile in analyzer.student_data.values():
+        done, stuck = profile["completed_quizzes"], profile["struggling_topics"]
+        completed.update(done)
+        struggling.update(stuck)
+        students.update(set(done) | set(stuck))
+    rates = {topic: completed[topic] / count for topic, count in students.items()}
+    return struggling.most_common(top), rates
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", default="1000,10000,100000")
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--events", type=int, default=10, help="interactions per student")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    topics = [f"topic-{i}" for i in range(args.topics)]
+    for size in (int(s) for s in args.students.split(",")):
+        analyzer = LearningAnalyzer()
+        cohort = CohortAnalytics()
+        analyzer.add_listener(cohort.record)
+        events = [(f"user-{u}", rng.choice(topics), "correct" if rng.random() < 0.6 else "incorrect")
+                  for u in range(size) for _ in range(args.events)]
+
+        # The analyzer prints every update; keep that out of the timings and the terminal.
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for user_id, topic, performance in events:
+                analyzer._update_profile(user_id, topic, performance)
+            with_counters = time.perf_counter() - start
+            analyzer.listeners.clear()
+            plain = LearningAnalyzer()
+            start = time.perf_counter()
+            for user_id, topic, performance in events:
+                plain._update_profile(user_id, topic, performance)
+            without_counters = time.perf_counter() - start
+
+        scan = timed(lambda: scan_profiles(analyzer, 5), args.repeats)
+        counters = timed(lambda: (cohort.top_struggling(5), cohort.topic_stats()), args.repeats)
+        overhead_us = (with_counters - without_counters) / len(events) * 1e6
+        print(f"{size:>7} students, {len(events):>8} events: scan {scan:8.2f} ms   "
+              f"counters {counters:6.2f} ms   ({scan / counters:6.1f}x)   "
+              f"logging overhead {overhead_us:5.1f} us/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Throughput and yield of the extractive generator (services/extractive.py), which builds
+flashcards, cloze practice questions and definition MCQs from retrieved chunks without an LLM.
+
+The .txt files in knowledge/ are cut into chunks of about --chunk-chars characters. Each request
+takes --k neighbouring chunks, as a retrieval for one topic would, and asks for --items items of
+each kind. Reported: requests/s, items/s, how many of the requested items each kind produced on
+average, and one sample item of each kind. Run from chatbot-backend/:
+
+    python -m benchmarks.extractive_generation
+    python -m benchmarks.extractive_generation --requests 500 --items 20 --k 12
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from src.core.services.extractive import ExtractiveGenerator, split_sentences
+
+KNOWLEDGE = Path(__file__).resolve().parent.parent / "knowledge"
+
+
+def load_chunks(chunk_chars):
+    chunks = []
+    for path in sorted(KNOWLEDGE.glob("*.txt")):
+        current = ""
+        for sentence in split_sentences(path.read_text(encoding="utf-8", errors="ignore")):
+            if current and len(current) + len(sentence) > chunk_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--items", type=int, default=10, help="items of each kind per request")
+    parser.add_argument("--k", type=int, default=8, help="chunks per request")
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.chunk_chars)
+    windows = max(1, len(chunks) - args.k + 1)
+    print(f"{len(chunks)} chunks from {KNOWLEDGE.name}/, {args.k} per request, {args.items} items of each kind:")
+
+    produced = {"flashcards": 0, "practice": 0, "quiz": 0}
+    samples = {}
+    start = time.perf_counter()
+    for request in range(args.requests):
+        first = (request * 7) % windows
+        generator = ExtractiveGenerator(chunks[first:first + args.k], seed=request)
+        for kind, items in (("flashcards", generator.flashcards(args.items)),
+                            ("practice", generator.practice(args.items)),
+                            ("quiz", generator.quiz_questions(args.items))):
+            produced[kind] += len(items)
+            if items and kind not in samples:
+                samples[kind] = items[0]
+    elapsed = time.perf_counter() - start
+
+    total = sum(produced.values())
+    print(f"  {args.requests / elapsed:8.1f} requests/s   {total / elapsed:8.1f} items/s")
+    for kind, count in produced.items():
+        print(f"  {kind:<10} {count / args.requests:5.1f} of {args.items} per request")
+    for kind, item in samples.items():
+        print(f"\n{kind} sample:\n  {item.dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Time to generate 10-, 25- and 50-question quizzes with one LLM call against concurrent shards
+(fanout.py).
+
+The model is simulated: each call waits --latency-ms before its first token, then streams about
+--tokens-per-question tokens per question at --tokens-per-s, like a hosted model whose generation
+time grows with output length. Concurrent calls run in parallel, as they do against a provider.
+Questions are written about the chunks named in the prompt, and each call also writes one
+generic question about the topic, which the shards repeat; deduplication removes the repeats and
+a top-up round, which avoids the questions already kept, replaces them. Reported per
+size: wall time, model calls, questions generated and questions returned. Run from
+chatbot-backend/:
+
+    python -m benchmarks.fanout_generation
+    python -m benchmarks.fanout_generation --sizes 10,50 --workers 8 --tokens-per-s 300
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+
+from langchain_core.documents import Document
+
+from src.core.services.fanout import CHUNKS_PER_SHARD, fan_out, shard_notes, shard_sizes
+from src.core.services.quiz_stream import QuizStreamStats, stream_quiz_questions
+
+CHARS_PER_TOKEN = 4
+
+
+class SimulatedLLM:
+    def __init__(self, latency_ms, tokens_per_s, tokens_per_question):
+        self.latency = latency_ms / 1000
+        self.chunk_delay = CHARS_PER_TOKEN / tokens_per_s
+        self.tokens_per_question = tokens_per_question
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.questions = 0
+
+    def _question(self, text):
+        padding = "detail " * max(0, (self.tokens_per_question * CHARS_PER_TOKEN - 160) // 7)
+        return {
+            "question": text,
+            "options": [{"label": label, "text": f"Option {label}"} for label in "ABCD"],
+            "correct_label": "B",
+            "explanation": padding,
+        }
+
+    def stream(self, prompt):
+        n = int(re.search(r"Number of questions: (\d+)", prompt).group(1))
+        chunks = re.findall(r"chunk-\d+", prompt.split("Already covered")[0]) or ["the topic"]
+        covered = set(prompt.split("do not repeat: ")[1].split("\n")[0].split(" | ")) if "do not repeat: " in prompt else set()
+        texts, step = [], 0
+        candidates = ["Which statement best defines the topic as a whole?"]
+        while len(texts) < n:
+            text = candidates.pop() if candidates else f"What does {chunks[step % len(chunks)]} explain in step {step}?"
+            step += 1
+            if text not in covered:
+                texts.append(text)
+        questions = [self._question(text) for text in texts]
+        with self.lock:
+            self.calls += 1
+            self.questions += len(questions)
+        text = json.dumps({"title": "Quiz", "questions": questions})
+        time.sleep(self.latency)
+        for start in range(0, len(text), CHARS_PER_TOKEN * 16):
+            time.sleep(self.chunk_delay * 16)
+            yield text[start:start + CHARS_PER_TOKEN * 16]
+
+
+def single(llm, n, documents, args):
+    notes = "Base every item on this material only:\n" + "\n\n".join(d.page_content for d in documents)
+    return list(stream_quiz_questions(llm, "Bench", n, notes=notes, stats=QuizStreamStats()))
+
+
+def sharded(llm, n, documents, args):
+    notes = shard_notes(documents, len(shard_sizes(n, args.shard_size)))
+    produce = lambda count, shard_note: stream_quiz_questions(llm, "Bench", count, notes=shard_note,
+                                                              stats=QuizStreamStats())
+    return list(fan_out(produce, n, notes, lambda q: q.question, workers=args.workers, size=args.shard_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,25,50")
+    parser.add_argument("--shard-size", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-s", type=float, default=2000.0)
+    parser.add_argument("--tokens-per-question", type=int, default=120)
+    args = parser.parse_args()
+
+    for n in (int(s) for s in args.sizes.split(",")):
+        shards = len(shard_sizes(n, args.shard_size))
+        documents = [Document(page_content=f"chunk-{i}") for i in range(shards * CHUNKS_PER_SHARD)]
+        print(f"{n} questions ({shards} shards of at most {args.shard_size}, {args.workers} workers):")
+        timings = {}
+        for name, strategy in (("single", single), ("fan-out", sharded)):
+            llm = SimulatedLLM(args.latency_ms, args.tokens_per_s, args.tokens_per_question)
+            start = time.perf_counter()
+            questions = strategy(llm, n, documents, args)
+            timings[name] = time.perf_counter() - start
+            print(f"  {name:<8} {timings[name]:6.2f}s   {llm.calls:3d} calls   {llm.questions:3d} generated   "
+                  f"{len(questions):3d} returned")
+        print(f"  speedup  {timings['single'] / timings['fan-out']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
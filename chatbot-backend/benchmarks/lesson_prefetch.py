@@ -0,0 +1,128 @@
+"""
+Adaptive-lesson latency with and without background prefetch (prefetch.py).
+
+Simulated students alternate chat turns and clicks on "next lesson"; both queue a prefetch, as
+the chat and adaptive routes do. Generating a lesson sleeps --generate-ms, like an LLM call.
+After each chat turn the student thinks for --think-ms before clicking, and with probability
+--change-rate they change their profile (a quiz answer, say) at some point of that time, which
+makes the prefetched lesson outdated and queues a new one. Reported per mode: click latency
+(p50, p95), lessons generated, hit rate and wasted rate. Run from chatbot-backend/:
+
+    python -m benchmarks.lesson_prefetch
+    python -m benchmarks.lesson_prefetch --students 50 --change-rate 0.5 --workers 2
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from src.core.prefetch import LessonPrefetcher
+
+
+class Students:
+    """Per-student lesson position and profile version, as the scheduler and analyzer keep them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lesson = {}
+        self.version = {}
+
+    def next_request(self, user_id):
+        with self.lock:
+            return f"explain topic {self.lesson.get(user_id, 0)} to me in detail."
+
+    def profile_version(self, user_id):
+        with self.lock:
+            return self.version.get(user_id, 0)
+
+    def changed(self, user_id):
+        with self.lock:
+            self.version[user_id] = self.version.get(user_id, 0) + 1
+
+    def advance(self, user_id):
+        with self.lock:
+            self.lesson[user_id] = self.lesson.get(user_id, 0) + 1
+            self.version[user_id] = self.version.get(user_id, 0) + 1
+
+
+def run(args, prefetch):
+    students = Students()
+    generated = []
+
+    def generate(request):
+        time.sleep(args.generate_ms / 1000)
+        generated.append(request)
+        return ("TUTORING", {"text": request}, "tutoring_requested")
+
+    prefetcher = LessonPrefetcher(students.next_request, generate, students.profile_version,
+                                  workers=args.workers, enabled=prefetch)
+    latencies = []
+    lock = threading.Lock()
+
+    def student(index):
+        user_id = f"student-{index}"
+        rng = random.Random(index)
+        for _ in range(args.lessons):
+            # Chat turn; the prefetch is queued once its response is sent.
+            prefetcher.schedule(user_id)
+            think = args.think_ms / 1000 * rng.uniform(0.5, 1.5)
+            if rng.random() < args.change_rate:
+                # The change lands anywhere in the think time, possibly while the prefetch is running.
+                before = think * rng.random()
+                time.sleep(before)
+                students.changed(user_id)
+                prefetcher.invalidate(user_id, "", "", {"completed": True, "struggling": False})
+                prefetcher.schedule(user_id)
+                think -= before
+            time.sleep(think)
+            # Click on the next lesson.
+            start = time.perf_counter()
+            request = students.next_request(user_id)
+            if prefetcher.take(user_id, request) is None:
+                generate(request)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            students.advance(user_id)
+            # The adaptive route queues the lesson after this one once it has responded.
+            prefetcher.schedule(user_id)
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(args.students)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(args.generate_ms / 1000 * 2)
+    latencies.sort()
+    stats = prefetcher.to_dict()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "generated": len(generated),
+        "hit_rate": stats["hit_rate"],
+        "wasted_rate": stats["wasted_rate"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--lessons", type=int, default=5, help="clicks per student")
+    parser.add_argument("--generate-ms", type=float, default=400)
+    parser.add_argument("--think-ms", type=float, default=1500)
+    parser.add_argument("--change-rate", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=4, help="background prefetch workers")
+    args = parser.parse_args()
+
+    print(f"{args.students} students x {args.lessons} lessons, generation {args.generate_ms:.0f} ms, "
+          f"think time {args.think_ms:.0f} ms, profile changes before {args.change_rate:.0%} of clicks")
+    print(f"{'mode':<12}{'p50 ms':>10}{'p95 ms':>10}{'generated':>11}{'hit rate':>10}{'wasted':>9}")
+    for name, prefetch in (("on demand", False), ("prefetch", True)):
+        result = run(args, prefetch)
+        print(f"{name:<12}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['generated']:>11}"
+              f"{result['hit_rate']:>10.0%}{result['wasted_rate']:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
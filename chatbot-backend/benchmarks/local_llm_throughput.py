@@ -0,0 +1,88 @@
+"""
+Throughput and latency of the local inference backend at several batch sizes.
+
+All requests are submitted at once (as if that many students asked at the same moment);
+the DynamicBatcher groups them into batches of at most --batch-sizes. Run from chatbot-backend/:
+
+    python -m benchmarks.local_llm_throughput --requests 32 --max-new-tokens 64
+    python -m benchmarks.local_llm_throughput --model sshleifer/tiny-gpt2 --adapter none   # quick smoke run
+"""
+
+import argparse
+import statistics
+import time
+
+from src.core.local_llm import (
+    DEFAULT_ADAPTER_PATH,
+    DEFAULT_MODEL_NAME,
+    INSTRUCTION_TEMPLATE,
+    DynamicBatcher,
+    LocalInferenceEngine,
+)
+
+PROMPTS = [
+    "Explain the topic of RAG within Curriculum in a clear, encouraging tone.",
+    "Create one quiz question about React State at a Beginner difficulty level.",
+    "Explain Express Middleware to a career switcher.",
+    "What is the difference between low and high fidelity prototypes?",
+    "Explain the Transformer attention mechanism in simple terms.",
+    "Create one quiz question about MongoDB query operators.",
+    "Explain WCAG's POUR principles with an example.",
+    "What is few-shot prompting and when is it useful?",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(engine, batch_size, num_requests, max_new_tokens, max_wait_ms):
+    batcher = DynamicBatcher(engine, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    latencies = []
+
+    def record(start):
+        return lambda _future: latencies.append(time.perf_counter() - start)
+
+    begin = time.perf_counter()
+    futures = []
+    for i in range(num_requests):
+        prompt = INSTRUCTION_TEMPLATE.format(prompt=PROMPTS[i % len(PROMPTS)])
+        future = batcher.submit(prompt, max_new_tokens)
+        future.add_done_callback(record(time.perf_counter()))
+        futures.append(future)
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - begin
+
+    stats = batcher.stats
+    print(f"batch<={batch_size:<3} req/s {num_requests / elapsed:7.2f}   "
+          f"gen tok/s {stats['generated_tokens'] / elapsed:8.1f}   "
+          f"latency p50 {statistics.median(latencies):6.2f}s p95 {percentile(latencies, 95):6.2f}s   "
+          f"batches {stats['batches']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--adapter", default=str(DEFAULT_ADAPTER_PATH), help='adapter directory or "none"')
+    parser.add_argument("--quantization", choices=["none", "int8", "4bit"], default="none")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=20.0)
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    adapter = None if args.adapter.lower() == "none" else args.adapter
+    print(f"Loading {args.model} (adapter={adapter}, quantization={args.quantization}) ...")
+    engine = LocalInferenceEngine(args.model, adapter_path=adapter, quantization=args.quantization)
+
+    # Warm-up so lazy initialisation does not count against the first configuration.
+    engine.generate_batch([PROMPTS[0]], max_new_tokens=4)
+
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        run(engine, batch_size, args.requests, args.max_new_tokens, args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+PDF text extraction on the bundled knowledge/ PDFs: serial pdfplumber vs page-parallel modes.
+
+Each cold run starts from an empty cache; the warm run repeats "auto" on the cache it filled.
+Run from chatbot-backend/:
+
+    python -m benchmarks.pdf_extract
+    python -m benchmarks.pdf_extract --workers 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from src.core.pdf_extract import PDFExtractor
+
+KNOWLEDGE = Path(__file__).resolve().parent.parent / "knowledge"
+
+
+def run(label, pdfs, cache_dir, mode, workers):
+    extractor = PDFExtractor(cache_dir, mode=mode, workers=workers)
+    start = time.perf_counter()
+    pages = extractor.extract(pdfs)
+    elapsed = time.perf_counter() - start
+    stats = extractor.stats
+    chars = sum(len(text) for texts in pages.values() for text in texts)
+    print(f"{label:<26} {elapsed:7.2f} s  {stats.pages / elapsed:8.1f} pages/s  {chars:>9} chars  "
+          f"(cached {stats.cached_pages}, fast {stats.fast_pages}, pdfplumber {stats.plumber_pages})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    pdfs = sorted(KNOWLEDGE.glob("*.pdf"))
+    print(f"{len(pdfs)} PDFs: {', '.join(p.name for p in pdfs)}")
+    with tempfile.TemporaryDirectory() as root:
+        run("pdfplumber, serial", pdfs, Path(root) / "a", "plumber", 1)
+        run(f"pdfplumber, {args.workers} workers", pdfs, Path(root) / "b", "plumber", args.workers)
+        run(f"fast, {args.workers} workers", pdfs, Path(root) / "c", "fast", args.workers)
+        run(f"auto, {args.workers} workers", pdfs, Path(root) / "d", "auto", args.workers)
+        run("auto, warm cache", pdfs, Path(root) / "d", "auto", args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Prefill time saved per request by the prompt-prefix key/value cache.
+
+Each request is a real tutoring prompt (the ContentGenerator templates filled with a question
+and some content). Prefill is timed as a generation of a single token, once with the cache
+disabled and once with the template prefixes cached. Run from chatbot-backend/:
+
+    python -m benchmarks.prefix_cache --requests 16
+    python -m benchmarks.prefix_cache --model sshleifer/tiny-gpt2 --adapter none   # quick smoke run
+"""
+
+import argparse
+import statistics
+import time
+
+from src.core.components import ANSWER_TEMPLATE, QUIZ_TEMPLATE
+from src.core.local_llm import (DEFAULT_ADAPTER_PATH, DEFAULT_MODEL_NAME, INSTRUCTION_TEMPLATE, LocalInferenceEngine,
+                                instruction_prefix)
+from src.core.prefix_cache import PrefixKVCache
+
+QUESTIONS = [
+    ("What does the retriever do in a RAG pipeline?", "RAG"),
+    ("How does useState trigger a re-render?", "React State"),
+    ("Why does middleware order matter in Express?", "Express Middleware"),
+    ("When should I build a high-fidelity prototype?", "Prototyping"),
+]
+CONTENT = "Retrieved lesson notes. " * 20
+
+
+def build_prompts(num_requests):
+    prompts = []
+    for i in range(num_requests):
+        question, topic = QUESTIONS[i % len(QUESTIONS)]
+        if i % 2:
+            text = QUIZ_TEMPLATE.format(topic=topic, level="beginner", num_questions=5, content=CONTENT)
+        else:
+            text = ANSWER_TEMPLATE.format(question=question, content=CONTENT)
+        prompts.append(INSTRUCTION_TEMPLATE.format(prompt=text))
+    return prompts
+
+
+def time_prefill(engine, prompts):
+    timings = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        engine.generate_batch([prompt], max_new_tokens=1)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--adapter", default=str(DEFAULT_ADAPTER_PATH), help='adapter directory or "none"')
+    parser.add_argument("--quantization", choices=["none", "int8", "4bit"], default="none")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--cache-mb", type=int, default=256)
+    args = parser.parse_args()
+
+    adapter = None if args.adapter.lower() == "none" else args.adapter
+    print(f"Loading {args.model} (adapter={adapter}, quantization={args.quantization}) ...")
+    engine = LocalInferenceEngine(args.model, adapter_path=adapter, quantization=args.quantization)
+    prompts = build_prompts(args.requests)
+    engine.generate_batch(prompts[:1], max_new_tokens=1)  # warm-up
+
+    baseline = time_prefill(engine, prompts)
+
+    cache = PrefixKVCache(args.cache_mb * 1024 * 1024)
+    for template in (ANSWER_TEMPLATE, QUIZ_TEMPLATE):
+        cache.register(instruction_prefix(template))
+    engine.prefix_cache = cache
+    cached = time_prefill(engine, prompts)
+
+    # The first request per template pays for building the entry; the rest reuse it.
+    warm = cached[2:] or cached
+    base_ms, warm_ms = statistics.median(baseline), statistics.median(warm)
+    print(f"prompts                   {len(prompts)}")
+    print(f"prefill p50 without cache {base_ms:8.1f} ms")
+    print(f"prefill p50 with cache    {warm_ms:8.1f} ms")
+    print(f"saved per request         {base_ms - warm_ms:8.1f} ms ({(1 - warm_ms / base_ms) * 100:.0f}%)")
+    print(f"cache                     {cache.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
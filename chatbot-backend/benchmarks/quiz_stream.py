@@ -0,0 +1,109 @@
+"""
+Retries and latency of schema-constrained quiz generation: re-requesting the whole quiz when any
+question is malformed, against incremental parsing that keeps every valid question and asks only
+for the missing ones (quiz_stream.py).
+
+The model is simulated: it streams a JSON quiz at --tokens-per-s (about four characters per
+token), and each question is malformed with probability --error-rate (a wrong correct_label or
+truncated JSON). Reported per strategy: model calls per quiz, questions generated per quiz
+(including discarded ones), time to the first usable question and time to the full quiz. Run from
+chatbot-backend/:
+
+    python -m benchmarks.quiz_stream
+    python -m benchmarks.quiz_stream --quizzes 50 --questions 10 --error-rate 0.2
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+
+from src.core.services.educational_assistant import ContentGenerationError
+from src.core.services.quiz_stream import IncrementalQuizParser, QuizStreamStats, stream_quiz_questions
+
+CHARS_PER_TOKEN = 4
+
+
+class DriftingLLM:
+    """Streams a quiz for the "Number of questions" in the prompt; some questions come out malformed."""
+
+    def __init__(self, error_rate, tokens_per_s, seed):
+        self.error_rate = error_rate
+        self.delay = CHARS_PER_TOKEN / tokens_per_s
+        self.rng = random.Random(seed)
+        self.questions = 0
+        self.calls = 0
+
+    def _question(self, index):
+        self.questions += 1
+        question = {
+            "question": f"Which statement about concept {index} is correct?",
+            "options": [{"label": label, "text": f"Statement {label} about concept {index}"} for label in "ABCD"],
+            "correct_label": self.rng.choice("ABCD"),
+            "explanation": f"Concept {index} is described by its correct option.",
+        }
+        text = json.dumps(question)
+        if self.rng.random() < self.error_rate:
+            if self.rng.random() < 0.5:
+                text = text.replace(f'"correct_label": "{question["correct_label"]}"', '"correct_label": "E"')
+            else:
+                text = text[: len(text) // 2] + "}"
+        return text
+
+    def stream(self, prompt):
+        self.calls += 1
+        n = int(re.search(r"Number of questions: (\d+)", prompt).group(1))
+        text = '{"title": "Quiz", "topic": "Bench", "level": "beginner", "questions": ['
+        text += ", ".join(self._question(i) for i in range(n)) + "]}"
+        for start in range(0, len(text), CHARS_PER_TOKEN):
+            time.sleep(self.delay)
+            yield text[start:start + CHARS_PER_TOKEN]
+
+
+def whole_quiz(llm, n, max_attempts):
+    """Waits for the complete answer and requests the whole quiz again unless all n questions are valid."""
+    start = time.perf_counter()
+    for _ in range(max_attempts):
+        parser = IncrementalQuizParser()
+        parser.feed("".join(llm.stream(f"Number of questions: {n}")))
+        if len(parser.questions) == n:
+            break
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, len(parser.questions)
+
+
+def incremental(llm, n, max_attempts):
+    start = time.perf_counter()
+    first, count = None, 0
+    try:
+        for _ in stream_quiz_questions(llm, "Bench", n, max_attempts=max_attempts, stats=QuizStreamStats()):
+            count += 1
+            if first is None:
+                first = time.perf_counter() - start
+    except ContentGenerationError:
+        pass
+    elapsed = time.perf_counter() - start
+    return (first if first is not None else elapsed), elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quizzes", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.1, help="probability that a question is malformed")
+    parser.add_argument("--tokens-per-s", type=float, default=2000.0)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.quizzes} quizzes of {args.questions} questions, error rate {args.error_rate}:")
+    for name, strategy in (("whole", whole_quiz), ("incremental", incremental)):
+        llm = DriftingLLM(args.error_rate, args.tokens_per_s, seed=0)
+        runs = [strategy(llm, args.questions, args.max_attempts) for _ in range(args.quizzes)]
+        first, total, valid = (sum(column) / len(runs) for column in zip(*runs))
+        print(f"  {name:<12} {llm.calls / len(runs):5.2f} calls/quiz   {llm.questions / len(runs):6.2f} questions generated"
+              f"   {valid:5.2f} valid   first question {first * 1000:7.1f} ms   full quiz {total * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
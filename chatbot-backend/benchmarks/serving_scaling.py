@@ -0,0 +1,155 @@
+"""
+Throughput of the production server (gunicorn.conf.py) with 1 to N preloaded workers.
+
+For each worker count a server is started on a free port with its own temporary state and job
+databases and the rate limit lifted, then --clients client processes send requests on
+keep-alive connections for --seconds. Reported per worker count: requests/s, p50/p95 latency,
+and per worker the resident memory and the part of it that is private to that worker; the rest
+is shared copy-on-write with the preloaded master. Run from chatbot-backend/:
+
+    python -m benchmarks.serving_scaling
+    python -m benchmarks.serving_scaling --workers 1,2,4 --seconds 15 --clients 8
+
+The default request generates a 50-question quiz through /api/assistant/content/generate.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BODY = {"user_id": "bench", "subject": "RAG", "request_type": "quiz", "num_items": 50}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=180.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+
+def client(args):
+    """One client process: sequential requests on one keep-alive connection until the deadline."""
+    port, path, body, deadline = args
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("POST", path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+                continue
+        except OSError:
+            errors += 1
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, errors
+
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in Path("/proc").iterdir():
+        if entry.name.isdigit():
+            try:
+                stat = (entry / "stat").read_text()
+            except OSError:
+                continue
+            # Field 4 (after the parenthesised command name) is the parent pid.
+            if int(stat.rsplit(")", 1)[1].split()[1]) == master_pid:
+                pids.append(int(entry.name))
+    return pids
+
+
+def memory_mb(pid):
+    """(resident, private) MiB of one process, from /proc/<pid>/smaps_rollup (Linux)."""
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0])
+    return fields["Rss"] / 1024, (fields["Private_Clean"] + fields["Private_Dirty"]) / 1024
+
+
+def run(workers, args, body):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = {
+            **os.environ,
+            "DIRECTED_WORKERS": str(workers),
+            "DIRECTED_BIND": f"127.0.0.1:{port}",
+            "DIRECTED_RATE_LIMIT": "1000000/minute",
+            "DIRECTED_STATE_DB": str(Path(state_dir) / "state.sqlite3"),
+            "DIRECTED_JOBS_DB": str(Path(state_dir) / "jobs.sqlite3"),
+        }
+        server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "src.main:app"],
+                                  cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(port)
+            deadline = time.time() + args.seconds
+            with multiprocessing.Pool(args.clients) as pool:
+                results = pool.map(client, [(port, args.path, body, deadline)] * args.clients)
+            memory = [memory_mb(pid) for pid in worker_pids(server.pid)]
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(l for result in results for l in result[0])
+    errors = sum(result[1] for result in results)
+    if not latencies:
+        print(f"{workers:>3} workers: no successful requests ({errors} errors)")
+        return None
+    throughput = len(latencies) / args.seconds
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    rss = statistics.mean(m[0] for m in memory) if memory else 0.0
+    private = statistics.mean(m[1] for m in memory) if memory else 0.0
+    print(f"{workers:>3} workers: {throughput:8.1f} req/s   p50 {statistics.median(latencies):7.1f} ms   "
+          f"p95 {p95:7.1f} ms   errors {errors}   per worker RSS {rss:7.1f} MiB, private {private:7.1f} MiB")
+    return throughput
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, max(1, cores // 2), cores})))
+    parser.add_argument("--clients", type=int, default=2 * cores, help="concurrent client processes")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--path", default="/api/assistant/content/generate")
+    parser.add_argument("--body", default=json.dumps(DEFAULT_BODY), help="JSON request body")
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in (int(n) for n in args.workers.split(",")):
+        throughput = run(workers, args, args.body.encode("utf-8"))
+        if throughput and baseline is None:
+            baseline = throughput
+        if throughput and baseline:
+            print(f"      speed-up over the first run: {throughput / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
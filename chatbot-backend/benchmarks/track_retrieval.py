@@ -0,0 +1,92 @@
+"""
+Retrieval latency and precision: one unfiltered collection vs track filtering vs per-track shards.
+
+The knowledge/ corpus is chunked and tagged as in ingestion.py, then replicated to 1x, 10x and
+100x its size. Embeddings are deterministic hashes rather than the Google API, so the numbers
+measure the vector search itself and the run needs no credentials. Reported per layout:
+p50/p95 search latency, chunks in the searched space, and the share of returned chunks from
+the query's own track. Run from chatbot-backend/:
+
+    python -m benchmarks.track_retrieval
+    python -m benchmarks.track_retrieval --scales 1,10 --queries 50
+"""
+
+import argparse
+import copy
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.core.ingestion import build_collections, load_knowledge, split_documents, tag_documents
+from src.core.retrieval import TrackRetriever
+
+QUERIES = {
+    "UI/UX": ["What makes a good usability test?", "How do I build a low-fidelity prototype?",
+              "Explain visual hierarchy in UX design", "What is user research for a startup?"],
+    "Gen AI": ["How does LangChain chain prompts together?", "What is retrieval augmented generation?",
+               "How are LLM embeddings used?", "When should I fine-tune a large language model?"],
+}
+
+
+def replicate(chunks, scale):
+    """`scale` copies of the corpus, each copy's text made distinct so nothing is deduplicated."""
+    out = []
+    for copy_index in range(scale):
+        for chunk in chunks:
+            doc = copy.deepcopy(chunk)
+            if copy_index:
+                doc.page_content = f"{doc.page_content}\n[copy {copy_index}]"
+            out.append(doc)
+    return out
+
+
+def measure(retriever, queries, track_of, routed):
+    latencies, in_track = [], []
+    for query in queries:
+        start = time.perf_counter()
+        docs = retriever.search(query, track_of[query] if routed else None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        in_track.extend(doc.metadata.get("track") == track_of[query] for doc in docs)
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1)))]
+    return statistics.median(latencies), p95, sum(in_track) / max(1, len(in_track))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1,10,100")
+    parser.add_argument("--queries", type=int, default=100, help="searches per layout")
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    print("Loading and chunking knowledge/ ...")
+    chunks = split_documents(tag_documents(load_knowledge()))
+    embeddings = DeterministicFakeEmbedding(size=768)
+    pool = [q for qs in QUERIES.values() for q in qs]
+    queries = [pool[i % len(pool)] for i in range(args.queries)]
+    track_of = {q: track for track, qs in QUERIES.items() for q in qs}
+
+    for scale in (int(s) for s in args.scales.split(",")):
+        corpus = replicate(chunks, scale)
+        with tempfile.TemporaryDirectory() as single_dir, tempfile.TemporaryDirectory() as shard_dir:
+            single = build_collections(corpus, embeddings, single_dir, sharded=False)
+            shards = build_collections(corpus, embeddings, shard_dir, sharded=True)
+            sizes = Counter(doc.metadata["track"] for doc in corpus)
+            largest_track = max(sizes[t] for t in QUERIES if t in sizes)
+            layouts = [
+                ("unfiltered", TrackRetriever(single, sharded=False, k=args.k), False, len(corpus)),
+                ("filtered", TrackRetriever(single, sharded=False, k=args.k), True, len(corpus)),
+                ("sharded", TrackRetriever(shards, sharded=True, k=args.k), True, largest_track),
+            ]
+            print(f"\n{scale}x corpus: {len(corpus)} chunks, per track {dict(sizes)}")
+            for name, retriever, routing, searched in layouts:
+                p50, p95, precision = measure(retriever, queries, track_of, routing)
+                print(f"  {name:<11} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+                      f"searched <= {searched:>6} chunks  in-track results {precision:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Concurrent query throughput of the vector store in embedded and server (http) mode.
+
+The knowledge/ corpus is chunked, tagged and replicated as in track_retrieval.py, then written
+to per-track collections twice: once in an embedded store and once through a Chroma server
+started for the run (`chroma run` on a temporary directory). Embeddings are deterministic
+hashes, so no credentials are needed. For each mode --concurrency callers issue --queries
+searches in total, both from a thread pool calling TrackRetriever.search (synchronous
+handlers) and as asyncio tasks awaiting TrackRetriever.asearch (the pooled async path).
+Reported: queries/s and p50/p95 latency. Run from chatbot-backend/:
+
+    python -m benchmarks.vector_store_modes
+    python -m benchmarks.vector_store_modes --scale 10 --concurrency 32 --queries 2000
+"""
+
+import argparse
+import asyncio
+import http.client
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.track_retrieval import QUERIES, replicate
+from src.core.ingestion import build_collections, load_knowledge, load_manifest, split_documents, tag_documents
+from src.core.retrieval import TrackRetriever
+from src.core.vectorstore import ChromaServer, EmbeddedChroma
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(path, port, timeout=60.0):
+    executable = shutil.which("chroma")
+    if executable is None:
+        raise SystemExit("The `chroma` command (installed with chromadb) is needed for the http mode")
+    server = subprocess.Popen([executable, "run", "--path", path, "--host", "127.0.0.1", "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for endpoint in ("/api/v2/heartbeat", "/api/v1/heartbeat"):
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+                conn.request("GET", endpoint)
+                if conn.getresponse().status == 200:
+                    return server
+            except OSError:
+                time.sleep(0.3)
+    server.terminate()
+    raise RuntimeError(f"Chroma server on port {port} did not come up")
+
+
+def summarize(label, latencies, elapsed):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1)))]
+    qps = len(latencies) / elapsed
+    print(f"  {label:<28} {qps:9.1f} q/s   p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
+    return qps
+
+
+def run_threads(retriever, queries, track_of, concurrency):
+    def timed(query):
+        start = time.perf_counter()
+        retriever.search(query, track_of[query])
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(timed, queries))
+    return latencies, time.perf_counter() - start
+
+
+async def run_async(retriever, queries, track_of, concurrency):
+    pending = iter(queries)
+    latencies = []
+
+    async def caller():
+        for query in pending:
+            start = time.perf_counter()
+            await retriever.asearch(query, track_of[query])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def measure(mode, connection, directory, corpus, queries, track_of, args):
+    build_collections(corpus, connection.embeddings, directory, sharded=True, connection=connection)
+    retriever = TrackRetriever.from_manifest(load_manifest(directory), connection.embeddings, directory,
+                                             k=args.k, connection=connection)
+    retriever.search(queries[0], track_of[queries[0]])  # warm-up: opens clients and collections
+    results = {}
+    results["threads"] = summarize(f"{mode}, sync in threads", *run_threads(retriever, queries, track_of,
+                                                                           args.concurrency))
+    results["async"] = summarize(f"{mode}, async", *asyncio.run(run_async(retriever, queries, track_of,
+                                                                          args.concurrency)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10, help="copies of the knowledge/ corpus")
+    parser.add_argument("--queries", type=int, default=1000, help="searches per measurement")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    print("Loading and chunking knowledge/ ...")
+    corpus = replicate(split_documents(tag_documents(load_knowledge())), args.scale)
+    embeddings = DeterministicFakeEmbedding(size=768)
+    pool = [q for qs in QUERIES.values() for q in qs]
+    queries = [pool[i % len(pool)] for i in range(args.queries)]
+    track_of = {q: track for track, qs in QUERIES.items() for q in qs}
+    print(f"{len(corpus)} chunks, {args.queries} queries, {args.concurrency} concurrent callers")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as embedded_dir:
+        connection = EmbeddedChroma(embeddings, embedded_dir, max_concurrency=args.concurrency)
+        results["embedded"] = measure("embedded", connection, embedded_dir, corpus, queries, track_of, args)
+
+    with tempfile.TemporaryDirectory() as server_dir, tempfile.TemporaryDirectory() as manifest_dir:
+        port = free_port()
+        server = start_server(server_dir, port)
+        try:
+            connection = ChromaServer(embeddings, manifest_dir, max_concurrency=args.concurrency,
+                                      host="127.0.0.1", port=port)
+            results["http"] = measure("http", connection, manifest_dir, corpus, queries, track_of, args)
+        finally:
+            server.terminate()
+            server.wait()
+
+    baseline = results["embedded"]["threads"]
+    print(f"http async vs embedded sync: {results['http']['async'] / baseline:.2f}x queries/s")
+
+
+if __name__ == "__main__":
+    main()
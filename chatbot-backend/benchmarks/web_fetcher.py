@@ -0,0 +1,98 @@
+"""
+Web source fetching against a local stand-in server: serial downloads vs the async fetcher.
+
+The stand-in serves --pages HTML pages spread over a few fake hosts, with a fixed delay per
+response, ETag and Last-Modified headers, and 304 replies to matching conditional requests.
+Three runs are timed:
+    serial      one request after another, no cache (what WebBaseLoader did on every ingestion)
+    async cold  the fetcher with an empty page cache
+    async warm  the fetcher again; every page answers 304 and nothing is downloaded or parsed
+Run from chatbot-backend/:
+
+    python -m benchmarks.web_fetcher --pages 20 --delay-ms 150
+"""
+
+import argparse
+import hashlib
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.core.web_fetcher import PageCache, WebFetcher
+
+LAST_MODIFIED = formatdate(time.time() - 86400, usegmt=True)
+
+
+def make_handler(delay, stats):
+    class StandIn(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(delay)
+            body = (f"<html><head><title>{self.path}</title></head><body><nav>Home | Docs | Blog</nav>"
+                    f"<h1>Page {self.path}</h1><p>{'Lesson content. ' * 200}</p></body></html>").encode()
+            etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                stats["304"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            stats["200"] += 1
+            stats["bytes"] += len(body)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StandIn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=150.0, help="server-side latency per response")
+    parser.add_argument("--per-host", type=int, default=4)
+    args = parser.parse_args()
+
+    stats = Counter()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.delay_ms / 1000, stats))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    # Distinct host names for the per-host limit; all resolve to the stand-in.
+    hosts = ["127.0.0.1", "localhost"]
+    urls = [f"http://{hosts[i % len(hosts)]}:{port}/page/{i}" for i in range(args.pages)]
+
+    start = time.perf_counter()
+    for url in urls:
+        urllib.request.urlopen(url).read()
+    serial = time.perf_counter() - start
+    print(f"serial      {serial:6.2f} s   {stats['200']} downloads")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ("async cold", "async warm"):
+            stats.clear()
+            fetcher = WebFetcher(PageCache(cache_dir), per_host=args.per_host)
+            start = time.perf_counter()
+            results = fetcher.fetch(urls)
+            elapsed = time.perf_counter() - start
+            statuses = Counter(r.status for r in results)
+            print(f"{label:<11} {elapsed:6.2f} s   {stats['200']} downloads ({stats['bytes']} bytes), "
+                  f"{stats['304']} not modified   {dict(statuses)}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
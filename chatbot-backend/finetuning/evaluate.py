@@ -0,0 +1,271 @@
+"""
+Offline evaluation of the base model and every fine-tuned adapter on the validation split.
+
+For each model (the base model, the shared adapter and each per-track adapter) it reports:
+- perplexity of the reference completions,
+- quiz format validity: the generated quiz parses into the service's Quiz/QuizQuestion schema,
+  and how often its answer matches the reference,
+- tutoring answer length in words against the 50-150 word guideline of ContentGenerator,
+- generation throughput (generated tokens/sec) and wall time.
+
+Generation and scoring run in batches of length-sorted examples through the same engine the
+local backend serves with (src/core/local_llm.py), so the base weights are loaded once and the
+throughput numbers match serving. Results go to data/eval/report-<timestamp>.json; pass
+--baseline with an earlier report to fail on quality or speed regressions.
+
+    python evaluate.py --limit 200 --batch-size 8
+    python evaluate.py --baseline ../data/eval/report-20250101-120000.json
+"""
+
+import argparse
+import json
+import math
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.core.local_llm import SHARED_ADAPTER, LocalInferenceEngine  # noqa: E402
+from src.core.services.educational_assistant import MCQOption, Quiz, QuizQuestion  # noqa: E402
+
+from prepare_data import DATA_DIR, load_processed  # noqa: E402
+
+MODEL_NAME = "google/gemma-2b"
+ADAPTERS_DIR = Path(__file__).resolve().parent / "finetuned_adapters"
+EVAL_DIR = DATA_DIR / "eval"
+RESPONSE_MARKER = "\n\n### Response:\n"
+MIN_WORDS, MAX_WORDS = 50, 150
+
+QUIZ_PATTERN = re.compile(
+    r"Quiz:\s*(?P<question>.+?)\s+"
+    r"a\)\s*(?P<a>.+?)\s+b\)\s*(?P<b>.+?)\s+c\)\s*(?P<c>.+?)\s+d\)\s*(?P<d>.+?)\.?\s*"
+    r"\(Answer:\s*(?P<answer>[a-dA-D])\)",
+    re.DOTALL,
+)
+
+
+# ------------------------
+# Examples and parsing
+# ------------------------
+def load_examples(split="val", limit=None):
+    """Validation rows split back into prompt, reference completion and kind (quiz/tutoring)."""
+    dataset = load_processed(split)
+    if limit:
+        dataset = dataset.select(range(min(limit, len(dataset))))
+    examples = []
+    for row in dataset:
+        instruction, _, reference = row["text"].partition(RESPONSE_MARKER)
+        examples.append({
+            "prompt": instruction + RESPONSE_MARKER,
+            "reference": reference,
+            "kind": "quiz" if reference.lstrip().startswith("Quiz:") else "tutoring",
+            "track": row.get("track"),
+        })
+    return examples
+
+
+def parse_quiz(text):
+    """Parses a generated single-question quiz into the service schema; None if it does not fit."""
+    match = QUIZ_PATTERN.search(text)
+    if match is None:
+        return None
+    options = [MCQOption(label=label.upper(), text=match.group(label).strip()) for label in "abcd"]
+    try:
+        quiz = Quiz(title="Generated quiz", questions=[QuizQuestion(
+            question=match.group("question").strip(),
+            options=options,
+            correct_label=match.group("answer").upper(),
+        )])
+    except Exception:
+        return None
+    return quiz
+
+
+def length_sorted_batches(items, batch_size, key):
+    """Index batches over `items` sorted by `key`, so each batch pads to a similar length."""
+    order = sorted(range(len(items)), key=lambda i: key(items[i]))
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+# ------------------------
+# Metrics
+# ------------------------
+def perplexity(engine, adapter, examples, batch_size):
+    """Perplexity of the reference completions given their prompts (prompt tokens are not scored)."""
+    tokenizer = engine.tokenizer
+    encoded = []
+    for ex in examples:
+        prompt_ids = tokenizer(ex["prompt"])["input_ids"]
+        completion_ids = tokenizer(ex["reference"], add_special_tokens=False)["input_ids"] + [tokenizer.eos_token_id]
+        encoded.append((prompt_ids + completion_ids, len(prompt_ids)))
+
+    total_nll, total_tokens = 0.0, 0
+    for batch in length_sorted_batches(encoded, batch_size, key=lambda e: len(e[0])):
+        width = max(len(encoded[i][0]) for i in batch)
+        input_ids, labels, mask = [], [], []
+        for i in batch:
+            ids, prompt_len = encoded[i]
+            pad = width - len(ids)
+            input_ids.append([tokenizer.pad_token_id] * pad + ids)
+            labels.append([-100] * (pad + prompt_len) + ids[prompt_len:])
+            mask.append([0] * pad + [1] * len(ids))
+        input_ids, labels, mask = torch.tensor(input_ids), torch.tensor(labels), torch.tensor(mask)
+        position_ids = (mask.cumsum(-1) - 1).clamp(min=0)
+        with torch.inference_mode(), engine.use_adapter(adapter) as model:
+            logits = model(input_ids=input_ids, attention_mask=mask, position_ids=position_ids).logits
+        shift_logits, shift_labels = logits[:, :-1].float(), labels[:, 1:]
+        nll = torch.nn.functional.cross_entropy(
+            shift_logits.reshape(-1, shift_logits.size(-1)), shift_labels.reshape(-1),
+            ignore_index=-100, reduction="sum",
+        )
+        total_nll += nll.item()
+        total_tokens += int((shift_labels != -100).sum())
+    return math.exp(total_nll / max(1, total_tokens))
+
+
+def generate_all(engine, adapter, examples, batch_size, max_new_tokens):
+    """Greedy generations for every example, in length-sorted batches. Returns (texts, tokens, seconds)."""
+    tokenizer = engine.tokenizer
+    lengths = [len(tokenizer(ex["prompt"])["input_ids"]) for ex in examples]
+    outputs = [None] * len(examples)
+    generated = 0
+    start = time.perf_counter()
+    for batch in length_sorted_batches(list(range(len(examples))), batch_size, key=lambda i: lengths[i]):
+        texts, tokens = engine.generate_batch([examples[i]["prompt"] for i in batch], max_new_tokens, adapter=adapter)
+        generated += tokens
+        for i, text in zip(batch, texts):
+            outputs[i] = text
+    return outputs, generated, time.perf_counter() - start
+
+
+def evaluate_model(engine, adapter, examples, batch_size, max_new_tokens):
+    ppl = perplexity(engine, adapter, examples, batch_size)
+    outputs, generated, seconds = generate_all(engine, adapter, examples, batch_size, max_new_tokens)
+
+    quiz_total = quiz_valid = quiz_correct = 0
+    words = []
+    for ex, text in zip(examples, outputs):
+        if ex["kind"] == "quiz":
+            quiz_total += 1
+            quiz = parse_quiz(text)
+            reference = parse_quiz(ex["reference"])
+            if quiz is not None:
+                quiz_valid += 1
+                if reference is not None and quiz.questions[0].correct_label == reference.questions[0].correct_label:
+                    quiz_correct += 1
+        else:
+            words.append(len(text.split()))
+
+    return {
+        "perplexity": round(ppl, 3),
+        "quiz_examples": quiz_total,
+        "quiz_format_valid": round(quiz_valid / quiz_total, 4) if quiz_total else None,
+        "quiz_answer_match": round(quiz_correct / quiz_total, 4) if quiz_total else None,
+        "tutoring_examples": len(words),
+        "words_mean": round(statistics.mean(words), 1) if words else None,
+        "words_median": statistics.median(words) if words else None,
+        "words_in_guideline": (
+            round(sum(MIN_WORDS <= w <= MAX_WORDS for w in words) / len(words), 4) if words else None
+        ),
+        "generated_tokens": generated,
+        "generation_seconds": round(seconds, 2),
+        "tokens_per_sec": round(generated / seconds, 2) if seconds else None,
+    }
+
+
+# ------------------------
+# Regression check
+# ------------------------
+# metric -> True if higher is better
+TRACKED_METRICS = {
+    "perplexity": False,
+    "quiz_format_valid": True,
+    "quiz_answer_match": True,
+    "words_in_guideline": True,
+    "tokens_per_sec": True,
+}
+
+
+def find_regressions(report, baseline, tolerance):
+    regressions = []
+    for name, metrics in report["models"].items():
+        before = baseline["models"].get(name)
+        if before is None:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            new, old = metrics.get(metric), before.get(metric)
+            if new is None or not old:
+                continue
+            change = (new - old) / abs(old)
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--adapters", default=str(ADAPTERS_DIR), help='adapter directory or "none"')
+    parser.add_argument("--quantization", choices=["none", "int8", "4bit"], default="none")
+    parser.add_argument("--split", default="val")
+    parser.add_argument("--limit", type=int, default=None, help="evaluate only the first N examples")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=200)
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed relative change before failing")
+    args = parser.parse_args()
+
+    examples = load_examples(args.split, args.limit)
+    adapter_path = None if args.adapters.lower() == "none" else args.adapters
+    engine = LocalInferenceEngine(args.model, adapter_path=adapter_path, quantization=args.quantization,
+                                  max_adapters=1, merge_adapter=False)
+    models = {"base": None}
+    if engine.adapters is not None:
+        models.update({name: name for name in engine.adapters.adapters})
+    print(f"Evaluating {len(examples)} {args.split} examples on: {', '.join(models)}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "model": args.model,
+        "quantization": args.quantization,
+        "split": args.split,
+        "examples": len(examples),
+        "batch_size": args.batch_size,
+        "max_new_tokens": args.max_new_tokens,
+        "models": {},
+    }
+    for name, adapter in models.items():
+        subset = examples
+        if adapter not in (None, SHARED_ADAPTER):
+            # A track adapter is judged on its own track; fall back to everything if rows carry no track.
+            own = [ex for ex in examples if ex["track"] and engine.adapter_for(ex["track"]) == adapter]
+            subset = own or examples
+        metrics = evaluate_model(engine, adapter, subset, args.batch_size, args.max_new_tokens)
+        report["models"][name] = metrics
+        print(f"{name:<10} ppl {metrics['perplexity']:>8}  quiz valid {metrics['quiz_format_valid']}  "
+              f"answer match {metrics['quiz_answer_match']}  words in 50-150 {metrics['words_in_guideline']}  "
+              f"tok/s {metrics['tokens_per_sec']}")
+
+    EVAL_DIR.mkdir(parents=True, exist_ok=True)
+    path = EVAL_DIR / f"report-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Report saved to {path}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = find_regressions(report, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
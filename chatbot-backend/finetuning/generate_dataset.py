@@ -1,83 +1,417 @@
+"""
+Generates the synthetic fine-tuning dataset as sharded JSONL (or Arrow) files.
+
+Examples are produced by a process pool, one seeded generation shard per task, so a run is
+reproducible for a given --seed regardless of the number of workers. At most two shards per
+worker are in flight, and the parent process streams each shard to disk in order before
+submitting more:
+- duplicates are dropped on the fly by content hash (a fixed-size Bloom filter, so memory
+  does not grow with the number of examples),
+- train/val membership is decided by the same hash, so the split is deterministic and
+  nothing has to be shuffled in memory.
+
+    python generate_dataset.py --num-examples 100000 --workers 8
+"""
+
+import argparse
+import hashlib
 import json
+import math
+import os
 import random
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.core.tracks import TRACKS  # noqa: E402
+
+# ------------------------
+# Curriculum content
+# ------------------------
+# Every subtopic has one tutoring explanation and one multiple-choice question
+# (options listed with the correct one first; they are shuffled per example).
+CURRICULUM = {
+    "Gen AI": {
+        "Prompt Engineering": {
+            "tutoring": "Zero-shot prompting is when you ask a model a question without any examples. Few-shot prompting is when you provide a few examples to guide the model's response. What's the main benefit of few-shot prompting?",
+            "question": "What is the key difference between zero-shot and few-shot prompting?",
+            "options": ["Number of examples in the prompt", "Model size", "Training data", "Temperature setting"],
+        },
+        "RAG": {
+            "tutoring": "RAG systems improve accuracy by letting the model access external knowledge bases, reducing the risk of making things up. How does this improve factual accuracy?",
+            "question": "What does 'Retrieval' in RAG refer to?",
+            "options": ["Retrieving data from an external source", "Retrieving user input", "Retrieving the model’s weights", "Retrieving conversational history"],
+        },
+        "Transformers": {
+            "tutoring": "The Transformer architecture is a type of neural network that uses self-attention to weigh the importance of different parts of the input sequence. Why is this important for understanding long sentences?",
+            "question": "What mechanism allows a Transformer to weigh the importance of different words in a sentence?",
+            "options": ["Attention", "Convolutional layers", "Recurrent loops", "Pooling"],
+        },
+        "Embeddings": {
+            "tutoring": "Embeddings turn text into vectors of numbers so that pieces of text with similar meaning end up close together. Vector search uses this to find relevant documents. Why might two differently worded questions get similar embeddings?",
+            "question": "What does a text embedding represent?",
+            "options": ["The meaning of text as a vector of numbers", "The text compressed as a ZIP file", "The number of tokens in the text", "The font used to display the text"],
+        },
+        "Fine-tuning with LoRA": {
+            "tutoring": "LoRA fine-tunes a large model by training small low-rank matrices added to some layers, while the original weights stay frozen. This makes fine-tuning much cheaper. Why is freezing the base weights helpful?",
+            "question": "What does LoRA train during fine-tuning?",
+            "options": ["Small low-rank adapter matrices", "Every weight in the model", "Only the tokenizer", "The embedding database"],
+        },
+        "Tokenization": {
+            "tutoring": "Models don't read words directly; a tokenizer splits text into tokens, which can be whole words or pieces of words. Context limits and costs are measured in tokens. Why might a rare word use several tokens?",
+            "question": "What is a token in the context of language models?",
+            "options": ["A unit of text such as a word or word piece", "A password for the API", "A single sentence", "A type of neural network layer"],
+        },
+    },
+    "MERN": {
+        "React State": {
+            "tutoring": "State is data that changes over time and affects how a component renders. You can manage it with hooks like `useState`. What's one example of a piece of data you would manage with state?",
+            "question": "Which React Hook is used for managing component-level state?",
+            "options": ["useState", "useEffect", "useContext", "useReducer"],
+        },
+        "MongoDB Queries": {
+            "tutoring": "MongoDB uses JSON-like documents. You can use query operators like `$gt` (greater than) to find documents. For example, to find all users over 25. How would you find all posts from a specific date?",
+            "question": "What operator finds documents where an array field contains all the specified elements?",
+            "options": ["$all", "$in", "$elemMatch", "$each"],
+        },
+        "Express Middleware": {
+            "tutoring": "Middleware in Express.js are functions that run in the middle of a request and response cycle. They can modify the request or response objects before they reach the final route handler. What kind of tasks are good for middleware?",
+            "question": "Middleware in Express.js is most often used for which of the following?",
+            "options": ["User authentication and logging", "Frontend rendering", "Database configuration", "Styling webpages"],
+        },
+        "Node.js Event Loop": {
+            "tutoring": "Node.js runs your JavaScript on a single thread and uses an event loop to handle many I/O operations without blocking. Slow synchronous code blocks every request. Why should you avoid heavy computation in a request handler?",
+            "question": "What lets Node.js handle many concurrent I/O operations on a single thread?",
+            "options": ["The event loop", "Multiple CPU cores per request", "A new process per request", "The browser DOM"],
+        },
+        "REST APIs": {
+            "tutoring": "A REST API exposes resources at URLs and uses HTTP methods like GET, POST, PUT and DELETE to read and change them. Status codes tell the client what happened. Which method would you use to create a new user?",
+            "question": "Which HTTP method is conventionally used to create a new resource in a REST API?",
+            "options": ["POST", "GET", "DELETE", "HEAD"],
+        },
+        "JWT Authentication": {
+            "tutoring": "A JSON Web Token is a signed string the server gives a user after login. The client sends it with each request, and the server verifies the signature instead of looking up a session. Why must the signing secret stay private?",
+            "question": "How does a server check that a JWT has not been tampered with?",
+            "options": ["By verifying its signature", "By counting its characters", "By decoding it as Base64 only", "By asking the browser"],
+        },
+    },
+    "UI/UX": {
+        "Accessibility (WCAG)": {
+            "tutoring": "WCAG's POUR principles ensure web content is accessible to everyone. POUR stands for Perceivable, Operable, Understandable, and Robust. What's an example of an 'Operable' component?",
+            "question": "According to WCAG, which principle ensures users can interact with all UI components?",
+            "options": ["Operable", "Perceivable", "Understandable", "Robust"],
+        },
+        "Usability": {
+            "tutoring": "Usability is about how easy a product is to use. A highly usable product is efficient and satisfying. How would you test if an app is easy to use?",
+            "question": "Which of the following best describes usability?",
+            "options": ["How quickly users can accomplish tasks with a product", "How visually appealing a product is", "The speed of a website", "How many features a product has"],
+        },
+        "Prototyping": {
+            "tutoring": "Prototyping involves creating drafts of your product. Low-fidelity prototypes are simple and quick to create, while high-fidelity prototypes are more detailed and interactive. When would you use a low-fidelity prototype?",
+            "question": "A low-fidelity prototype is characterized by its:",
+            "options": ["Simplicity and use of paper sketches", "High-detail, interactive design", "Final code and polished look", "Full database integration"],
+        },
+        "Visual Hierarchy": {
+            "tutoring": "Visual hierarchy uses size, color, contrast and spacing to show users what matters most on a screen. The most important element should draw the eye first. What would you make largest on a checkout page?",
+            "question": "Which technique most directly establishes visual hierarchy?",
+            "options": ["Varying size and contrast of elements", "Using only one font size", "Adding more pages", "Removing all whitespace"],
+        },
+        "User Research": {
+            "tutoring": "User research means learning about real users through interviews, surveys and observation before deciding what to build. It keeps designs grounded in actual needs. What question would you ask in a first user interview?",
+            "question": "What is the main goal of user research?",
+            "options": ["Understanding users' real needs and behaviour", "Choosing the brand colors", "Writing the backend code", "Reducing server costs"],
+        },
+        "Design Systems": {
+            "tutoring": "A design system is a shared library of components, styles and rules that keeps a product consistent. Designers and developers reuse the same buttons and spacing everywhere. How does this speed up building new screens?",
+            "question": "What is a key benefit of a design system?",
+            "options": ["Consistent, reusable components across a product", "Faster database queries", "Smaller images", "Automatic translations"],
+        },
+    },
+}
+
+# The tracks are defined once, in src/core/tracks.py, where the server routes requests by them.
+assert list(CURRICULUM) == TRACKS, "CURRICULUM tracks must match src/core/tracks.py"
+
 
-def generate_educational_example(track, topic, subtopic, example_type):
+DIFFICULTIES = ["Beginner", "Intermediate", "Advanced"]
+TONES = ["clear, encouraging", "friendly, concise", "patient, supportive", "upbeat, practical", "calm, step-by-step"]
+LEARNERS = [
+    "a student", "a beginner who is new to programming", "a career switcher", "a bootcamp learner",
+    "a university student", "a self-taught developer", "a student preparing for an interview", "a working professional",
+]
+OPENERS = [
+    "Hello! Let's talk about {subtopic} in {topic}. ",
+    "Great question! Let's explore {subtopic}. ",
+    "Hi there! Today we're looking at {subtopic}. ",
+    "Welcome! Let's break down {subtopic} together. ",
+    "Good to see you! Here's how {subtopic} works. ",
+    "Let's dive into {subtopic} in {topic}. ",
+]
+GOALS = [
+    "", " who learns best from real-world examples", " who is building a portfolio project",
+    " who is reviewing before an exam", " who prefers short explanations", " who wants to apply this at work",
+    " who struggled with this topic before", " who is studying in the evening after work",
+]
+CLOSINGS = [
+    "", " Take your time to think it through.", " Share your answer and we'll build on it.",
+    " There's no wrong first guess here.", " Try to answer in your own words.", " We'll go deeper once you reply.",
+]
+LABELS = ["a", "b", "c", "d"]
+
+
+def generate_educational_example(rng, track, topic, subtopic, example_type):
     """
     Generates a single educational example based on a template.
+    All randomness comes from `rng`, so a seeded generator reproduces the same example.
     """
-    templates = {
-        "tutoring": {
-            "prompt": f"You are a tutor for the {track} tech track. Explain the topic of {subtopic} within {topic} in a clear, encouraging tone. End with a question to test the student's understanding.",
-            "completion_start": f"Hello! Let's talk about {subtopic} in {topic}. "
-        },
-        "assessment": {
-            "prompt": f"You are an assessment creator for the {track} tech track. Create one quiz question for the topic of {subtopic} within {topic} at a {random.choice(['Beginner', 'Intermediate', 'Advanced'])} difficulty level. Provide multiple-choice options and the correct answer.",
-            "completion_start": f"Quiz: "
-        }
-    }
-    
-    selected_template = templates[example_type]
-
-    # I am using pre-defined content to simulate LLM output
-    if track == "Gen AI":
-        if subtopic == "Prompt Engineering":
-            completion_content = "Zero-shot prompting is when you ask a model a question without any examples. Few-shot prompting is when you provide a few examples to guide the model's response. What's the main benefit of few-shot prompting?" if example_type == "tutoring" else "What is the key difference between zero-shot and few-shot prompting? a) Model size b) Number of examples in the prompt c) Training data d) Temperature setting. (Answer: b) Number of examples in the prompt)"
-        elif subtopic == "RAG":
-            completion_content = "RAG systems improve accuracy by letting the model access external knowledge bases, reducing the risk of making things up. How does this improve factual accuracy?" if example_type == "tutoring" else "What does 'Retrieval' in RAG refer to? a) Retrieving user input b) Retrieving data from an external source c) Retrieving the model’s weights d) Retrieving conversational history. (Answer: b) Retrieving data from an external source)"
-        elif subtopic == "Transformers":
-             completion_content = "The Transformer architecture is a type of neural network that uses self-attention to weigh the importance of different parts of the input sequence. Why is this important for understanding long sentences?" if example_type == "tutoring" else "What mechanism allows a Transformer to weigh the importance of different words in a sentence? a) Convolutional layers b) Recurrent loops c) Attention d) Pooling. (Answer: c) Attention)"
-    elif track == "MERN":
-        if subtopic == "React State":
-            completion_content = "State is data that changes over time and affects how a component renders. You can manage it with hooks like `useState`. What's one example of a piece of data you would manage with state?" if example_type == "tutoring" else "Which React Hook is used for managing component-level state? a) useEffect b) useContext c) useState d) useReducer. (Answer: c) useState)"
-        elif subtopic == "MongoDB Queries":
-            completion_content = "MongoDB uses JSON-like documents. You can use query operators like `$gt` (greater than) to find documents. For example, to find all users over 25. How would you find all posts from a specific date?" if example_type == "tutoring" else "What operator finds documents where an array field contains all the specified elements? a) $in b) $all c) $elemMatch d) $each. (Answer: b) $all)"
-        elif subtopic == "Express Middleware":
-            completion_content = "Middleware in Express.js are functions that run in the middle of a request and response cycle. They can modify the request or response objects before they reach the final route handler. What kind of tasks are good for middleware?" if example_type == "tutoring" else "Middleware in Express.js is most often used for which of the following? a) Frontend rendering b) User authentication and logging c) Database configuration d) Styling webpages. (Answer: b) User authentication and logging)"
-    elif track == "UI/UX":
-        if subtopic == "Accessibility (WCAG)":
-            completion_content = "WCAG's POUR principles ensure web content is accessible to everyone. POUR stands for Perceivable, Operable, Understandable, and Robust. What's an example of an 'Operable' component?" if example_type == "tutoring" else "According to WCAG, which principle ensures users can interact with all UI components? a) Perceivable b) Operable c) Understandable d) Robust. (Answer: b) Operable)"
-        elif subtopic == "Usability":
-            completion_content = "Usability is about how easy a product is to use. A highly usable product is efficient and satisfying. How would you test if an app is easy to use?" if example_type == "tutoring" else "Which of the following best describes usability? a) How visually appealing a product is b) How quickly users can accomplish tasks with a product c) The speed of a website d) How many features a product has. (Answer: b) How quickly users can accomplish tasks with a product)"
-        elif subtopic == "Prototyping":
-            completion_content = "Prototyping involves creating drafts of your product. Low-fidelity prototypes are simple and quick to create, while high-fidelity prototypes are more detailed and interactive. When would you use a low-fidelity prototype?" if example_type == "tutoring" else "A low-fidelity prototype is characterized by its: a) High-detail, interactive design b) Simplicity and use of paper sketches c) Final code and polished look d) Full database integration. (Answer: b) Simplicity and use of paper sketches)"
+    entry = CURRICULUM[track][subtopic]
+    difficulty = rng.choice(DIFFICULTIES)
+    learner = rng.choice(LEARNERS) + rng.choice(GOALS)
+    tone = rng.choice(TONES)
+
+    if example_type == "tutoring":
+        prompt = (f"You are a tutor for the {track} tech track. Explain the topic of {subtopic} within {topic} "
+                  f"to {learner}, at the {difficulty} level, in a {tone} tone. End with a question to test the student's understanding.")
+        completion = rng.choice(OPENERS).format(subtopic=subtopic, topic=topic) + entry["tutoring"] + rng.choice(CLOSINGS)
+    else:
+        prompt = (f"You are an assessment creator for the {track} tech track. Create one quiz question for {learner}, "
+                  f"on the topic of {subtopic} within {topic}, at the {difficulty} difficulty level, in a {tone} tone. "
+                  f"Provide multiple-choice options and the correct answer.")
+        options = list(entry["options"])
+        correct = options[0]
+        rng.shuffle(options)
+        answer = LABELS[options.index(correct)]
+        choices = " ".join(f"{label}) {text}" for label, text in zip(LABELS, options))
+        completion = f"Quiz: {entry['question']} {choices}. (Answer: {answer}) {correct})"
 
     return {
-        "prompt": selected_template["prompt"],
-        "completion": selected_template["completion_start"] + completion_content
+        "prompt": prompt,
+        "completion": completion,
+        "track": track,
+        "subtopic": subtopic,
+        "type": example_type,
+        "difficulty": difficulty,
     }
 
-def generate_datasets(num_examples=300):
-    """Generates and saves the training and validation datasets."""
-    tracks = ["Gen AI", "MERN", "UI/UX"]
-    topics = {
-        "Gen AI": ["Prompt Engineering", "RAG", "Transformers"],
-        "MERN": ["React State", "MongoDB Queries", "Express Middleware"],
-        "UI/UX": ["Accessibility (WCAG)", "Usability", "Prototyping"]
+
+# ------------------------
+# Generation shards (run in worker processes)
+# ------------------------
+def content_digest(example):
+    return hashlib.sha256(f"{example['prompt']}\x00{example['completion']}".encode("utf-8")).digest()
+
+
+def generate_shard(task):
+    """
+    Generates one shard of candidate examples from its own seed.
+    Returns (shard_index, [(digest, record), ...]). For JSONL the record is already serialised,
+    so the parent process only dedupes and writes.
+    """
+    shard_index, size, seed, fmt = task
+    rng = random.Random(f"{seed}:{shard_index}")
+    tracks = list(CURRICULUM)
+    records = []
+    for _ in range(size):
+        track = rng.choice(tracks)
+        subtopic = rng.choice(list(CURRICULUM[track]))
+        example_type = rng.choice(["tutoring", "assessment"])
+        example = generate_educational_example(rng, track, "Curriculum", subtopic, example_type)
+        record = json.dumps(example, ensure_ascii=False) + "\n" if fmt == "jsonl" else example
+        records.append((content_digest(example), record))
+    return shard_index, records
+
+
+# ------------------------
+# Streaming dedupe and output
+# ------------------------
+class BloomFilter:
+    """Fixed-size set membership for content digests (false positives only, at `error_rate`)."""
+
+    def __init__(self, capacity, error_rate=1e-6):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, digest):
+        # Double hashing over two 64-bit halves of the SHA-256 digest.
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, digest):
+        """Adds the digest; returns False if it was (probably) already present."""
+        new = False
+        for pos in self._positions(digest):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+        return new
+
+
+def split_for(digest, val_ratio):
+    """Deterministic train/val assignment from the content hash."""
+    return "val" if int.from_bytes(digest[16:24], "little") % 10_000 < val_ratio * 10_000 else "train"
+
+
+class JsonlShardWriter:
+    extension = "jsonl"
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, line):
+        self._file.write(line)
+
+    def close(self):
+        self._file.close()
+
+
+class ArrowShardWriter:
+    """Arrow IPC stream files, readable with datasets.Dataset.from_file."""
+
+    extension = "arrow"
+    columns = ["prompt", "completion", "track", "subtopic", "type", "difficulty"]
+
+    def __init__(self, path, batch_size=1000):
+        import pyarrow as pa
+
+        self._pa = pa
+        self.path = path
+        self.batch_size = batch_size
+        self.schema = pa.schema([(c, pa.string()) for c in self.columns])
+        self._sink = pa.OSFile(path, "wb")
+        self._writer = pa.ipc.new_stream(self._sink, self.schema)
+        self._buffer = []
+
+    def write(self, example):
+        self._buffer.append(example)
+        if len(self._buffer) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            batch = self._pa.RecordBatch.from_pylist(self._buffer, schema=self.schema)
+            self._writer.write_batch(batch)
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        self._sink.close()
+
+
+WRITERS = {"jsonl": JsonlShardWriter, "arrow": ArrowShardWriter}
+
+
+def clear_shards(out_dir):
+    """Removes the shards and manifest of an earlier run, which could differ in size or format."""
+    for name in os.listdir(out_dir):
+        split, _, rest = name.partition("-")
+        if name == "manifest.json" or (split in ("train", "val") and rest.endswith(
+                tuple(f".{writer.extension}" for writer in WRITERS.values()))):
+            os.remove(os.path.join(out_dir, name))
+
+
+def generate_datasets(num_examples=300, out_dir="../data/raw/shards", shard_size=10_000, workers=None,
+                      seed=42, val_ratio=0.1, fmt="jsonl"):
+    """Generates `num_examples` unique examples into train/val shards under `out_dir`, replacing earlier ones."""
+    os.makedirs(out_dir, exist_ok=True)
+    clear_shards(out_dir)
+    writer_cls = WRITERS[fmt]
+    seen = BloomFilter(capacity=max(num_examples, 1_000))
+    counts = {"train": 0, "val": 0, "duplicates": 0}
+    shards = []
+    written = 0
+    next_shard = 0
+    started = time.perf_counter()
+
+    # Shards in flight at once: workers stay busy while finished shards wait at most one window
+    # before they are written, so memory does not grow with --num-examples.
+    window = 2 * (workers or os.cpu_count() or 1)
+    with Pool(processes=workers) as pool:
+        pending = deque()
+        while written < num_examples:
+            # Only as many shards as the missing examples need; later ones top up after duplicates.
+            while len(pending) < window and len(pending) * shard_size < num_examples - written:
+                pending.append(pool.apply_async(generate_shard, ((next_shard, shard_size, seed, fmt),)))
+                next_shard += 1
+            # Shards are written in index order, so the output does not depend on the worker count.
+            shard_index, records = pending.popleft().get()
+            writers, entries = {}, {}
+            added = 0
+            for digest, record in records:
+                if written >= num_examples:
+                    break
+                if not seen.add(digest):
+                    counts["duplicates"] += 1
+                    continue
+                split = split_for(digest, val_ratio)
+                if split not in writers:
+                    path = os.path.join(out_dir, f"{split}-{shard_index:05d}.{writer_cls.extension}")
+                    writers[split] = writer_cls(path)
+                    entries[split] = {"split": split, "file": os.path.basename(path), "records": 0}
+                    shards.append(entries[split])
+                writers[split].write(record)
+                entries[split]["records"] += 1
+                counts[split] += 1
+                written += 1
+                added += 1
+            for writer in writers.values():
+                writer.close()
+            del records
+
+            if written < num_examples and added < 0.01 * shard_size:
+                print("The template space is nearly exhausted; stopping before reaching --num-examples.")
+                break
+
+    manifest = {
+        "seed": seed,
+        "format": fmt,
+        "val_ratio": val_ratio,
+        "shard_size": shard_size,
+        "generation_shards": next_shard,
+        "train_examples": counts["train"],
+        "val_examples": counts["val"],
+        "duplicates_dropped": counts["duplicates"],
+        "shards": shards,
     }
-    
-    data = []
-    for _ in range(num_examples):
-        track = random.choice(tracks)
-        topic = random.choice(topics[track])
-        example_type = random.choice(["tutoring", "assessment"])
-        
-        example = generate_educational_example(track, "Curriculum", topic, example_type)
-        data.append(example)
-
-    # Split into training and validation sets
-    random.shuffle(data)
-    split_point = int(len(data) * 0.9)
-    train_data = data[:split_point]
-    val_data = data[split_point:]
-
-    # Save to JSON files
-    with open('../data/raw/raw_training_data.json', 'w') as f:
-        json.dump(train_data, f, indent=2)
-    with open('../data/raw/raw_validation_data.json', 'w') as f:
-        json.dump(val_data, f, indent=2)
-
-    print(f"Generated {len(train_data)} training examples.")
-    print(f"Generated {len(val_data)} validation examples.")
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    elapsed = time.perf_counter() - started
+    print(f"Generated {counts['train']} training examples.")
+    print(f"Generated {counts['val']} validation examples.")
+    print(f"Dropped {counts['duplicates']} duplicates in {elapsed:.1f}s "
+          f"({written / max(elapsed, 1e-9):.0f} examples/sec).")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-examples", type=int, default=300)
+    parser.add_argument("--out-dir", default="../data/raw/shards")
+    parser.add_argument("--shard-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the number of CPUs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--val-ratio", type=float, default=0.1)
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    args = parser.parse_args()
+    generate_datasets(
+        num_examples=args.num_examples,
+        out_dir=args.out_dir,
+        shard_size=args.shard_size,
+        workers=args.workers,
+        seed=args.seed,
+        val_ratio=args.val_ratio,
+        fmt=args.format,
+    )
+
 
 if __name__ == "__main__":
-    generate_datasets(num_examples=300)
\ No newline at end of file
+    main()
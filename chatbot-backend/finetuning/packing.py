@@ -0,0 +1,180 @@
+"""
+Tokenization cache, sequence packing and length-grouped batching for fine-tuning.
+
+The instruction/response examples produced by prepare_data.py are short, so padding each
+one to max_seq_length wastes most of every sequence. Packing places several examples in one
+sequence and keeps them independent through the padding-free path of transformers
+(DataCollatorWithFlattening):
+- position_ids restart at 0 for every example, and the attention implementation uses them
+  to keep tokens from attending across example boundaries,
+- the first token of each example is not used as a label for the previous one.
+
+Length grouping only changes anything with several examples per device batch, so the
+"group" strategy sets per_device_train_batch_size to GROUP_BATCH_SIZE (default 8).
+"""
+
+import hashlib
+import json
+import os
+
+import torch
+from datasets import Dataset, load_from_disk
+
+IGNORE_INDEX = -100
+GROUP_BATCH_SIZE = int(os.getenv("GROUP_BATCH_SIZE", "8"))
+
+
+def _cache_key(dataset, tokenizer, max_length):
+    """Identifies a tokenized dataset by source data, tokenizer and truncation length."""
+    payload = {
+        "data": getattr(dataset, "_fingerprint", None) or len(dataset),
+        "tokenizer": getattr(tokenizer, "name_or_path", type(tokenizer).__name__),
+        "vocab": len(tokenizer),
+        "eos": tokenizer.eos_token_id,
+        "max_length": max_length,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def tokenize_and_cache(dataset, tokenizer, max_length=256, cache_dir="../data/tokenized", text_field="text"):
+    """
+    Tokenizes `text_field` without padding (EOS appended, truncated to max_length) and
+    caches the result on disk. Re-runs with the same data and tokenizer load the cache.
+    """
+    path = os.path.join(cache_dir, _cache_key(dataset, tokenizer, max_length))
+    if os.path.exists(os.path.join(path, "dataset_info.json")):
+        print(f"Loading tokenized dataset from cache: {path}")
+        return load_from_disk(path)
+
+    eos = tokenizer.eos_token_id
+
+    def tokenize_function(examples):
+        tokenized = tokenizer(
+            examples[text_field],
+            truncation=True,
+            max_length=max_length - 1,
+            padding=False,
+            return_tensors=None,
+        )
+        input_ids = [ids + [eos] for ids in tokenized["input_ids"]]
+        return {"input_ids": input_ids, "length": [len(ids) for ids in input_ids]}
+
+    tokenized = dataset.map(
+        tokenize_function,
+        batched=True,
+        remove_columns=dataset.column_names,
+        desc="Tokenizing dataset",
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    tokenized.save_to_disk(path)
+    print(f"Tokenized dataset cached to: {path}")
+    return tokenized
+
+
+def pack_dataset(tokenized, max_length=256):
+    """
+    Packs tokenized examples into sequences of at most max_length tokens using
+    first-fit-decreasing bin packing. Each row keeps `seq_lens` so the collator
+    can split it back into its examples.
+    """
+    lengths = tokenized["length"]
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+    bins = []       # list of example indices per packed sequence
+    remaining = []  # free tokens left in each bin
+    for idx in order:
+        size = min(lengths[idx], max_length)
+        for b, free in enumerate(remaining):
+            if size <= free:
+                bins[b].append(idx)
+                remaining[b] -= size
+                break
+        else:
+            bins.append([idx])
+            remaining.append(max_length - size)
+
+    all_ids = tokenized["input_ids"]
+
+    def rows():
+        for members in bins:
+            input_ids, seq_lens = [], []
+            for idx in members:
+                ids = all_ids[idx][:max_length]
+                input_ids.extend(ids)
+                seq_lens.append(len(ids))
+            yield {"input_ids": input_ids, "seq_lens": seq_lens, "length": len(input_ids)}
+
+    packed = Dataset.from_list(list(rows()))
+    efficiency = sum(lengths) / (len(bins) * max_length) if bins else 0.0
+    print(f"Packed {len(lengths)} examples into {len(bins)} sequences ({efficiency:.0%} of tokens are real).")
+    return packed
+
+
+class PackedCollator:
+    """
+    Unpacks each row into its examples (from seq_lens) and flattens the batch with
+    transformers' DataCollatorWithFlattening: one row without padding, position_ids restarting
+    at 0 for every example and the first label of each example ignored. Attention uses the
+    position_ids to keep examples apart, which flash_attention_2 supports from transformers
+    4.44 and sdpa/eager from 4.54 (with torch >= 2.6 and the model's use_cache off); no
+    attention mask is built here.
+    """
+
+    def __init__(self):
+        from transformers import DataCollatorWithFlattening
+
+        self.flatten = DataCollatorWithFlattening(return_position_ids=True, separator_id=IGNORE_INDEX)
+
+    def __call__(self, features):
+        examples = []
+        for f in features:
+            start = 0
+            for n in f["seq_lens"]:
+                examples.append({"input_ids": list(f["input_ids"][start:start + n])})
+                start += n
+        return self.flatten(examples, return_tensors="pt")
+
+
+class PaddedCollator:
+    """Classic one-example-per-row batches, padded to the longest row (used with length grouping)."""
+
+    def __init__(self, pad_token_id):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, features):
+        width = max(len(f["input_ids"]) for f in features)
+        input_ids, labels, attention_mask = [], [], []
+        for f in features:
+            ids = list(f["input_ids"])
+            pad = width - len(ids)
+            input_ids.append(ids + [self.pad_token_id] * pad)
+            labels.append(ids + [IGNORE_INDEX] * pad)
+            attention_mask.append([1] * len(ids) + [0] * pad)
+        return {
+            "input_ids": torch.tensor(input_ids, dtype=torch.long),
+            "labels": torch.tensor(labels, dtype=torch.long),
+            "attention_mask": torch.tensor(attention_mask, dtype=torch.long),
+        }
+
+
+def build_training_data(dataset, tokenizer, strategy="pack", max_length=256, cache_dir="../data/tokenized"):
+    """
+    Returns (dataset, data_collator, training_args_overrides) for one of:
+    - "pack":  several examples per sequence with isolated attention (needs an attention
+               implementation that honours packed position_ids, see PackedCollator),
+    - "group": one example per row, batches of GROUP_BATCH_SIZE grouped by length
+               (TrainingArguments.group_by_length; it has no effect with batches of one),
+    - "pad":   one example per row, no grouping (the previous behaviour).
+    """
+    tokenized = tokenize_and_cache(dataset, tokenizer, max_length=max_length, cache_dir=cache_dir)
+    # The collators pick their own fields; seq_lens/length must survive Trainer's column pruning.
+    overrides = {"remove_unused_columns": False}
+    if strategy == "pack":
+        return pack_dataset(tokenized, max_length), PackedCollator(), overrides
+    if strategy == "group":
+        overrides.update({"group_by_length": True, "length_column_name": "length",
+                          "per_device_train_batch_size": GROUP_BATCH_SIZE})
+        return tokenized, PaddedCollator(tokenizer.pad_token_id), overrides
+    if strategy == "pad":
+        return tokenized, PaddedCollator(tokenizer.pad_token_id), overrides
+    raise ValueError(f"Unknown batching strategy: {strategy}")
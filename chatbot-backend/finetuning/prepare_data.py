@@ -1,37 +1,302 @@
+"""
+Prepares the raw fine-tuning data as memory-mapped Arrow datasets.
+
+Every raw source (JSON arrays, JSONL files, and the JSONL/Arrow shards listed in the
+manifest.json of generate_dataset.py) is streamed record by record through `Dataset.from_generator`, so
+no source is ever loaded whole. Each run only processes records that earlier runs have
+not seen (tracked per source in data/processed/manifest.json) and saves them as a new
+part under data/processed/parts/<split>/. `load_processed(split)` memory-maps and
+concatenates all parts.
+
+Each row carries provenance columns: source, source_record, content_hash, track.
+
+    python prepare_data.py            # process new records only
+    python prepare_data.py --rebuild  # start over
+"""
+
+import argparse
+import hashlib
 import json
-import os
-from datasets import Dataset
+import shutil
+from pathlib import Path
+
+from datasets import Dataset, Features, Value, concatenate_datasets, load_from_disk
+
+from generate_dataset import content_digest, split_for
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+RAW_DIR = DATA_DIR / "raw"
+PROCESSED_DIR = DATA_DIR / "processed"
+MANIFEST_PATH = PROCESSED_DIR / "manifest.json"
+SPLITS = ("train", "val")
+VAL_RATIO = 0.1
+
+FEATURES = Features({
+    "text": Value("string"),
+    "source": Value("string"),
+    "source_record": Value("int64"),
+    "content_hash": Value("string"),
+    "track": Value("string"),
+})
+
+
+def format_example(entry):
+    """Formats one prompt/completion pair as a single training string."""
+    return f"### Instruction:\n{entry['prompt']}\n\n### Response:\n{entry['completion']}"
+
+
+# ------------------------
+# Streaming readers
+# ------------------------
+def _iter_json_array(path, chunk_size=1 << 20):
+    """Yields the elements of a top-level JSON array without loading the file."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size)
+        pos = buffer.index("[") + 1
+        eof = False
+        while True:
+            # Skip separators between elements.
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                more = f.read(chunk_size)
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+            if pos >= len(buffer) or buffer[pos] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield value
+            pos = end
+            if pos > chunk_size:
+                buffer, pos = buffer[pos:], 0
+
+
+def _is_json_array(path):
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                return ch == "["
+
+
+def iter_source(path, skip=0, end_offset=None, start_offset=0):
+    """
+    Yields (record_index, record) for one source, starting after `skip` records.
+    JSONL files are resumed by byte offset instead of re-reading the skipped lines.
+    """
+    path = Path(path)
+    if path.suffix == ".arrow":
+        import pyarrow as pa
+
+        with pa.memory_map(str(path), "r") as source:
+            index = 0
+            for batch in pa.ipc.open_stream(source):
+                for row in batch.to_pylist():
+                    if index >= skip:
+                        yield index, row
+                    index += 1
+        return
+
+    if _is_json_array(path):
+        for index, row in enumerate(_iter_json_array(path)):
+            if index >= skip:
+                yield index, row
+        return
+
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        index = skip
+        while end_offset is None or f.tell() < end_offset:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                yield index, json.loads(line)
+                index += 1
+
+
+# ------------------------
+# Source planning (what is new since the last run)
+# ------------------------
+def discover_sources(raw_dir=RAW_DIR):
+    """Raw sources and the split their records belong to ("hash" = decided per record)."""
+    sources = []
+    fixed = {"raw_training_data.json": "train", "raw_validation_data.json": "val"}
+    for name, split in fixed.items():
+        if (raw_dir / name).exists():
+            sources.append({"path": raw_dir / name, "split": split})
+    if (raw_dir / "directed_dataset.jsonl").exists():
+        sources.append({"path": raw_dir / "directed_dataset.jsonl", "split": "hash"})
+    # Only the shards of the latest generation run, as listed in its manifest; files left over
+    # from an earlier run (another size or format) are not part of the dataset.
+    shard_manifest = raw_dir / "shards" / "manifest.json"
+    if shard_manifest.exists():
+        with open(shard_manifest, encoding="utf-8") as f:
+            shards = json.load(f)["shards"]
+        for shard in shards:
+            sources.append({"path": raw_dir / "shards" / shard["file"], "split": shard["split"]})
+    return sources
+
+
+def _head_length(size):
+    # Half the file at most, so appending (or moving a closing "]") never touches the sampled head.
+    return min(4096, size // 2)
+
+
+def _head_digest(path, length):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _count_records(path):
+    return sum(1 for _ in iter_source(path))
+
+
+def _scan_jsonl(path, offset):
+    """
+    Returns (end_offset, records) for the whole lines after `offset`. A trailing line that is
+    still being written (not valid JSON yet) is left for the next run.
+    """
+    records = 0
+    end = offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+            end += len(line)
+            if line.strip():
+                records += 1
+    return end, records
+
+
+def plan_sources(sources, manifest):
+    """Works out, per source, which records are new. Rewritten sources are processed again."""
+    plans = []
+    for source in sources:
+        path = Path(source["path"])
+        key = str(path.relative_to(DATA_DIR)) if path.is_relative_to(DATA_DIR) else str(path)
+        state = manifest.get(key, {})
+        size = path.stat().st_size
+        if state and (state["size"] > size or _head_digest(path, state["head_len"]) != state["head"]):
+            print(f"{key} was rewritten; processing it again (use --rebuild to drop its old rows).")
+            state = {}
+        if state.get("size") == size:
+            continue  # unchanged
+
+        head_len = _head_length(size)
+        plan = {"key": key, "path": str(path), "split": source["split"], "size": size,
+                "head": _head_digest(path, head_len), "head_len": head_len, "skip": state.get("records", 0)}
+        if path.suffix == ".jsonl" and not _is_json_array(path):
+            plan["start_offset"] = state.get("offset", 0)
+            plan["end_offset"], new_records = _scan_jsonl(path, plan["start_offset"])
+            plan["records"] = plan["skip"] + new_records
+            plan["size"] = plan["end_offset"]
+        else:
+            plan["records"] = _count_records(path)
+        if plan["records"] > plan["skip"]:
+            plans.append(plan)
+    return plans
+
+
+def generate_rows(plans, split, val_ratio=VAL_RATIO):
+    """Generator for Dataset.from_generator: new rows of `split` from every planned source."""
+    for plan in plans:
+        if plan["split"] not in (split, "hash"):
+            continue
+        source_name = Path(plan["path"]).name
+        records = iter_source(plan["path"], skip=plan["skip"],
+                              start_offset=plan.get("start_offset", 0), end_offset=plan.get("end_offset"))
+        for index, entry in records:
+            if index >= plan["records"]:
+                break
+            if "prompt" not in entry or "completion" not in entry:
+                continue
+            digest = content_digest(entry)
+            if plan["split"] == "hash" and split_for(digest, val_ratio) != split:
+                continue
+            yield {
+                "text": format_example(entry),
+                "source": source_name,
+                "source_record": index,
+                "content_hash": digest.hex()[:16],
+                "track": entry.get("track"),
+            }
+
+
+# ------------------------
+# Processed parts
+# ------------------------
+def _load_manifest():
+    if MANIFEST_PATH.exists():
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    return {"sources": {}, "parts": {split: [] for split in SPLITS}}
+
+
+def load_processed(split, processed_dir=PROCESSED_DIR):
+    """Memory-maps every processed part of `split` (falls back to the legacy single-directory layout)."""
+    parts_dir = Path(processed_dir) / "parts" / split
+    parts = sorted(p for p in parts_dir.glob("part-*") if p.is_dir()) if parts_dir.exists() else []
+    if not parts:
+        return load_from_disk(str(Path(processed_dir) / split))
+    return concatenate_datasets([load_from_disk(str(p)) for p in parts])
+
+
+def prepare(rebuild=False, val_ratio=VAL_RATIO):
+    if rebuild and (PROCESSED_DIR / "parts").exists():
+        shutil.rmtree(PROCESSED_DIR / "parts")
+    manifest = {"sources": {}, "parts": {split: [] for split in SPLITS}} if rebuild else _load_manifest()
+
+    plans = plan_sources(discover_sources(), manifest["sources"])
+    if not plans:
+        print("No new records; processed datasets are up to date.")
+        return
 
-def load_and_format_data(file_path):
-    """Loads a JSON file and formats it for fine-tuning."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        # Load the raw data from the JSON file
-        raw_data = json.load(f)
+    for split in SPLITS:
+        dataset = Dataset.from_generator(
+            generate_rows,
+            features=FEATURES,
+            # Source sizes and offsets are part of gen_kwargs, so the datasets cache never
+            # returns rows from an older version of a source.
+            gen_kwargs={"plans": plans, "split": split, "val_ratio": val_ratio},
+        )
+        if len(dataset) == 0:
+            continue
+        part_name = f"part-{len(manifest['parts'][split]):05d}"
+        dataset.save_to_disk(str(PROCESSED_DIR / "parts" / split / part_name))
+        manifest["parts"][split].append({"name": part_name, "rows": len(dataset)})
+        print(f"{split}: added {len(dataset)} rows as {part_name}")
 
-    # Converting each entry into a single string for fine-tuning
-    formatted_data = []
-    for entry in raw_data:
-        formatted_example = f"### Instruction:\n{entry['prompt']}\n\n### Response:\n{entry['completion']}"
-        formatted_data.append({"text": formatted_example})
+    for plan in plans:
+        manifest["sources"][plan["key"]] = {
+            "head": plan["head"],
+            "head_len": plan["head_len"],
+            "size": plan["size"],
+            "records": plan["records"],
+            "offset": plan.get("end_offset", 0),
+        }
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    print("Datasets successfully processed and saved to data/processed.")
 
-    return Dataset.from_list(formatted_data)
 
 if __name__ == "__main__":
-    train_data_path = "./data/raw/raw_training_data.json"
-    val_data_path = "./data/raw/raw_validation_data.json"
-
-    # Loads and processes the datasets
-    train_dataset = load_and_format_data(train_data_path)
-    val_dataset = load_and_format_data(val_data_path)
-    
-    # Creates the processed directory if it doesn't exist
-    processed_dir_train = "../data/processed/train"
-    processed_dir_val = "../data/processed/val"
-    os.makedirs(processed_dir_train, exist_ok=True)
-    os.makedirs(processed_dir_val, exist_ok=True)
-
-    # Save the processed datasets to disk
-    train_dataset.save_to_disk(processed_dir_train)
-    val_dataset.save_to_disk(processed_dir_val)
-    
-    print("Datasets successfully processed and saved to data/processed.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="discard processed parts and start over")
+    parser.add_argument("--val-ratio", type=float, default=VAL_RATIO,
+                        help="validation share for sources without a fixed split")
+    args = parser.parse_args()
+    prepare(rebuild=args.rebuild, val_ratio=args.val_ratio)
@@ -1,54 +1,108 @@
+import os
+import sys
+from pathlib import Path
+
 import torch
-from datasets import load_from_disk
 from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
     BitsAndBytesConfig,
+    Trainer,
     TrainingArguments,
 )
 from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training
-from trl import SFTTrainer
 
-#  Configuration and Loading Datasets
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from packing import build_training_data  # noqa: E402
+from prepare_data import load_processed  # noqa: E402
+from src.core.tracks import TRACKS, track_slug  # noqa: E402
+
+#  Configuration
 MODEL_NAME = "google/gemma-2b"
-train_dataset = load_from_disk("../data/processed/train")
-val_dataset = load_from_disk("../data/processed/val")
-
-# Load Model with Quantization (cause I am using a CPU)
-bnb_config = BitsAndBytesConfig(
-    load_in_4bit=True,
-    bnb_4bit_quant_type="nf4",
-    bnb_4bit_compute_dtype=torch.float32,
-)
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_NAME,
-    quantization_config=bnb_config,
-    device_map="cpu"
-)
-model = prepare_model_for_kbit_training(model)
-
-# Configure LoRA
-peft_config = LoraConfig(r=8, lora_alpha=16, lora_dropout=0.05, bias="none", task_type="CAUSAL_LM")
-model = get_peft_model(model, peft_config)
-model.print_trainable_parameters()
-
-# Load Tokenizer and Run Trainer
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-tokenizer.pad_token = tokenizer.eos_token
-training_args = TrainingArguments(
-    output_dir="./finetuned_adapters",
-    per_device_train_batch_size=1,
-    gradient_accumulation_steps=8,
-    num_train_epochs=1,
-    logging_steps=5,
-    evaluation_strategy="steps",
-    eval_steps=5,
-    report_to="none",
-)
-trainer = SFTTrainer(model=model, train_dataset=train_dataset, eval_dataset=val_dataset, peft_config=peft_config, dataset_text_field="text", tokenizer=tokenizer, args=training_args, max_seq_length=256)
+MAX_SEQ_LENGTH = 256
+# "pack" (several examples per sequence), "group" (length-grouped batches) or "pad"
+BATCHING_STRATEGY = os.getenv("BATCHING_STRATEGY", "pack")
+# Unset: one adapter on all data. A track name (e.g. "MERN") or "all": one adapter per track,
+# saved to finetuned_adapters/<track slug> where the local backend picks it up by topic.
+FINETUNE_TRACK = os.getenv("FINETUNE_TRACK")
+ADAPTERS_DIR = "finetuned_adapters"
+
+
+def train(track=None):
+    output_dir = os.path.join(ADAPTERS_DIR, track_slug(track)) if track else ADAPTERS_DIR
+
+    # Loading Datasets
+    train_dataset = load_processed("train")
+    val_dataset = load_processed("val")
+    if track:
+        train_dataset = train_dataset.filter(lambda t: t == track, input_columns="track")
+        val_dataset = val_dataset.filter(lambda t: t == track, input_columns="track")
+        if len(train_dataset) == 0:
+            print(f"No training examples for track '{track}'; skipping.")
+            return
+
+    # Load Model with Quantization (cause I am using a CPU)
+    bnb_config = BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_quant_type="nf4",
+        bnb_4bit_compute_dtype=torch.float32,
+    )
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_NAME,
+        quantization_config=bnb_config,
+        device_map="cpu",
+        # Packed batches carry no attention mask; eager attention keeps their examples apart using
+        # the restarting position_ids (transformers >= 4.54, torch >= 2.6, and only without a KV cache).
+        attn_implementation="eager",
+    )
+    model.config.use_cache = False
+    model = prepare_model_for_kbit_training(model)
+
+    # Configure LoRA
+    peft_config = LoraConfig(r=8, lora_alpha=16, lora_dropout=0.05, bias="none", task_type="CAUSAL_LM")
+    model = get_peft_model(model, peft_config)
+    model.print_trainable_parameters()
+
+    # Load Tokenizer, tokenize (cached on disk) and pack the datasets
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    tokenizer.pad_token = tokenizer.eos_token
+    train_data, data_collator, batching_args = build_training_data(
+        train_dataset, tokenizer, strategy=BATCHING_STRATEGY, max_length=MAX_SEQ_LENGTH
+    )
+    val_data, _, _ = build_training_data(val_dataset, tokenizer, strategy=BATCHING_STRATEGY, max_length=MAX_SEQ_LENGTH)
+
+    training_args = TrainingArguments(**{
+        "output_dir": output_dir,
+        "per_device_train_batch_size": 1,
+        "gradient_accumulation_steps": 8,
+        "num_train_epochs": 1,
+        "logging_steps": 5,
+        "eval_strategy": "steps",
+        "eval_steps": 5,
+        "report_to": "none",
+        # "group" batching raises the per-device batch size, which length grouping needs
+        **batching_args,
+    })
+    trainer = Trainer(
+        model=model,
+        train_dataset=train_data,
+        eval_dataset=val_data,
+        data_collator=data_collator,
+        args=training_args,
+    )
+
+    print(f"Starting training for {track or 'all tracks'} on CPU with '{BATCHING_STRATEGY}' batching. "
+          "This will be very slow.")
+    trainer.train()
+
+    # Save the fine-tuned adapters
+    trainer.save_model(output_dir)
 
-print("Starting training on CPU. This will be very slow.")
-trainer.train()
 
-# Save the fine-tuned adapters
-trainer.save_model("finetuned_adapters")
\ No newline at end of file
+if __name__ == "__main__":
+    if FINETUNE_TRACK == "all":
+        for name in TRACKS:
+            train(name)
+    else:
+        train(FINETUNE_TRACK)
@@ -1,5 +1,4 @@
 import torch
-from datasets import load_from_disk
 from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
@@ -14,6 +13,9 @@ import transformers
 import peft
 import trl
 
+from packing import build_training_data
+from prepare_data import PROCESSED_DIR, load_processed
+
 # Print versions for debugging
 print(f"Transformers version: {transformers.__version__}")
 print(f"PEFT version: {peft.__version__}")
@@ -34,14 +36,10 @@ if torch.cuda.is_available():
     print(f"GPU memory: {torch.cuda.get_device_properties(0).total_memory / 1e9:.2f} GB")
 
 # Load Datasets
-train_dataset_path = "data/processed/train"
-val_dataset_path = "data/processed/val"
-
-assert os.path.exists(train_dataset_path), f"Training dataset not found: {train_dataset_path}"
-assert os.path.exists(val_dataset_path), f"Validation dataset not found: {val_dataset_path}"
+assert os.path.exists(PROCESSED_DIR), f"Processed datasets not found: {PROCESSED_DIR} (run prepare_data.py)"
 
-train_dataset = load_from_disk(train_dataset_path)
-val_dataset = load_from_disk(val_dataset_path)
+train_dataset = load_processed("train")
+val_dataset = load_processed("val")
 
 print(f"Train dataset size: {len(train_dataset)}")
 print(f"Val dataset size: {len(val_dataset)}")
@@ -51,28 +49,17 @@ print("Train dataset columns:", train_dataset.column_names if hasattr(train_data
 print("Sample data:", train_dataset[0] if len(train_dataset) > 0 else "Empty dataset")
 
 #  Preprocess Datasets for Sequence Length
+BATCHING_STRATEGY = os.getenv("BATCHING_STRATEGY", "pack")
+
 def preprocess_dataset(dataset, max_length=256):
-    """Preprocess dataset to handle sequence length"""
-    def tokenize_function(examples):
-        # Tokenize the text
-        tokenized = tokenizer(
-            examples["text"],
-            truncation=True,
-            padding=False,  
-            max_length=max_length,
-            return_tensors=None,
-        )
-        return tokenized
-    
-    # Apply tokenization
-    tokenized_dataset = dataset.map(
-        tokenize_function,
-        batched=True,
-        remove_columns=dataset.column_names,
-        desc="Tokenizing dataset"
+    """Tokenize (cached on disk) and pack/group the dataset; returns (dataset, collator, training_args overrides)"""
+    return build_training_data(
+        dataset,
+        tokenizer,
+        strategy=BATCHING_STRATEGY,
+        max_length=max_length,
+        cache_dir="data/tokenized",
     )
-    
-    return tokenized_dataset
 
 # Loading Tokenizer
 try:
@@ -87,8 +74,8 @@ if tokenizer.pad_token is None:
 
 # Preprocess datasets with tokenization
 print("Preprocessing datasets...")
-train_dataset_processed = preprocess_dataset(train_dataset, max_length=256)
-val_dataset_processed = preprocess_dataset(val_dataset, max_length=256)
+train_dataset_processed, data_collator, batching_args = preprocess_dataset(train_dataset, max_length=256)
+val_dataset_processed, _, _ = preprocess_dataset(val_dataset, max_length=256)
 
 print(f"Processed train dataset size: {len(train_dataset_processed)}")
 print(f"Processed val dataset size: {len(val_dataset_processed)}")
@@ -109,6 +96,9 @@ try:
         trust_remote_code=True,
         torch_dtype=torch.float16,
         low_cpu_mem_usage=True,
+        # Packed batches carry no attention mask; eager attention keeps their examples apart using
+        # the restarting position_ids (transformers >= 4.54, torch >= 2.6, and only without a KV cache).
+        attn_implementation="eager",
     )
 except Exception as e:
     print(f"Error with quantization config: {e}")
@@ -118,8 +108,11 @@ except Exception as e:
         device_map="auto",
         trust_remote_code=True,
         torch_dtype=torch.float16,
+        attn_implementation="eager",
     )
 
+model.config.use_cache = False
+
 # Preparing model for k-bit training
 try:
     model = prepare_model_for_kbit_training(model)
@@ -169,6 +162,7 @@ def create_training_args():
         "learning_rate": 2e-4,
         "warmup_steps": 10,
         "report_to": "none",
+        **batching_args,
     }
     
     # Add optional parameters based on version compatibility
@@ -201,58 +195,37 @@ training_args = create_training_args()
 # SFTTrainer - Version Compatible
 def create_sft_trainer():
     """Create SFTTrainer with version-compatible parameters"""
-    
-    # Starting with absolutely minimal parameters
-    minimal_args = {
+
+    # The datasets are already tokenized and packed, so SFTTrainer must not re-tokenize them.
+    common_args = {
         "model": model,
-        "train_dataset": train_dataset,
+        "train_dataset": train_dataset_processed,
         "args": training_args,
+        "data_collator": data_collator,
     }
-    
-    # Trying to add parameters one by one to find what works
+
     try:
-        # Trying minimal first
-        print("Trying minimal SFTTrainer...")
+        # Newer TRL versions: skip dataset preparation explicitly
+        print("Trying SFTTrainer with pre-tokenized datasets...")
         return SFTTrainer(
-            model=model,
-            train_dataset=train_dataset,
-            args=training_args,
+            **common_args,
+            eval_dataset=val_dataset_processed,
+            dataset_kwargs={"skip_prepare_dataset": True},
         )
     except Exception as e:
-        print(f"Minimal SFTTrainer failed: {e}")
-    
+        print(f"SFTTrainer with dataset_kwargs failed: {e}")
+
     try:
         # Try with eval dataset
         print("Trying with eval_dataset...")
-        return SFTTrainer(
-            model=model,
-            train_dataset=train_dataset_processed,
-            eval_dataset=val_dataset_processed,
-            args=training_args,
-        )
+        return SFTTrainer(**common_args, eval_dataset=val_dataset_processed)
     except Exception as e:
         print(f"SFTTrainer with eval_dataset failed: {e}")
-    
-    try:
-        # Try with peft_config
-        print("Trying with peft_config...")
-        return SFTTrainer(
-            model=model,
-            train_dataset=train_dataset,
-            peft_config=peft_config,
-            args=training_args,
-        )
-    except Exception as e:
-        print(f"SFTTrainer with peft_config failed: {e}")
-    
+
     try:
         # Try with just model and args
         print("Trying absolute minimal...")
-        return SFTTrainer(
-            model=model,
-            train_dataset=train_dataset_processed,
-            args=training_args,
-        )
+        return SFTTrainer(**common_args)
     except Exception as e:
         print(f"All SFTTrainer attempts failed: {e}")
         raise e
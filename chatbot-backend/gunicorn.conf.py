@@ -0,0 +1,43 @@
+"""
+Production serving: gunicorn managing uvicorn workers forked from one preloaded master.
+
+    gunicorn -c gunicorn.conf.py src.main:app
+
+The app (templates, curriculum, local model weights and tokenizer) is imported once in the
+master and shared copy-on-write by the workers; see src/core/serving.py. Learner profiles and
+job state are kept in SQLite files under data/ so every worker sees the same data.
+
+    DIRECTED_WORKERS     worker processes (default: one per CPU core)
+    DIRECTED_BIND        listen address (default 0.0.0.0:8000)
+    DIRECTED_STATE_DB    shared learner state (default data/state.sqlite3 here)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent
+sys.path.insert(0, str(project_root))
+
+# Must be set before the app is imported in the master.
+os.environ.setdefault("DIRECTED_STATE_DB", str(project_root / "data" / "state.sqlite3"))
+# Rust tokenizers and OpenMP thread pools are not fork-safe once used; workers start their own.
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+from src.core.serving import after_fork, default_workers, freeze_preloaded  # noqa: E402
+
+bind = os.getenv("DIRECTED_BIND", "0.0.0.0:8000")
+workers = default_workers()
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("DIRECTED_WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    freeze_preloaded()
+
+
+def post_fork(server, worker):
+    after_fork(server.cfg.workers)
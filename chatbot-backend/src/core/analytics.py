@@ -0,0 +1,181 @@
+"""
+Cohort-wide learning analytics, updated incrementally on every logged interaction.
+
+LearningAnalyzer only keeps per-user lists, so a cohort view (most common struggling topics,
+completion rate per topic) would mean scanning every profile. CohortAnalytics is registered as
+a listener on the analyzer instead and keeps per-topic counters in NumPy arrays:
+
+    attempts / correct       interactions logged for the topic, and how many were "correct"
+    students                 distinct students who logged anything on the topic
+    completed / struggling   distinct students with the topic in completed_quizzes /
+                             struggling_topics (the same rule as the analyzer's profiles)
+
+Interactions are also counted in two ring buffers of time buckets (hourly for a week, daily
+for 90 days). Cohort queries touch the topic arrays only, so their cost depends on the number
+of topics and buckets, never on the number of students.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+HOUR = 3600
+DAY = 24 * HOUR
+# granularity -> (bucket width in seconds, buckets kept)
+GRANULARITIES = {"hour": (HOUR, 7 * 24), "day": (DAY, 90)}
+INITIAL_TOPICS = 64
+
+# Columns of the per-topic counters and of each time bucket.
+ATTEMPTS, CORRECT, STUDENTS, COMPLETED, STRUGGLING = range(5)
+COUNTERS = ("attempts", "correct", "students", "completed", "struggling")
+
+
+class _BucketRing:
+    """Fixed number of time buckets of (attempts, correct) per topic; old buckets are reused."""
+
+    def __init__(self, width: int, size: int, topics: int):
+        self.width = width
+        self.size = size
+        self.counts = np.zeros((size, topics, 2), dtype=np.int64)
+        # Bucket number (timestamp // width) currently held by each slot, -1 when empty.
+        self.bucket_ids = np.full(size, -1, dtype=np.int64)
+        self.latest = -1
+
+    def grow(self, topics: int) -> None:
+        grown = np.zeros((self.size, topics, 2), dtype=np.int64)
+        grown[:, :self.counts.shape[1]] = self.counts
+        self.counts = grown
+
+    def add(self, timestamp: float, topic: int, correct: bool) -> None:
+        """Counts an event; late events older than the ring's window are dropped."""
+        bucket = int(timestamp // self.width)
+        self.latest = max(self.latest, bucket)
+        slot = bucket % self.size
+        # A slot holding a newer bucket must not be reset by a late event.
+        if bucket <= self.latest - self.size or self.bucket_ids[slot] > bucket:
+            return
+        if self.bucket_ids[slot] != bucket:
+            self.counts[slot] = 0
+            self.bucket_ids[slot] = bucket
+        self.counts[slot, topic, 0] += 1
+        if correct:
+            self.counts[slot, topic, 1] += 1
+
+    def series(self, now: float, periods: int, topic: Optional[int]) -> List[Dict[str, Any]]:
+        """The last `periods` buckets, oldest first (empty buckets included)."""
+        current = int(now // self.width)
+        periods = min(periods, self.size)
+        wanted = np.arange(current - periods + 1, current + 1)
+        slots = wanted % self.size
+        live = self.bucket_ids[slots] == wanted
+        counts = self.counts[slots][:, topic] if topic is not None else self.counts[slots].sum(axis=1)
+        counts = np.where(live[:, None], counts, 0)
+        return [
+            {"start": int(bucket * self.width), "attempts": int(row[0]), "correct": int(row[1])}
+            for bucket, row in zip(wanted, counts)
+        ]
+
+
+class CohortAnalytics:
+    """Incremental per-topic counters and time-bucketed rollups for the whole cohort."""
+
+    def __init__(self, initial_topics: int = INITIAL_TOPICS):
+        self._lock = threading.Lock()
+        self.topic_index: Dict[str, int] = {}
+        self.topics: List[str] = []
+        self.counters = np.zeros((initial_topics, len(COUNTERS)), dtype=np.int64)
+        self.rings = {name: _BucketRing(width, size, initial_topics) for name, (width, size) in GRANULARITIES.items()}
+        self.student_count = 0
+        self.event_count = 0
+
+    def _topic(self, topic: str) -> int:
+        index = self.topic_index.get(topic)
+        if index is None:
+            index = self.topic_index[topic] = len(self.topics)
+            self.topics.append(topic)
+            if index == self.counters.shape[0]:
+                capacity = 2 * self.counters.shape[0]
+                grown = np.zeros((capacity, len(COUNTERS)), dtype=np.int64)
+                grown[:index] = self.counters
+                self.counters = grown
+                for ring in self.rings.values():
+                    ring.grow(capacity)
+        return index
+
+    # Listener signature expected by LearningAnalyzer.add_listener.
+    def record(self, user_id: str, topic: str, performance: str, changes: Dict[str, Any],
+               timestamp: Optional[float] = None) -> None:
+        """
+        Counts one interaction. `changes` says what it changed in the user's profile:
+        new_student, first_attempt (first event on this topic), completed, struggling, timestamp.
+        """
+        if timestamp is None:
+            timestamp = changes.get("timestamp") or time.time()
+        correct = performance == "correct"
+        with self._lock:
+            index = self._topic(topic)
+            row = self.counters[index]
+            row[ATTEMPTS] += 1
+            row[CORRECT] += correct
+            row[STUDENTS] += changes.get("first_attempt", False)
+            row[COMPLETED] += changes.get("completed", False)
+            row[STRUGGLING] += changes.get("struggling", False)
+            self.student_count += changes.get("new_student", False)
+            self.event_count += 1
+            for ring in self.rings.values():
+                ring.add(timestamp, index, correct)
+
+    # ------------------------
+    # Cohort queries
+    # ------------------------
+    def _view(self) -> np.ndarray:
+        return self.counters[:len(self.topics)]
+
+    def topic_stats(self, topics: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            view = self._view().copy()
+            names = list(self.topics)
+        if topics is not None:
+            keep = [self.topic_index[t] for t in topics if t in self.topic_index]
+            view, names = view[keep], [names[i] for i in keep]
+        rates = np.divide(view[:, COMPLETED], view[:, STUDENTS],
+                          out=np.zeros(len(names)), where=view[:, STUDENTS] > 0)
+        return [
+            {"topic": name, **{column: int(value) for column, value in zip(COUNTERS, row)},
+             "completion_rate": round(float(rate), 4)}
+            for name, row, rate in zip(names, view, rates)
+        ]
+
+    def top_struggling(self, n: int = 5) -> List[Dict[str, Any]]:
+        """The `n` topics with the most struggling students."""
+        with self._lock:
+            struggling = self._view()[:, STRUGGLING].copy()
+            names = list(self.topics)
+        if not len(names) or n <= 0:
+            return []
+        n = min(n, len(names))
+        top = np.argpartition(-struggling, n - 1)[:n]
+        top = top[np.argsort(-struggling[top], kind="stable")]
+        return [{"topic": names[i], "struggling": int(struggling[i])} for i in top if struggling[i] > 0]
+
+    def timeline(self, granularity: str = "hour", periods: int = 24, topic: Optional[str] = None,
+                 now: Optional[float] = None) -> List[Dict[str, Any]]:
+        if granularity not in self.rings:
+            raise ValueError(f"granularity must be one of {tuple(self.rings)}, got {granularity!r}")
+        with self._lock:
+            if topic is not None and topic not in self.topic_index:
+                return []
+            index = self.topic_index.get(topic) if topic is not None else None
+            return self.rings[granularity].series(time.time() if now is None else now, periods, index)
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        return {
+            "students": self.student_count,
+            "events": self.event_count,
+            "top_struggling": self.top_struggling(top),
+            "topics": self.topic_stats(),
+        }
@@ -0,0 +1,451 @@
+"""
+Memory-mapped, int8-quantized HNSW index: the "mmap" vector-store backend
+(DIRECTED_VECTOR_STORE=mmap, see vectorstore.py).
+
+Chroma loads every collection's float32 vectors and HNSW graph into the heap of each process.
+Here a collection is a directory of flat files under db/ann/<collection>/ that every process
+maps read-only, so the page cache holds a single copy for all server workers:
+
+    codes.npy        int8 vectors (one scale and offset per dimension in quant.npy), searched
+    vectors.npy      float32 vectors, read only for the candidates that are re-ranked
+    layer0.npy       neighbour lists of the HNSW base layer (-1 padded)
+    upper_<L>.npy    nodes of upper layer L; upper_<L>_links.npy their neighbour lists
+    column_<i>.npy   metadata values as codes, for equality filters such as {"track": "MERN"}
+    documents.jsonl  chunk text and metadata, located through offsets.npy
+    index.json       sizes, parameters, entry point and the metadata value tables
+
+A search descends the upper layers greedily, explores the base layer with a beam of
+DIRECTED_ANN_EF candidates scored on the int8 codes, and re-ranks the best
+DIRECTED_ANN_RERANK x k of them with the float32 vectors. Scores are squared L2 distances,
+like Chroma's default space.
+
+The graph is built from exact neighbour lists (blockwise matrix products, so the build is
+quadratic in the number of chunks) pruned with the HNSW neighbour-selection heuristic. Near
+neighbours alone would leave clusters of the data unconnected, so every node also gets a few
+diversified random long-range links, and a repair pass then links each node that the entry
+point still cannot reach. Collections are rebuilt by ingestion rather than appended to.
+
+    DIRECTED_ANN_M        near neighbours per node on the upper layers, twice that on the base (default 16)
+    DIRECTED_ANN_EF       search beam width (default 64)
+    DIRECTED_ANN_RERANK   candidates re-ranked per requested result (default 4)
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import mmap
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from .vectorstore import VectorStoreConnection
+
+logger = logging.getLogger("DirectEd")
+
+INDEX_FILE = "index.json"
+ANN_DIRECTORY = "ann"
+BLOCK_ROWS = 1024
+MAX_LEVEL = 16
+# Long-range links per node, as a share of its near neighbours.
+LONG_RANGE_SHARE = 0.125
+
+
+# ------------------------
+# Building
+# ------------------------
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """int8 codes and a (2, dim) array of per-dimension scale and offset: vector ~ codes * scale + offset."""
+    low, high = vectors.min(axis=0), vectors.max(axis=0)
+    scale = (high - low) / 255.0
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint((vectors - low) / scale) - 128, -128, 127).astype(np.int8)
+    return codes, np.stack([scale, low + 128 * scale]).astype(np.float32)
+
+
+def _exact_neighbours(vectors: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The `count` nearest other rows of every row, closest first, as (ids, squared distances)."""
+    n = len(vectors)
+    count = min(count, n - 1)
+    norms = np.einsum("ij,ij->i", vectors, vectors)
+    ids = np.empty((n, count), dtype=np.int64)
+    distances = np.empty((n, count), dtype=np.float32)
+    for start in range(0, n, BLOCK_ROWS):
+        stop = min(n, start + BLOCK_ROWS)
+        block = norms[start:stop, None] - 2 * vectors[start:stop] @ vectors.T + norms[None, :]
+        block[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        nearest = np.argpartition(block, count - 1, axis=1)[:, :count]
+        nearest_distances = np.take_along_axis(block, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1)
+        ids[start:stop] = np.take_along_axis(nearest, order, axis=1)
+        distances[start:stop] = np.take_along_axis(nearest_distances, order, axis=1)
+    return ids, np.maximum(distances, 0)
+
+
+def _select_neighbours(vectors: np.ndarray, candidates: np.ndarray, distances: np.ndarray, m: int) -> np.ndarray:
+    """
+    HNSW heuristic: keep a candidate (closest first) only if it is nearer to the node than to any
+    kept one. Returns positions in `candidates`.
+    """
+    points = vectors[candidates]
+    norms = np.einsum("ij,ij->i", points, points)
+    pairwise = norms[:, None] - 2 * points @ points.T + norms[None, :]
+    kept: List[int] = []
+    for j in range(len(candidates)):
+        if not kept or (pairwise[j, kept] > distances[j]).all():
+            kept.append(j)
+            if len(kept) == m:
+                break
+    return np.asarray(kept, dtype=np.int64)
+
+
+def _long_range(points: np.ndarray, i: int, near: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Up to `count` links from node `i` to random nodes outside its near neighbours, diversified
+    with the HNSW heuristic. Exact neighbour lists alone stay inside clusters of the data; these
+    links are what lets a search cross from one cluster to another.
+    """
+    sample = np.unique(rng.integers(0, len(points), 4 * count))
+    sample = sample[(sample != i) & ~np.isin(sample, near)]
+    if not len(sample):
+        return sample
+    distances = np.einsum("ij,ij->i", points[sample] - points[i], points[sample] - points[i])
+    order = np.argsort(distances)
+    sample, distances = sample[order], distances[order]
+    return sample[_select_neighbours(points, sample, distances, count)]
+
+
+def _reachable(table: np.ndarray, start: np.ndarray, reached: np.ndarray) -> np.ndarray:
+    """Marks in `reached` every node that the `start` nodes lead to (breadth first, in place)."""
+    frontier = np.asarray(start, dtype=np.int64)
+    reached[frontier] = True
+    while len(frontier):
+        following = table[frontier].ravel()
+        following = np.unique(following[following >= 0])
+        frontier = following[~reached[following]]
+        reached[frontier] = True
+    return reached
+
+
+def _connect(points: np.ndarray, table: np.ndarray, entry: int) -> int:
+    """
+    Links every node that a search from `entry` cannot reach from its nearest reachable node
+    (one with a free slot when there is one, else its last link is replaced). Returns the number
+    of links added.
+    """
+    reached = _reachable(table, [entry], np.zeros(len(table), dtype=bool))
+    added = 0
+    while not reached.all():
+        node = int(np.argmin(reached))
+        sources = np.flatnonzero(reached)
+        distances = np.einsum("ij,ij->i", points[sources] - points[node], points[sources] - points[node])
+        free = table[sources, -1] < 0
+        source = int(sources[np.argmin(np.where(free, distances, np.inf) if free.any() else distances)])
+        slots = np.flatnonzero(table[source] < 0)
+        replaced = len(slots) == 0
+        table[source, slots[0] if len(slots) else -1] = node
+        added += 1
+        if replaced:
+            # The dropped link may have been the only way to some nodes.
+            reached = _reachable(table, [entry], np.zeros(len(table), dtype=bool))
+        else:
+            _reachable(table, [node], reached)
+    return added
+
+
+def _build_layer(vectors: np.ndarray, nodes: np.ndarray, m: int, entry: int = 0,
+                 rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Neighbour lists (global ids, -1 padded) of the layer made of `nodes`: up to `m` near
+    neighbours pruned with the HNSW heuristic, then LONG_RANGE_SHARE x `m` long-range links.
+    Every node is reachable from `entry` (a position in `nodes`).
+    """
+    long_count = max(1, int(m * LONG_RANGE_SHARE))
+    links = np.full((len(nodes), m + long_count), -1, dtype=np.int32)
+    if len(nodes) < 2:
+        return links
+    rng = rng if rng is not None else np.random.default_rng(0)
+    points = vectors[nodes]
+    ids, distances = _exact_neighbours(points, 2 * m)
+    neighbours: List[Dict[int, float]] = [{} for _ in nodes]
+    for i in range(len(nodes)):
+        chosen = _select_neighbours(points, ids[i], distances[i], m)
+        for j, distance in zip(ids[i][chosen], distances[i][chosen]):
+            # Reverse edges keep nodes reachable that no close neighbour chose.
+            neighbours[i][int(j)] = float(distance)
+            neighbours[int(j)][i] = float(distance)
+    table = np.full(links.shape, -1, dtype=np.int64)
+    for i, found in enumerate(neighbours):
+        local = np.fromiter(found, dtype=np.int64, count=len(found))
+        local_distances = np.fromiter(found.values(), dtype=np.float32, count=len(found))
+        order = np.argsort(local_distances)
+        local, local_distances = local[order], local_distances[order]
+        if len(local) > m:
+            local = local[_select_neighbours(points, local, local_distances, m)]
+        far = _long_range(points, i, ids[i], long_count, rng)
+        row = np.concatenate([local, far])
+        table[i, :len(row)] = row
+    repaired = _connect(points, table, entry)
+    if repaired:
+        logger.debug("ANN layer of %d nodes: %d links added to reach every node", len(nodes), repaired)
+    links[table >= 0] = nodes[table[table >= 0]]
+    return links
+
+
+def build_index(directory: Path, texts: List[str], metadatas: List[Dict[str, Any]], vectors: np.ndarray,
+                m: int = 16, seed: int = 0) -> None:
+    """Writes a collection to `directory`, replacing any previous one there."""
+    directory = Path(directory)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    staging = directory.with_name(directory.name + ".building")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    codes, quant = quantize(vectors)
+    np.save(staging / "codes.npy", codes)
+    np.save(staging / "quant.npy", quant)
+    np.save(staging / "vectors.npy", vectors)
+
+    rng = np.random.default_rng(seed)
+    levels = np.minimum(np.floor(-np.log(1.0 - rng.random(count)) / math.log(m)), MAX_LEVEL).astype(np.int64)
+    top = int(levels.max()) if count else 0
+    entry = int(np.argmax(levels)) if count else -1
+    np.save(staging / "layer0.npy", _build_layer(vectors, np.arange(count), 2 * m, entry, rng))
+    for level in range(1, top + 1):
+        nodes = np.flatnonzero(levels >= level)
+        np.save(staging / f"upper_{level}.npy", nodes.astype(np.int32))
+        np.save(staging / f"upper_{level}_links.npy",
+                _build_layer(vectors, nodes, m, int(np.searchsorted(nodes, entry)), rng))
+
+    columns: Dict[str, List[Any]] = {}
+    for metadata in metadatas:
+        for key, value in metadata.items():
+            if isinstance(value, (str, int, float, bool)):
+                columns.setdefault(key, [])
+    for i, key in enumerate(columns):
+        values: Dict[Any, int] = {}
+        column = np.full(count, -1, dtype=np.int32)
+        for row, metadata in enumerate(metadatas):
+            if key in metadata:
+                column[row] = values.setdefault(metadata[key], len(values))
+        np.save(staging / f"column_{i}.npy", column)
+        columns[key] = list(values)
+
+    offsets = [0]
+    with open(staging / "documents.jsonl", "wb") as handle:
+        for text, metadata in zip(texts, metadatas):
+            line = json.dumps({"page_content": text, "metadata": metadata}).encode("utf-8") + b"\n"
+            handle.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(staging / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    info = {"count": count, "dim": dim, "m": m, "levels": top, "entry": entry, "columns": columns}
+    (staging / INDEX_FILE).write_text(json.dumps(info), encoding="utf-8")
+    # Processes that still map the old files keep reading them until they reopen the index.
+    shutil.rmtree(directory, ignore_errors=True)
+    staging.rename(directory)
+
+
+# ------------------------
+# Searching
+# ------------------------
+class AnnIndex:
+    """Read-only view of a collection directory; every array is memory-mapped."""
+
+    def __init__(self, directory: Path, ef: int = 64, rerank: int = 4):
+        self.directory = Path(directory)
+        info = json.loads((self.directory / INDEX_FILE).read_text(encoding="utf-8"))
+        self.count, self.dim, self.levels, self.entry = info["count"], info["dim"], info["levels"], info["entry"]
+        self.ef = ef
+        self.rerank = rerank
+
+        def load(name):
+            return np.load(self.directory / name, mmap_mode="r")
+
+        self.codes = load("codes.npy")
+        self.vectors = load("vectors.npy")
+        self.scale, self.offset = np.load(self.directory / "quant.npy")
+        self.layer0 = load("layer0.npy")
+        self.upper = [(np.load(self.directory / f"upper_{level}.npy"), load(f"upper_{level}_links.npy"))
+                      for level in range(1, self.levels + 1)]
+        self.offsets = load("offsets.npy")
+        self.columns = {key: (load(f"column_{i}.npy"), {value: code for code, value in enumerate(values)})
+                        for i, (key, values) in enumerate(info["columns"].items())}
+        self._masks: Dict[Tuple, np.ndarray] = {}
+        self._documents = None
+        if self.count:
+            with open(self.directory / "documents.jsonl", "rb") as handle:
+                self._documents = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _distances(self, query: np.ndarray, ids) -> np.ndarray:
+        approx = self.codes[ids].astype(np.float32) * self.scale + self.offset
+        return np.einsum("ij,ij->i", approx - query, approx - query)
+
+    def _mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Rows matching an equality filter ({"key": value} or {"key": {"$eq": value}}), cached."""
+        if not filter:
+            return None
+        conditions = filter["$and"] if set(filter) == {"$and"} else [{key: value} for key, value in filter.items()]
+        mask = None
+        for condition in conditions:
+            (key, value), = condition.items()
+            if isinstance(value, dict):
+                if set(value) != {"$eq"}:
+                    raise ValueError(f"Only equality filters are supported, got {condition}")
+                value = value["$eq"]
+            cache_key = (key, value)
+            if cache_key not in self._masks:
+                column, codes = self.columns.get(key, (None, {}))
+                code = codes.get(value)
+                self._masks[cache_key] = (np.asarray(column) == code) if code is not None else np.zeros(self.count, bool)
+            mask = self._masks[cache_key] if mask is None else mask & self._masks[cache_key]
+        return mask
+
+    def _greedy(self, query: np.ndarray, entry: int, distance: float, level: int) -> Tuple[int, float]:
+        nodes, links = self.upper[level - 1]
+        while True:
+            row = links[np.searchsorted(nodes, entry)]
+            row = row[row >= 0]
+            if not len(row):
+                return entry, distance
+            distances = self._distances(query, row)
+            best = int(distances.argmin())
+            if distances[best] >= distance:
+                return entry, distance
+            entry, distance = int(row[best]), float(distances[best])
+
+    def _search_base(self, query: np.ndarray, entry: int, distance: float, ef: int,
+                     allowed: Optional[np.ndarray]) -> List[Tuple[float, int]]:
+        visited = np.zeros(self.count, dtype=bool)
+        visited[entry] = True
+        candidates = [(distance, entry)]
+        results: List[Tuple[float, int]] = []  # max-heap of (-distance, id), allowed rows only
+        if allowed is None or allowed[entry]:
+            results.append((-distance, entry))
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if len(results) >= ef and distance > -results[0][0]:
+                break
+            row = self.layer0[node]
+            row = row[row >= 0]
+            row = row[~visited[row]]
+            if not len(row):
+                continue
+            visited[row] = True
+            bound = -results[0][0] if len(results) >= ef else math.inf
+            for neighbour_distance, neighbour in zip(self._distances(query, row).tolist(), row.tolist()):
+                if neighbour_distance < bound:
+                    heapq.heappush(candidates, (neighbour_distance, neighbour))
+                    if allowed is None or allowed[neighbour]:
+                        heapq.heappush(results, (-neighbour_distance, neighbour))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+                        if len(results) >= ef:
+                            bound = -results[0][0]
+        return sorted((-d, i) for d, i in results)
+
+    def search(self, query, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """(row, squared L2 distance) of the `k` nearest rows matching `filter`, closest first."""
+        allowed = self._mask(filter)
+        if not self.count or k <= 0 or (allowed is not None and not allowed.any()):
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        entry = self.entry
+        distance = float(self._distances(query, [entry])[0])
+        for level in range(self.levels, 0, -1):
+            entry, distance = self._greedy(query, entry, distance, level)
+        found = self._search_base(query, entry, distance, max(self.ef, k * self.rerank), allowed)
+        # Re-rank with full precision; sorted ids read the float32 file in order.
+        ids = np.sort([i for _, i in found[: k * self.rerank]])
+        exact = np.einsum("ij,ij->i", self.vectors[ids] - query, self.vectors[ids] - query)
+        best = np.argsort(exact)[:k]
+        return [(int(ids[i]), float(exact[i])) for i in best]
+
+    def document(self, row: int) -> Document:
+        record = json.loads(self._documents[int(self.offsets[row]):int(self.offsets[row + 1])])
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+
+class AnnVectorStore(VectorStore):
+    """LangChain vector store over an AnnIndex. Read-only: collections are rebuilt by ingestion."""
+
+    def __init__(self, index: AnnIndex, embedding: Any):
+        self.index = index
+        self._embedding = embedding
+
+    @property
+    def embeddings(self) -> Any:
+        return self._embedding
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        return [(self.index.document(row), score) for row, score in self.index.search(embedding, k, filter)]
+
+    # Same name and (distance) scores as LangChain's Chroma, which the connection layer relies on.
+    similarity_search_by_vector_with_relevance_scores = similarity_search_by_vector_with_score
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("AnnVectorStore is read-only; rebuild the collection with `python -m src.core.ingestion`")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Any, metadatas: Optional[List[dict]] = None,
+                   directory: Optional[Path] = None, m: int = 16, **kwargs: Any) -> "AnnVectorStore":
+        if directory is None:
+            raise ValueError("AnnVectorStore.from_texts needs the collection `directory`")
+        texts = list(texts)
+        build_index(directory, texts, metadatas or [{} for _ in texts], np.asarray(embedding.embed_documents(texts)), m=m)
+        return cls(AnnIndex(directory), embedding)
+
+
+class AnnConnection(VectorStoreConnection):
+    """Collections as memory-mapped index directories under <persist_directory>/ann/."""
+
+    mode = "mmap"
+
+    def __init__(self, embeddings: Any, persist_directory: Path, timeout: float = 10.0, max_concurrency: int = 16,
+                 m: int = 16, ef: int = 64, rerank: int = 4):
+        super().__init__(embeddings, persist_directory, timeout, max_concurrency)
+        self.m = m
+        self.ef = ef
+        self.rerank = rerank
+
+    def _path(self, name: str) -> Path:
+        return self.persist_directory / ANN_DIRECTORY / name
+
+    def _open(self, name: str) -> AnnVectorStore:
+        path = self._path(name)
+        if not (path / INDEX_FILE).exists():
+            raise FileNotFoundError(f"No index for collection {name} in {path}; build it with `python -m src.core.ingestion`")
+        return AnnVectorStore(AnnIndex(path, ef=self.ef, rerank=self.rerank), self.embeddings)
+
+    def _create(self, name: str, documents: List) -> AnnVectorStore:
+        texts = [doc.page_content for doc in documents]
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        build_index(self._path(name), texts, [dict(doc.metadata) for doc in documents], vectors, m=self.m)
+        logger.info("Built ANN index %s: %d vectors of dimension %d", name, *vectors.shape)
+        return self._open(name)
+
+    def delete_collection(self, name: str) -> None:
+        shutil.rmtree(self._path(name), ignore_errors=True)
@@ -0,0 +1,68 @@
+"""
+Debug endpoints for inspecting recent request behaviour in this process.
+"""
+
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from typing import Any, Dict, Optional
+
+from ..profiling import request_profiler
+from ..services.quiz_stream import quiz_stats
+from ..tracing import tracer
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Admin endpoints are disabled unless DIRECTED_ADMIN_TOKEN is set, and then require it."""
+    expected = request_profiler.admin_token
+    if expected is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled.")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+@router.get("/traces")
+async def get_slowest_traces(limit: int = Query(10, ge=1, le=200)) -> Dict[str, Any]:
+    """
+    Return the slowest traces currently held in the ring buffer, each as a span tree.
+    """
+    return {
+        "sample_rate": tracer.sample_rate,
+        "slow_ms": tracer.slow_ms,
+        "buffered": len(tracer.recent()),
+        "traces": tracer.slowest(limit),
+    }
+
+
+@router.get("/quiz_stats")
+async def get_quiz_stats() -> Dict[str, Any]:
+    """
+    Counters of schema-constrained quiz generation: attempts, retries and malformed questions.
+    """
+    return quiz_stats.to_dict()
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles() -> Dict[str, Any]:
+    """
+    List captured request profiles, newest first.
+    """
+    return {
+        "sample_rate": request_profiler.sample_rate,
+        "profiles": request_profiler.store.list(),
+    }
+
+
+@router.get("/profiles/{request_id}", dependencies=[Depends(require_admin)])
+async def download_profile(request_id: str, format: str = Query("speedscope", pattern="^(speedscope|collapsed)$")):
+    """
+    Download one profile as speedscope JSON (open at speedscope.app) or collapsed stacks.
+    """
+    path = request_profiler.store.path_for(request_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    media_type = "application/json" if format == "speedscope" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=path.name)
@@ -3,8 +3,13 @@ FastAPI router with endpoints that call into the chatbot/run_educational_assista
 This file expects pydantic request/response models in src.core.schemas.chat_models.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Any, Dict
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Iterator, Optional
+import asyncio
+import json
+import os
+import time
 
 # Import your pydantic models (must already exist in your repo)
 from ..schemas.chat_models import (
@@ -12,11 +17,19 @@ from ..schemas.chat_models import (
     ChatResponse,
     ContentGenerateRequest,
     ContentGenerateResponse,
-    AnalyticsResponse
+    AnalyticsResponse,
+    CohortAnalyticsResponse,
+    CohortTimelineResponse,
+    JobSubmitResponse,
+    JobStatusResponse
 )
 
 # Import the chatbot runtime and objects
-from ..chatbot import run_educational_assistant, content_generator, analyzer as global_analyzer
+from ..chatbot import run_educational_assistant, content_generator, analyzer as global_analyzer, cohort_analytics
+from ..jobs import SUCCEEDED, FAILED, job_queue
+from ..analytics import GRANULARITIES
+from .http_cache import (IMMUTABLE, BodyCache, body_etag, conditional_json, encoded_response, json_body,
+                         matching_etag, not_modified, version_etag)
 
 router = APIRouter()
 
@@ -45,27 +58,65 @@ async def unified_conversation_interface(request: ChatRequest) -> ChatResponse:
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
 
 
+# request_type aliases -> content kind (also the job type of background generation)
+CONTENT_KINDS = {
+    "quiz": "quiz",
+    "flashcard": "flashcards",
+    "flashcards": "flashcards",
+    "practice": "practice",
+    "practice_questions": "practice",
+}
+
+
+def _generate_content(kind: str, subject: str, num_items: int, level: str) -> Any:
+    """Runs the content generator and returns plain JSON-serialisable data."""
+    if kind == "quiz":
+        return content_generator.generate_quiz(subject, n=num_items, level=level).dict()
+    if kind == "flashcards":
+        return [c.dict() for c in content_generator.generate_flashcards(subject, n=num_items, level=level)]
+    return [q.dict() for q in content_generator.generate_practice(subject, n=num_items, level=level)]
+
+
+def _content_kind(request_type: str) -> str:
+    kind = CONTENT_KINDS.get(request_type.lower())
+    if kind is None:
+        raise HTTPException(status_code=400, detail="Invalid content type. Use 'quiz' or 'flashcard' or 'practice'.")
+    return kind
+
+
+for _kind in set(CONTENT_KINDS.values()):
+    job_queue.register(_kind, lambda params, kind=_kind: _generate_content(kind, **params))
+
+
+# Without an LLM, generated content is deterministic per request, so its serialised body and ETag
+# are reused for DIRECTED_CONTENT_CACHE_TTL_S seconds (default 300).
+content_cache = BodyCache(ttl=float(os.getenv("DIRECTED_CONTENT_CACHE_TTL_S", "300")))
+
+
+def _content_response(http_request: Request, request_type: str, subject: str, num_items: int,
+                      level: Optional[str], conditional: bool) -> Response:
+    kind = _content_kind(request_type)
+    build = lambda: ContentGenerateResponse(subject=subject, content=_generate_content(kind, subject, num_items, level))
+    if content_generator.llm is not None:
+        # LLM output differs on every call; there is nothing a client could revalidate.
+        body = json_body(build())
+        return encoded_response(http_request, body, body_etag(body), cache_control="no-store")
+    body, etag = content_cache.get_or_build((kind, subject, num_items, level), build)
+    held = matching_etag(http_request.headers.get("if-none-match"), etag) if conditional else None
+    if held is not None:
+        return not_modified(held)
+    return encoded_response(http_request, body, etag)
+
+
 @router.post("/api/assistant/content/generate", response_model=ContentGenerateResponse)
-async def generate_specific_content(request: ContentGenerateRequest) -> ContentGenerateResponse:
+async def generate_specific_content(request: ContentGenerateRequest, http_request: Request) -> Response:
     """
     Endpoint to generate quiz or flashcards explicitly.
-    Returns the structured content output.
+    Returns the structured content output. For large requests prefer /api/assistant/content/jobs.
     """
     try:
-        typ = request.request_type.lower()
-        if typ == "quiz":
-            quiz = content_generator.generate_quiz(request.subject, n=request.num_items, level=request.level)
-            content_value = quiz.dict()
-        elif typ in ("flashcard", "flashcards"):
-            cards = content_generator.generate_flashcards(request.subject, n=request.num_items, level=request.level)
-            content_value = [c.dict() for c in cards]
-        elif typ in ("practice", "practice_questions"):
-            qs = content_generator.generate_practice(request.subject, n=request.num_items, level=request.level)
-            content_value = [q.dict() for q in qs]
-        else:
-            raise HTTPException(status_code=400, detail="Invalid content type. Use 'quiz' or 'flashcard' or 'practice'.")
-
-        return ContentGenerateResponse(subject=request.subject, content=content_value)
+        return _content_response(http_request, request.request_type, request.subject, request.num_items,
+                                 request.level, conditional=False)
 
     except HTTPException as he:
         raise he
@@ -73,20 +124,144 @@ async def generate_specific_content(request: ContentGenerateRequest) -> ContentG
         raise HTTPException(status_code=500, detail=f"Failed to generate content: {e}")
 
 
+@router.get("/api/assistant/content/generate", response_model=ContentGenerateResponse)
+async def get_specific_content(http_request: Request, subject: str, request_type: str = "quiz",
+                               num_items: int = Query(5, ge=1, le=50),
+                               level: Optional[str] = "beginner") -> Response:
+    """
+    The same content as the POST form, as a cacheable GET: send the ETag back in If-None-Match
+    and an unchanged result is answered with 304 Not Modified.
+    """
+    try:
+        return _content_response(http_request, request_type, subject, num_items, level, conditional=True)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate content: {e}")
+
+
+@router.post("/api/assistant/content/quiz/stream")
+async def stream_quiz(request: ContentGenerateRequest) -> StreamingResponse:
+    """
+    Streams a quiz as NDJSON: one validated question per line as soon as the model has written
+    it, then {"done": true, "count": n}. A generation failure mid-stream ends with {"error": ...}.
+    """
+    def lines() -> Iterator[str]:
+        count = 0
+        try:
+            for question in content_generator.stream_quiz(request.subject, n=request.num_items, level=request.level):
+                count += 1
+                yield json.dumps({"question": question.dict()}) + "\n"
+            yield json.dumps({"done": True, "count": count}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Failed to generate quiz: {e}", "count": count}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/api/assistant/content/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_content_job(request: ContentGenerateRequest) -> JobSubmitResponse:
+    """
+    Queue content generation in the background and return a job id to poll.
+    An identical request that is still queued or running returns the existing job.
+    """
+    kind = _content_kind(request.request_type)
+    params = {"subject": request.subject, "num_items": request.num_items, "level": request.level}
+    try:
+        job, created = await job_queue.submit(kind, params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to queue content generation: {e}")
+    return JobSubmitResponse(job_id=job.id, status=job.status, deduplicated=not created)
+
+
+@router.get("/api/assistant/content/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_content_job(job_id: str) -> JobStatusResponse:
+    """
+    Status of a background content job.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return JobStatusResponse(job_id=job.id, type=job.type, status=job.status, attempts=job.attempts,
+                             created_at=job.created_at, started_at=job.started_at,
+                             finished_at=job.finished_at, error=job.error)
+
+
+@router.get("/api/assistant/content/jobs/{job_id}/result", response_model=ContentGenerateResponse)
+async def get_content_job_result(job_id: str, http_request: Request) -> Response:
+    """
+    Generated content of a finished job. 409 while it is still queued or running.
+    A finished result never changes, so it is served as immutable.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=f"Failed to generate content: {job.error}")
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+    return conditional_json(http_request, version_etag("job", job.id, job.finished_at),
+                            lambda: ContentGenerateResponse(subject=job.params["subject"], content=job.result),
+                            cache_control=IMMUTABLE)
+
+
+# Cohort routes are declared before /analytics/{user_id} so "cohort" is not taken as a user id.
+@router.get("/analytics/cohort", response_model=CohortAnalyticsResponse)
+async def get_cohort_analytics(http_request: Request, top: int = 5) -> Response:
+    """
+    Cohort-wide counters per topic (completion rates, struggling students) and the topics
+    most students struggle with. Served from incremental counters, not a scan of all profiles.
+    The ETag follows the number of events counted.
+    """
+    await asyncio.to_thread(global_analyzer.sync)
+    etag = version_etag("cohort", cohort_analytics.event_count, top)
+    return conditional_json(http_request, etag, lambda: CohortAnalyticsResponse(**cohort_analytics.summary(top=top)))
+
+
+@router.get("/analytics/cohort/timeline", response_model=CohortTimelineResponse)
+async def get_cohort_timeline(http_request: Request, granularity: str = "hour", periods: int = 24,
+                              topic: Optional[str] = None) -> Response:
+    """
+    Interactions and correct answers per hourly or daily bucket, optionally for one topic.
+    The ETag follows the number of events counted and the current bucket.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {tuple(GRANULARITIES)}, got {granularity!r}")
+    await asyncio.to_thread(global_analyzer.sync)
+    bucket = int(time.time() // GRANULARITIES[granularity][0])
+    etag = version_etag("timeline", cohort_analytics.event_count, bucket, granularity, periods, topic)
+
+    def build() -> CohortTimelineResponse:
+        try:
+            buckets = cohort_analytics.timeline(granularity=granularity, periods=periods, topic=topic)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return CohortTimelineResponse(granularity=granularity, topic=topic, buckets=buckets)
+
+    return conditional_json(http_request, etag, build)
+
+
 @router.get("/analytics/{user_id}", response_model=AnalyticsResponse)
-async def get_analytics_for_user(user_id: str) -> AnalyticsResponse:
+async def get_analytics_for_user(user_id: str, http_request: Request) -> Response:
     """
     Retrieve user analytics/profile from the shared analyzer instance.
+    The ETag comes from the profile's update counter, so a poll of an unchanged profile is
+    answered with 304 without reading or serialising it.
     """
     try:
-        profile = global_analyzer.get_profile(user_id)
-        if not profile:
-            raise HTTPException(status_code=404, detail="User not found.")
-        return AnalyticsResponse(
-            user_id=user_id,
-            completed_quizzes=profile.get("completed_quizzes", []),
-            struggling_topics=profile.get("struggling_topics", [])
-        )
+        etag = version_etag("analytics", user_id, global_analyzer.profile_version(user_id))
+
+        def build() -> AnalyticsResponse:
+            profile = global_analyzer.get_profile(user_id)
+            if not profile:
+                raise HTTPException(status_code=404, detail="User not found.")
+            return AnalyticsResponse(
+                user_id=user_id,
+                completed_quizzes=profile.get("completed_quizzes", []),
+                struggling_topics=profile.get("struggling_topics", [])
+            )
+
+        return conditional_json(http_request, etag, build)
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,179 @@
+"""
+Conditional and compressed JSON responses for endpoints whose bodies rarely change.
+
+A route passes the version of its resource (anything that changes whenever the body would,
+e.g. a profile's update counter) to `conditional_json`. A request whose If-None-Match names the
+current ETag gets 304 Not Modified before the body is built; otherwise the JSON is sent with a
+strong ETag, Cache-Control and Vary: Accept-Encoding. Bodies of at least
+DIRECTED_COMPRESS_MIN_BYTES (default 1024) are compressed with brotli (when installed) or gzip
+if the client accepts it; the coding is appended to the ETag ("<tag>-gzip") so each encoded
+representation has its own strong validator, and either form matches on revalidation.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("DIRECTED_COMPRESS_MIN_BYTES", "1024"))
+# Polled resources: the client may reuse a body only after revalidating it.
+REVALIDATE = "private, max-age=0, must-revalidate"
+IMMUTABLE = "private, max-age=31536000, immutable"
+_ENCODED_CACHE_SIZE = 256
+
+
+def version_etag(*parts: Any) -> str:
+    """Strong ETag for a resource version given as JSON-serialisable parts."""
+    raw = json.dumps(parts, default=str, separators=(",", ":")).encode()
+    return f'"{hashlib.blake2b(raw, digest_size=12).hexdigest()}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag of an exact body, for content whose version is only known once it is built."""
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def matching_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """
+    The entry of If-None-Match that matches `etag`, or None. The comparison is weak (RFC 9110
+    13.1.2), and an encoded variant ("<tag>-gzip") matches its base tag.
+    """
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    tag = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        opaque = candidate[2:] if candidate.startswith("W/") else candidate
+        if opaque.strip('"').split("-", 1)[0] == tag:
+            return opaque
+    return None
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The coding to send ("br" preferred, then "gzip") that Accept-Encoding allows, or None."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if weights.get(coding, weights.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+class _EncodedBodies:
+    """Recently compressed bodies by (ETag, coding), so repeated full downloads are not recompressed."""
+
+    def __init__(self, size: int = _ENCODED_CACHE_SIZE):
+        self.size = size
+        self._items: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str, coding: str, body: bytes) -> bytes:
+        key = (etag, coding)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        encoded = brotli.compress(body, quality=5) if coding == "br" else gzip.compress(body, compresslevel=6)
+        with self._lock:
+            self._items[key] = encoded
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return encoded
+
+
+encoded_bodies = _EncodedBodies()
+
+
+def _headers(etag: str, cache_control: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+
+def json_body(content: Any) -> bytes:
+    return json.dumps(jsonable_encoder(content), separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def encoded_response(request: Request, body: bytes, etag: str, cache_control: str = REVALIDATE,
+                     status_code: int = 200) -> Response:
+    """The JSON `body` with validators, compressed when it is large and the client accepts it."""
+    headers = _headers(etag, cache_control)
+    coding = negotiate_encoding(request.headers.get("accept-encoding")) if len(body) >= COMPRESS_MIN_BYTES else None
+    if coding is not None:
+        body = encoded_bodies.get(etag, coding, body)
+        headers["Content-Encoding"] = coding
+        headers["ETag"] = f'{etag[:-1]}-{coding}"'
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    return Response(status_code=304, headers=_headers(etag, cache_control))
+
+
+def conditional_json(request: Request, etag: str, build: Callable[[], Any],
+                     cache_control: str = REVALIDATE) -> Response:
+    """
+    304 when the request already holds `etag`, else the JSON of build() with that ETag.
+    Read the version the ETag comes from before the data build() serialises, so a concurrent
+    update can only make the body newer than its tag, never older.
+    """
+    held = matching_etag(request.headers.get("if-none-match"), etag)
+    if held is not None:
+        # Echo the variant the client holds (it may be an encoded one).
+        return not_modified(held, cache_control)
+    return encoded_response(request, json_body(build()), etag, cache_control)
+
+
+class BodyCache:
+    """
+    Serialised bodies and their ETags by key for `ttl` seconds (at most `size` entries), for
+    content that is deterministic per request but costly to build, such as fallback quizzes.
+    """
+
+    def __init__(self, ttl: float, size: int = 512):
+        self.ttl = ttl
+        self.size = size
+        self._items: "OrderedDict[Any, Tuple[float, bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Any, build: Callable[[], Any]) -> Tuple[bytes, str]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > now:
+                self._items.move_to_end(key)
+                return item[1], item[2]
+        body = json_body(build())
+        etag = body_etag(body)
+        with self._lock:
+            self._items[key] = (now + self.ttl, body, etag)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return body, etag
@@ -5,18 +5,24 @@ from __future__ import annotations
 import logging
 from typing import Optional, Dict, Any
 
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 # Local project imports (avoid importing heavy modules at top-level to prevent cycles)
 from .components import LearningAnalyzer
-from src.core.schemas.chat_models import ChatRequest, ChatResponse
+from .curriculum import SpacedRepetitionScheduler, load_curriculum
+from .prefetch import LessonPrefetcher
+from .state_store import learning_store_from_env
+from src.core.schemas.chat_models import AnswerRequest, AnswerResponse, ChatRequest, ChatResponse
 
 logger = logging.getLogger("DirectEd")
 logger.setLevel(logging.INFO)
 
 # Shared analyzer instance used by routes (stateful analyzers should be thread-safe)
-analyzer = LearningAnalyzer()
+analyzer = LearningAnalyzer(store=learning_store_from_env())
+# Next-topic selection: curriculum DAG + per-user review queues, fed by the analyzer's updates
+scheduler = SpacedRepetitionScheduler(load_curriculum())
+analyzer.add_listener(scheduler.record)
 
 # Create FastAPI app
 app = FastAPI(
@@ -40,10 +46,11 @@ async def root() -> Dict[str, str]:
 
 
 @app.post("/api/assistant/chat", response_model=ChatResponse)
-async def handle_user_request(request: ChatRequest):
+async def handle_user_request(request: ChatRequest, background_tasks: BackgroundTasks):
     """
     Handle a chat request and forward it to the educational assistant runner.
     We import run_educational_assistant lazily to avoid circular imports at module load time.
+    Once the response is sent, the user's next adaptive lesson is prefetched.
     """
     try:
         # Lazy import to avoid circular dependencies
@@ -60,6 +67,7 @@ async def handle_user_request(request: ChatRequest):
         if isinstance(response_data, dict) and response_data.get("error"):
             raise HTTPException(status_code=500, detail=response_data.get("details", "Internal error"))
 
+        background_tasks.add_task(prefetcher.schedule, request.user_id)
         return ChatResponse(
             user_type=response_data.get("user_type", "student"),
             content_type=response_data.get("content_type", "text"),
@@ -74,50 +82,67 @@ async def handle_user_request(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {exc}")
 
 
-def get_next_curriculum_topic(user_id: str) -> Optional[str]:
+def get_next_topic(user_id: str) -> Optional[str]:
     """
-    Decide next curriculum topic based on the user's profile.
-    This is synchronous and lightweight — keep DB calls or heavy ops out of the main thread.
+    Decide next curriculum topic for the user: the weakest topic that is due for review, or
+    the next unlocked topic whose prerequisites are mastered, or when nothing is due yet the one
+    that falls due first. O(log n) heap operations on the user's schedule, no profile scan.
+    None once every topic is mastered.
     """
     try:
-        profile = analyzer.get_profile(user_id=user_id)
+        analyzer.sync()  # answers logged by other server processes
+        return scheduler.next_lesson(user_id)
     except Exception as e:
-        logger.warning("Failed to fetch profile for user %s: %s", user_id, e)
+        logger.warning("Failed to schedule next topic for user %s: %s", user_id, e)
         return None
 
-    if not profile:
-        return None
 
-    struggling = profile.get("struggling_topics") or []
-    if struggling:
-        return f"explain {struggling[0]} to me in detail."
+def lesson_request(topic: str) -> str:
+    return f"explain {topic} to me in detail."
+
+
+def get_next_curriculum_topic(user_id: str) -> Optional[str]:
+    """The request the adaptive route would serve next, or None (see get_next_topic)."""
+    topic = get_next_topic(user_id)
+    return lesson_request(topic) if topic is not None else None
+
 
-    curriculum_topics = ["Langchain", "LLM reasoning", "Design"]
-    completed_topics = profile.get("completed_quizzes") or []
+def _generate_lesson(request: str):
+    # Lazy import to avoid circular dependencies with chatbot module
+    from .chatbot import generate_output
 
-    for topic in curriculum_topics:
-        if topic not in completed_topics:
-            return f"explain {topic} to me in detail."
+    return generate_output(request)
 
-    return None
+
+# Next adaptive lesson per user, generated in the background after each response and dropped
+# when the profile changes (see prefetch.py)
+prefetcher = LessonPrefetcher(next_request=get_next_curriculum_topic, generate=_generate_lesson,
+                              version=analyzer.profile_version)
+analyzer.add_listener(prefetcher.invalidate)
 
 
 @app.post("/api/assistant/adaptive_learning", response_model=ChatResponse)
-async def get_adaptive_content(user_id: str):
+async def get_adaptive_content(user_id: str, background_tasks: BackgroundTasks):
     """
-    Generate adaptive content for the next suggested curriculum topic for a user.
+    Generate adaptive content for the next suggested curriculum topic for a user, or serve the
+    lesson prefetched for it when it is still current.
     """
     try:
-        adaptive_request = get_next_curriculum_topic(user_id=user_id)
-        if not adaptive_request:
+        topic = get_next_topic(user_id=user_id)
+        if topic is None:
             # Return an informative ChatResponse if there's no next topic
+            if scheduler.finished(user_id):
+                output = "🎉 Congratulations! You have gone through the whole curriculum."
+            else:
+                output = "There is no lesson ready for you right now. Please try again in a moment."
             return ChatResponse(
                 user_type="student",
                 content_type="message",
-                output="🎉 Congratulations! You have gone through the whole curriculum.",
+                output=output,
                 updated_profile=analyzer.get_profile(user_id=user_id) or {},
             )
 
+        adaptive_request = lesson_request(topic)
         logger.info("Adaptive Learning generating content for user=%s request=%s", user_id, adaptive_request)
 
         # Lazy import to avoid circular dependencies with chatbot module
@@ -128,16 +153,20 @@ async def get_adaptive_content(user_id: str):
             user_id=user_id,
             analyzer=analyzer,
             is_instructor=False,
+            prefetched=prefetcher.take(user_id, adaptive_request),
         )
 
         if isinstance(response_data, dict) and response_data.get("error"):
             raise HTTPException(status_code=500, detail=response_data.get("details", "Internal error"))
 
+        background_tasks.add_task(prefetcher.schedule, user_id)
+
         return ChatResponse(
             user_type=response_data.get("user_type", "student"),
             content_type=response_data.get("content_type", "text"),
             output=response_data.get("output", ""),
             updated_profile=response_data.get("updated_profile", {}),
+            topic=topic,
         )
 
     except HTTPException:
@@ -145,3 +174,29 @@ async def get_adaptive_content(user_id: str):
     except Exception as exc:
         logger.exception("Error in /api/assistant/adaptive_learning handler: %s", exc)
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {exc}")
+
+
+@app.post("/api/assistant/answer", response_model=AnswerResponse)
+async def submit_answer(answer: AnswerRequest, background_tasks: BackgroundTasks):
+    """
+    Record whether the student answered a question on a curriculum topic correctly. Lessons are
+    only logged as requested, so answers are what raise mastery and unlock the topics that
+    depend on it.
+    """
+    topic = scheduler.graph.resolve(answer.topic)
+    if topic is None:
+        raise HTTPException(status_code=404, detail=f"Unknown curriculum topic: {answer.topic}")
+    analyzer.log_performance(answer.user_id, topic, "correct" if answer.correct else "incorrect")
+    background_tasks.add_task(prefetcher.schedule, answer.user_id)
+    return AnswerResponse(
+        user_id=answer.user_id,
+        topic=topic,
+        mastery=scheduler.progress(answer.user_id).get(topic, {}).get("mastery", 0.0),
+        updated_profile=analyzer.get_profile(user_id=answer.user_id) or {},
+    )
+
+
+@app.get("/debug/prefetch_stats")
+async def prefetch_stats() -> Dict[str, Any]:
+    """Lesson prefetch counters: hit rate of adaptive requests and share of prefetched lessons wasted."""
+    return prefetcher.to_dict()
@@ -4,19 +4,29 @@ Chatbot orchestration.
 - Instantiates the LLM (if creds available)
 - Builds retriever, content_generator, analyzer
 - Exposes run_educational_assistant(...) that your API and LangServe can call.
+- EducationalAssistantRunnable serves LangServe's /assistant/batch natively: inputs are grouped
+  by intent, tutoring queries are embedded in one call and retrieved concurrently, answers go
+  through the LLM's batch path, and all profile updates are written in one transaction.
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import os
 
 try:
-    from .components import EducationalRetriever, LearningAnalyzer
+    from .components import EducationalRetriever, LearningAnalyzer, PROMPT_TEMPLATES, ANSWER_TEMPLATE
 except Exception:
-    from components import EducationalRetriever, LearningAnalyzer  
+    from components import EducationalRetriever, LearningAnalyzer, PROMPT_TEMPLATES, ANSWER_TEMPLATE
 
 
 
+from langchain_core.runnables import Runnable
+
 from .services.educational_assistant import ContentGenerator
+from .analytics import CohortAnalytics
+from .state_store import learning_store_from_env
+from .tracing import tracer
+from .profiling import request_profiler
 
 
 try:
@@ -24,24 +34,28 @@ try:
 except Exception:
     ChatGroq = None
 
-
-try:
-    from langsmith import traceable
-except Exception:
-
-    def traceable(*_args, **_kwargs):
-        def deco(fn):
-            return fn
-        return deco
-
 from dotenv import load_dotenv
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# "groq" (remote, default) or "local" (fine-tuned adapter served in-process, see local_llm.py)
+LLM_BACKEND = os.getenv("DIRECTED_LLM_BACKEND", "groq").lower()
 
 
 # Initialize LLM 
 llm = None
-if ChatGroq is not None and GROQ_API_KEY:
+if LLM_BACKEND == "local":
+    try:
+        from .local_llm import LocalLLM
+        llm = LocalLLM.from_env()
+        try:
+            from ..templates import PROMPT_TEMPLATES as SHARED_TEMPLATES
+        except Exception:
+            SHARED_TEMPLATES = ()
+        llm.register_templates(*PROMPT_TEMPLATES, *SHARED_TEMPLATES)
+    except Exception as e:
+        print(f"Warning: local LLM backend could not be loaded: {e}")
+        llm = None
+elif ChatGroq is not None and GROQ_API_KEY:
     try:
         llm = ChatGroq(
             model="openai/gpt-oss-20b",
@@ -60,49 +74,80 @@ except Exception:
     retriever = None
 
 educational_retriever = EducationalRetriever(retriever) if retriever is not None else None
-content_generator = ContentGenerator(llm=llm, retriever=educational_retriever)
-analyzer = LearningAnalyzer()
+content_generator = ContentGenerator(llm=llm, retriever=educational_retriever, answer_template=ANSWER_TEMPLATE)
+analyzer = LearningAnalyzer(store=learning_store_from_env())
+cohort_analytics = CohortAnalytics()
+analyzer.add_listener(cohort_analytics.record)
+
+
+def detect_intent(request: str) -> str:
+    # Keyword-based heuristic (robust enough for quick testing)
+    lowered = (request or "").lower()
+    if any(k in lowered for k in ["quiz", "test", "mcq", "multiple choice"]):
+        return "QUIZ"
+    if any(k in lowered for k in ["explain", "teach", "flashcard", "flashcards", "tutor"]):
+        return "TUTORING"
+    # default to tutoring
+    return "TUTORING"
+
+
+def _retrieve_context(request: str) -> Optional[str]:
+    """Retrieved course material for an LLM answer; the deterministic fallback does not use it."""
+    if llm is None or educational_retriever is None:
+        return None
+    try:
+        return educational_retriever(request)
+    except Exception:
+        return None
+
+
+def _response(is_instructor: bool, content_type: str, output: Any, profile: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "user_type": "Instructor" if is_instructor else "Student",
+        "content_type": content_type,
+        "output": output,
+        "updated_profile": profile
+    }
+
+
+def generate_output(request: str) -> Tuple[str, Dict[str, Any], str]:
+    """
+    Content for a request, without touching the learner profile: (content_type, output,
+    performance). Also used to prefetch adaptive lessons in the background (see prefetch.py).
+    """
+    with tracer.span("intent_detection") as span:
+        user_intent = detect_intent(request)
+        span.set_attribute("intent", user_intent)
+
+    if user_intent == "QUIZ":
+        # produce a quiz (structured)
+        quiz = content_generator.generate_quiz(request)  # flexible: uses request to derive topic
+        return "QUIZ", quiz.dict(), "quiz_requested"
+    # tutoring / answer generation
+    answer = content_generator.answer_generator(request, _retrieve_context(request))
+    return "TUTORING", {"text": answer}, "tutoring_requested"
 
 
-@traceable(run_type="chain")
+@tracer.traced("run_educational_assistant", root=True)
+@request_profiler.profiled("run_educational_assistant")
 def run_educational_assistant(
     request: str,
     user_id: str,
     analyzer: LearningAnalyzer,
-    is_instructor: bool = False
+    is_instructor: bool = False,
+    prefetched: Optional[Tuple[str, Dict[str, Any], str]] = None
 ) -> Dict[str, Any]:
     """
     Main entrypoint for the educational assistant flow:
     - detect intent (quiz vs tutoring) using a small heuristic or the LLM if available
-    - produce structured output
+    - produce structured output (or use `prefetched`, a generate_output result made earlier)
     - log analytics via analyzer
     """
-    user_intent = None
     try:
-        if llm is not None:
-         pass
-        # Keyword-based heuristic (robust enough for quick testing)
-        lowered = (request or "").lower()
-        if any(k in lowered for k in ["quiz", "test", "mcq", "multiple choice"]):
-            user_intent = "QUIZ"
-        elif any(k in lowered for k in ["explain", "teach", "flashcard", "flashcards", "tutor"]):
-            user_intent = "TUTORING"
+        if prefetched is not None:
+            content_type, output_content, performance = prefetched
         else:
-            # default to tutoring
-            user_intent = "TUTORING"
-
-        if user_intent == "QUIZ":
-            # produce a quiz (structured)
-            quiz = content_generator.generate_quiz(request)  # flexible: uses request to derive topic
-            output_content = quiz.dict()
-            content_type = "QUIZ"
-            performance = "quiz_requested"
-        else:
-            # tutoring / answer generation
-            answer = content_generator.answer_generator(request)
-            output_content = {"text": answer}
-            content_type = "TUTORING"
-            performance = "tutoring_requested"
+            content_type, output_content, performance = generate_output(request)
 
         # log user performance / action
         try:
@@ -117,13 +162,7 @@ def run_educational_assistant(
         except Exception:
             updated_profile = {}
 
-        response = {
-            "user_type": "Instructor" if is_instructor else "Student",
-            "content_type": content_type,
-            "output": output_content,
-            "updated_profile": updated_profile
-        }
-        return response
+        return _response(is_instructor, content_type, output_content, updated_profile)
 
     except Exception as e:
         # Return structured error for the API layer to convert to HTTP
@@ -131,3 +170,100 @@ def run_educational_assistant(
             "error": "execution_failed",
             "details": str(e)
         }
+
+
+async def arun_educational_assistant_batch(inputs: List[Dict[str, Any]],
+                                           analyzer: LearningAnalyzer) -> List[Dict[str, Any]]:
+    """
+    run_educational_assistant for many inputs at once ({"request", "user_id", "is_instructor"}),
+    returning results in input order. Quizzes are generated concurrently in worker threads while
+    all tutoring requests share one embedding call, concurrent retrievals and one batched LLM call.
+    """
+    with tracer.trace("run_educational_assistant_batch", inputs=len(inputs)):
+        requests = [inp.get("request") or "" for inp in inputs]
+        with tracer.span("intent_detection"):
+            groups: Dict[str, List[int]] = {}
+            for index, request in enumerate(requests):
+                groups.setdefault(detect_intent(request), []).append(index)
+
+        outputs: List[Optional[Dict[str, Any]]] = [None] * len(inputs)
+        performances: Dict[int, str] = {}
+
+        async def quiz(index: int) -> None:
+            # generate_quiz is synchronous; each quiz runs in its own thread, alongside the tutoring batch.
+            try:
+                generated = await asyncio.to_thread(content_generator.generate_quiz, requests[index])
+                outputs[index] = {"content_type": "QUIZ", "output": generated.dict()}
+                performances[index] = "quiz_requested"
+            except Exception as e:
+                outputs[index] = {"error": "execution_failed", "details": str(e)}
+
+        async def tutor(tutoring: List[int]) -> None:
+            questions = [requests[i] for i in tutoring]
+            contexts: List[Optional[str]] = [None] * len(questions)
+            if llm is not None and educational_retriever is not None:
+                try:
+                    contexts = await educational_retriever.aretrieve_many(questions)
+                except Exception:
+                    pass
+            answers = await content_generator.aanswer_batch(questions, contexts)
+            for index, answer in zip(tutoring, answers):
+                outputs[index] = {"content_type": "TUTORING", "output": {"text": answer}}
+                performances[index] = "tutoring_requested"
+
+        tutoring = groups.get("TUTORING", [])
+        await asyncio.gather(*(quiz(index) for index in groups.get("QUIZ", [])),
+                             *([tutor(tutoring)] if tutoring else []))
+
+        user_ids = [inp.get("user_id", "0") for inp in inputs]
+        try:
+            await asyncio.to_thread(analyzer.log_performance_many,
+                                    [(user_ids[i], requests[i], performances[i]) for i in sorted(performances)])
+        except Exception:
+            print("Warning: analyzer.log_performance_many failed")
+
+        profiles: Dict[str, Dict[str, Any]] = {}
+        results = []
+        for index, inp in enumerate(inputs):
+            output = outputs[index]
+            if "error" in output:
+                results.append(output)
+                continue
+            user_id = user_ids[index]
+            if user_id not in profiles:
+                try:
+                    profiles[user_id] = analyzer.get_profile(user_id)
+                except Exception:
+                    profiles[user_id] = {}
+            results.append(_response(inp.get("is_instructor", False), output["content_type"], output["output"],
+                                     profiles[user_id]))
+        return results
+
+
+class EducationalAssistantRunnable(Runnable[Dict[str, Any], Dict[str, Any]]):
+    """
+    The assistant as a LangChain Runnable for LangServe: invoke() runs one request and
+    batch()/abatch() run arun_educational_assistant_batch instead of one pipeline per input.
+    """
+
+    def __init__(self, analyzer: LearningAnalyzer):
+        self.analyzer = analyzer
+
+    def invoke(self, input: Dict[str, Any], config: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        return run_educational_assistant(
+            request=input["request"],
+            user_id=input.get("user_id", "0"),
+            analyzer=self.analyzer,
+            is_instructor=input.get("is_instructor", False)
+        )
+
+    async def ainvoke(self, input: Dict[str, Any], config: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.invoke, input)
+
+    def batch(self, inputs: List[Dict[str, Any]], config: Any = None, **kwargs: Any) -> List[Dict[str, Any]]:
+        return asyncio.run(self.abatch(inputs))
+
+    async def abatch(self, inputs: List[Dict[str, Any]], config: Any = None, **kwargs: Any) -> List[Dict[str, Any]]:
+        if not inputs:
+            return []
+        return await arun_educational_assistant_batch(list(inputs), self.analyzer)
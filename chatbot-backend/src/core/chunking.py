@@ -0,0 +1,300 @@
+"""
+Structure-aware chunking of knowledge documents before they are embedded.
+
+Compared with one RecursiveCharacterTextSplitter over everything, this stage:
+- strips boilerplate: lines repeated across the pages of one source (PDF running headers and
+  footers, the nav bars of pages from one site) and short lines repeated within a document,
+- splits on headings and never across pages, merging small sections up to the chunk size and
+  recording the section heading in the chunk metadata,
+- drops near-duplicate chunks across all sources with MinHash signatures and LSH banding.
+
+Documents are chunked and signed in a process pool. `chunk_documents` returns the chunks plus a
+ChunkingReport with the embedding calls and index entries saved against the plain splitter.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger("DirectEd")
+
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 20
+
+# A line counts as boilerplate when it appears on at least this share of a source's pages.
+BOILERPLATE_SHARE = 0.5
+BOILERPLATE_MIN_PAGES = 2
+# Short lines (of several words) repeated this often inside one document are repeated headers.
+REPEATED_LINE_MIN = 3
+REPEATED_LINE_MAX_CHARS = 80
+
+# MinHash: NUM_PERM = BANDS * ROWS. 16 bands of 8 rows make pairs above ~0.7 Jaccard likely
+# candidates; candidates are kept as duplicates only above DUPLICATE_THRESHOLD.
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+DUPLICATE_THRESHOLD = 0.8
+_MERSENNE = (1 << 61) - 1
+
+Record = Tuple[str, Dict]  # (text, metadata): what crosses the process boundary
+
+
+@dataclass
+class ChunkingReport:
+    documents: int = 0
+    boilerplate_lines_removed: int = 0
+    baseline_chunks: Optional[int] = None  # what the plain RecursiveCharacterTextSplitter would embed
+    chunks_before_dedupe: int = 0
+    near_duplicates_removed: int = 0
+    chunks: int = 0
+
+    @property
+    def embedding_calls_saved(self) -> Optional[int]:
+        """None without a baseline; 0 when splitting at headings and pages made more chunks than it."""
+        if self.baseline_chunks is None:
+            return None
+        return max(0, self.baseline_chunks - self.chunks)
+
+    def to_dict(self) -> Dict[str, Optional[int]]:
+        return {**asdict(self), "embedding_calls_saved": self.embedding_calls_saved,
+                "index_entries_saved": self.embedding_calls_saved}
+
+
+# ------------------------
+# Boilerplate
+# ------------------------
+def _normalize_line(line: str) -> str:
+    # Page numbers inside headers/footers change from page to page.
+    return re.sub(r"\d+", "#", line.strip().lower())
+
+
+def _is_boilerplate_candidate(normalized: str) -> bool:
+    """Page numbers, or lines of at least two words; single tokens like "}" or "Example:" stay."""
+    return set(normalized) <= set("# -/|.") or len(normalized.split()) >= 2
+
+
+def _source_group(metadata: Dict) -> str:
+    """Pages that share boilerplate: all pages of one file, or all pages of one web site."""
+    source = str(metadata.get("source", ""))
+    return (urlparse(source).netloc or source) if "://" in source else source
+
+
+def strip_boilerplate(records: Sequence[Record]) -> Tuple[List[Record], int]:
+    """Removes repeated lines per source group. Returns (records, lines removed)."""
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for index, (_, metadata) in enumerate(records):
+        groups[_source_group(metadata)].append(index)
+
+    cleaned: List[Record] = list(records)
+    removed = 0
+    for indices in groups.values():
+        page_counts: Counter = Counter()
+        for i in indices:
+            page_counts.update({_normalize_line(l) for l in records[i][0].splitlines() if l.strip()})
+        threshold = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_SHARE * len(indices))
+        boilerplate = {
+            line for line, count in page_counts.items()
+            if count >= threshold and len(indices) > 1 and _is_boilerplate_candidate(line)
+        }
+
+        for i in indices:
+            text, metadata = records[i]
+            lines = text.splitlines()
+            repeated = Counter(
+                _normalize_line(l) for l in lines
+                if len(l.strip()) <= REPEATED_LINE_MAX_CHARS and len(l.split()) >= 3
+            )
+            drop = boilerplate | {line for line, count in repeated.items() if count >= REPEATED_LINE_MIN}
+            kept = [l for l in lines if not l.strip() or _normalize_line(l) not in drop]
+            removed += len(lines) - len(kept)
+            cleaned[i] = ("\n".join(kept), metadata)
+    return cleaned, removed
+
+
+# ------------------------
+# Structure-aware splitting (runs in worker processes)
+# ------------------------
+def is_heading(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 90 or stripped.endswith((".", ",", ";")):
+        return False
+    if stripped.startswith("#"):
+        return True
+    if re.match(r"^(\d+(\.\d+)*\.?|chapter\s+\d+:?)\s+[A-Z]", stripped, re.IGNORECASE):
+        return True
+    letters = [c for c in stripped if c.isalpha()]
+    return len(letters) >= 4 and all(c.isupper() for c in letters)
+
+
+def split_sections(text: str) -> List[Tuple[Optional[str], str]]:
+    """[(heading, body)] in document order; text before the first heading has heading None."""
+    sections: List[Tuple[Optional[str], List[str]]] = [(None, [])]
+    for line in text.splitlines():
+        if is_heading(line):
+            sections.append((line.strip().lstrip("#").strip(), [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(heading, "\n".join(lines).strip()) for heading, lines in sections if "\n".join(lines).strip()]
+
+
+def _recursive_split(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """Paragraph, then line, then sentence, then word boundaries, like RecursiveCharacterTextSplitter."""
+    if len(text) <= chunk_size:
+        return [text]
+    for separator in ("\n\n", "\n", ". ", " "):
+        parts = text.split(separator)
+        if len(parts) == 1:
+            continue
+        chunks, current = [], ""
+        for part in parts:
+            candidate = f"{current}{separator}{part}" if current else part
+            if len(candidate) <= chunk_size:
+                current = candidate
+                continue
+            if current:
+                chunks.append(current)
+                tail = current[-overlap:] if overlap else ""
+                current = f"{tail}{separator}{part}" if tail and len(tail) + len(part) < chunk_size else part
+            else:
+                current = part
+            if len(current) > chunk_size:
+                chunks.extend(_recursive_split(current, chunk_size, overlap))
+                current = ""
+        if current:
+            chunks.append(current)
+        return [c.strip() for c in chunks if c.strip()]
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size - overlap)]
+
+
+def chunk_record(record: Record, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[Record]:
+    """
+    Chunks one page/document along its headings. Consecutive small sections are merged while
+    they fit; a chunk's "section" metadata is the first heading it contains.
+    """
+    text, metadata = record
+    chunks: List[Record] = []
+    buffer, buffer_heading = "", None
+
+    def flush():
+        nonlocal buffer, buffer_heading
+        if buffer.strip():
+            chunks.append((buffer.strip(), {**metadata, "section": buffer_heading or metadata.get("topic", "")}))
+        buffer, buffer_heading = "", None
+
+    for heading, body in split_sections(text):
+        if len(body) > chunk_size:
+            flush()
+            for piece in _recursive_split(body, chunk_size, overlap):
+                chunks.append((piece, {**metadata, "section": heading or metadata.get("topic", "")}))
+            continue
+        if buffer and len(buffer) + len(body) + 2 > chunk_size:
+            flush()
+        buffer = f"{buffer}\n\n{body}" if buffer else body
+        buffer_heading = buffer_heading or heading
+    flush()
+    return chunks
+
+
+# ------------------------
+# MinHash near-duplicate detection
+# ------------------------
+def _permutations(count: int = NUM_PERM) -> List[Tuple[int, int]]:
+    perms = []
+    for i in range(count):
+        digest = hashlib.blake2b(f"directed-minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") % _MERSENNE or 1
+        b = int.from_bytes(digest[8:], "little") % _MERSENNE
+        perms.append((a, b))
+    return perms
+
+
+_PERMS = _permutations()
+
+
+def minhash_signature(text: str) -> Tuple[int, ...]:
+    words = re.findall(r"\w+", text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles]
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMS)
+
+
+def estimated_jaccard(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def find_near_duplicates(signatures: Sequence[Sequence[int]], threshold: float = DUPLICATE_THRESHOLD) -> set:
+    """Indices to drop: every chunk that nearly duplicates an earlier one."""
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+    duplicates = set()
+    for index, signature in enumerate(signatures):
+        candidates = set()
+        for band in range(BANDS):
+            key = (band, tuple(signature[band * ROWS:(band + 1) * ROWS]))
+            candidates.update(buckets[key])
+        if any(estimated_jaccard(signature, signatures[c]) >= threshold for c in candidates if c not in duplicates):
+            duplicates.add(index)
+            continue
+        for band in range(BANDS):
+            buckets[(band, tuple(signature[band * ROWS:(band + 1) * ROWS]))].append(index)
+    return duplicates
+
+
+def _chunk_and_sign(args) -> List[Tuple[str, Dict, Tuple[int, ...]]]:
+    record, chunk_size, overlap = args
+    return [(text, metadata, minhash_signature(text)) for text, metadata in chunk_record(record, chunk_size, overlap)]
+
+
+# ------------------------
+# Entry point
+# ------------------------
+def chunk_records(records: Sequence[Record], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                  workers: Optional[int] = None, baseline_chunks: Optional[int] = None) -> Tuple[List[Record], ChunkingReport]:
+    report = ChunkingReport(documents=len(records), baseline_chunks=baseline_chunks)
+    cleaned, report.boilerplate_lines_removed = strip_boilerplate(records)
+
+    tasks = [(record, chunk_size, overlap) for record in cleaned]
+    workers = workers if workers is not None else min(len(tasks), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_chunk_and_sign, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [_chunk_and_sign(task) for task in tasks]
+
+    signed = [item for result in results for item in result]
+    report.chunks_before_dedupe = len(signed)
+    duplicates = find_near_duplicates([signature for _, _, signature in signed])
+    report.near_duplicates_removed = len(duplicates)
+    chunks = [(text, metadata) for i, (text, metadata, _) in enumerate(signed) if i not in duplicates]
+    report.chunks = len(chunks)
+    return chunks, report
+
+
+def baseline_split(docs: List, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List:
+    """The plain character splitter the structured chunker is measured against."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap).split_documents(docs)
+
+
+def chunk_documents(docs: Iterable, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                    workers: Optional[int] = None) -> Tuple[List, ChunkingReport]:
+    """
+    LangChain Documents in, chunk Documents plus a ChunkingReport out. The report's baseline is
+    the plain splitter's chunk count for the same documents.
+    """
+    from langchain_core.documents import Document
+
+    docs = list(docs)
+    records = [(doc.page_content, dict(doc.metadata)) for doc in docs]
+    chunks, report = chunk_records(records, chunk_size, overlap, workers, len(baseline_split(docs, chunk_size, overlap)))
+    logger.info("Chunking: %s", report.to_dict())
+    return [Document(page_content=text, metadata=metadata) for text, metadata in chunks], report
@@ -11,12 +11,16 @@ from langchain.memory import ConversationBufferMemory, ConversationSummaryBuffer
 from langchain_community.vectorstores import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 
-# Langsmith
-from langsmith import traceable
+# Tracing
+from .tracing import tracer
+from .tracks import detect_track
+from .state_store import apply_performance, empty_profile, profile_changed
+from .services.quiz_stream import QUIZ_JSON_TEMPLATE
 
 import os
+import threading
 from dotenv import load_dotenv
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 load_dotenv()
 
@@ -27,14 +31,60 @@ class EducationalRetriever:
     def __init__(self, retriever_instance):
         self.retriever = retriever_instance
 
+    @property
+    def embeddings(self):
+        """The store's embedding model, when the retriever exposes it (used to deduplicate generated items)."""
+        return getattr(self.retriever, "embeddings", None)
+
+    def _retrieve(self, query: str, k: Optional[int] = None):
+        with tracer.span("retrieval") as span:
+            track = detect_track(query)
+            span.set_attribute("track", track)
+            if hasattr(self.retriever, "search"):
+                # Track-aware store: only the detected track's chunks are searched.
+                docs = self.retriever.search(query, track, k=k)
+            else:
+                docs = self.retriever.invoke(query)
+            span.set_attribute("documents", len(docs))
+        return docs
+
+    def documents(self, query: str, k: Optional[int] = None) -> List:
+        """Retrieved chunks for `query`; `k` overrides the number of chunks on a track-aware store."""
+        return self._retrieve(query, k)
+
     def get_documents(self,query: str) ->str:
-        docs = self.retriever.invoke(query)
-        return "\n\n".join([doc.page_content for doc in docs])
+        return "\n\n".join([doc.page_content for doc in self._retrieve(query)])
     
     def __call__(self, query: str) -> str:
         """Makes this class directly callable as a Runnable."""
-        docs = self.retriever.invoke(query)
-        return "\n\n".join(doc.page_content for doc in docs)
+        return "\n\n".join(doc.page_content for doc in self._retrieve(query))
+
+    async def _aretrieve(self, query: str):
+        with tracer.span("retrieval") as span:
+            track = detect_track(query)
+            span.set_attribute("track", track)
+            if hasattr(self.retriever, "asearch"):
+                docs = await self.retriever.asearch(query, track)
+            else:
+                docs = await self.retriever.ainvoke(query)
+            span.set_attribute("documents", len(docs))
+        return docs
+
+    async def acall(self, query: str) -> str:
+        return "\n\n".join(doc.page_content for doc in await self._aretrieve(query))
+
+    async def aretrieve_many(self, queries: List[str]) -> List[str]:
+        """Context for a batch of queries; a track-aware store embeds them in one call and searches concurrently."""
+        with tracer.span("retrieval.batch", queries=len(queries)):
+            if hasattr(self.retriever, "asearch_many"):
+                docs = await self.retriever.asearch_many(queries, [detect_track(q) for q in queries])
+            else:
+                docs = await self.retriever.abatch(queries)
+        return [format_docs(found) for found in docs]
+
+    def as_runnable(self) -> RunnableLambda:
+        """Runnable with a native async path, so ainvoke() of a chain does not block on the vector store."""
+        return RunnableLambda(self.__call__, afunc=self.acall)
     
 
 class AdaptiveConversationChain:
@@ -66,21 +116,11 @@ class AdaptiveConversationChain:
         return chain
 
 
-class ContentGenerator:
-    def __init__(self, llm_model, retriever: EducationalRetriever):
-        self.retriever = retriever
-        self.llm = llm_model
-        self.quiz_chain = self._quiz_generation_chain()
-        self.answer_chain = self._answer_generation_chain()
-
-    @traceable(run_type="chain")
-    def _answer_generation_chain(self):
-        prompt_template = PromptTemplate.from_template(
-            """
+# Prompts of services/educational_assistant.ContentGenerator (built in chatbot.py).
+# The fixed instructions come before the variables so that a local backend can reuse the
+# encoded prefix across requests (see prefix_cache.py).
+ANSWER_TEMPLATE = """
             You are an AI tutor. 
-           
-            Question: {question}
-            Content: {content}
 
             Guidelines:
             - Start with a beginner-friendly explanation.  
@@ -89,72 +129,98 @@ class ContentGenerator:
             - Include one real-world example or analogy.  
             - Be concise and motivating.  
             - Keep answers between **50 and 150 words**.  
+
+            Question: {question}
+            Content: {content}
             """
-        )
-        #  Use ONLY the provided 'Content' to form your answer. 
-        #     If the content does not contain the answer, say so.
-
-        return {
-            "question": RunnablePassthrough(),
-            "content": RunnableLambda(lambda x: x["question"]) | self.retriever
-        } | prompt_template | self.llm | StrOutputParser()
-    
-    @traceable(run_type="chain")
-    def _quiz_generation_chain(self):
-        prompt_template = PromptTemplate.from_template(
-            """
-            Create 5 multiple-choice questions (MCQs) about the given topic.  
-            Each must include:
-            - Question text  
-            - Four options (A, B, C, D)  
-            - The correct answer clearly labeled  
 
-            
+# Asks for JSON matching the Quiz model; the schema itself is part of the fixed instructions.
+QUIZ_TEMPLATE = QUIZ_JSON_TEMPLATE.replace("{notes}", "Content: {content}\n")
+
+PROMPT_TEMPLATES = (ANSWER_TEMPLATE, QUIZ_TEMPLATE)
 
-            Topic: {topic}  
-            Content: {content}  
-            """
-        )
-        # Use ONLY the provided 'Content'.  
-        #     If content lacks enough info, say: "Not enough information to create a quiz."
-        return {
-            "topic": RunnablePassthrough(),
-            "content": RunnableLambda(lambda x: x["topic"]) | self.retriever
-        } | prompt_template | self.llm | StrOutputParser()
-
-    @traceable(run_type="chain")
-    def answer_generator(self, question: str) -> str:
-        return self.answer_chain.invoke({"question": question})
-
-    @traceable(run_type="chain")
-    def generate_quiz(self, topic: str) -> str:
-        return self.quiz_chain.invoke({"topic": topic})
-    
 
 class LearningAnalyzer:
     """
     A class that manages student progress and performance logs for multiple students.
+    With a shared store (state_store.SQLiteLearningStore) the profiles live in SQLite and every
+    server process sees the same data; listeners are then fed from the store's event log by sync().
     """
-    def __init__(self):
+    def __init__(self, store=None):
         # Using a dictionary to store profiles for multiple students
         self.student_data = {}
+        self.store = store
+        # Called as listener(user_id, topic, performance, changes) after every update
+        self.listeners = []
+        # user_id -> updates that changed the in-memory profile (the store keeps its own)
+        self.versions = {}
+        self._last_event = 0
+        self._sync_lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """Registers a callback for profile updates (e.g. CohortAnalytics.record)."""
+        self.listeners.append(listener)
 
     def get_profile(self, user_id: str) -> Dict[str, Any]:
         """Returns the profile for a specific user, creating one if it doesn't exist."""
+        if self.store is not None:
+            return self.store.get_profile(user_id)
         if user_id not in self.student_data:
             # Create a new profile for the user if they don't exist
-            self.student_data[user_id] = {"completed_quizzes": [], "struggling_topics": []}
+            self.student_data[user_id] = empty_profile()
         return self.student_data[user_id]
+
+    def profile_version(self, user_id: str) -> int:
+        """Changes whenever the user's profile does; cheap enough to compute an ETag from on every poll."""
+        if self.store is not None:
+            return self.store.profile_version(user_id)
+        return self.versions.get(user_id, 0)
         
     def log_performance(self, user_id: str, topic: str, performance: str):
         """Logs and updates a specific student's data based on a new interaction."""
-        profile = self.get_profile(user_id)  # This now gets the correct profile
-        if performance == "correct":
-            if topic not in profile["completed_quizzes"]:
-                 profile["completed_quizzes"].append(topic)
+        with tracer.span("analyzer.update", performance=performance):
+            self._update_profile(user_id, topic, performance)
+
+    def log_performance_many(self, entries: List[tuple]):
+        """Logs (user_id, topic, performance) interactions in order; one transaction with a shared store."""
+        with tracer.span("analyzer.update_many", entries=len(entries)):
+            if self.store is not None:
+                self.store.log_many(entries)
+                self.sync()
+                return
+            for user_id, topic, performance in entries:
+                profile = self.get_profile(user_id)
+                changes = apply_performance(profile, topic, performance)
+                self.versions[user_id] = self.versions.get(user_id, 0) + profile_changed(changes)
+                for listener in self.listeners:
+                    listener(user_id, topic, performance, changes)
+
+    def sync(self) -> int:
+        """Feeds listeners the store events logged by any process since the last sync."""
+        if self.store is None:
+            return 0
+        applied = 0
+        with self._sync_lock:
+            while True:
+                events = self.store.events_since(self._last_event)
+                if not events:
+                    return applied
+                for event in events:
+                    for listener in self.listeners:
+                        listener(event.user_id, event.topic, event.performance, event.changes)
+                self._last_event = events[-1].id
+                applied += len(events)
+
+    def _update_profile(self, user_id: str, topic: str, performance: str):
+        if self.store is not None:
+            profile, _ = self.store.log(user_id, topic, performance)
+            self.sync()
         else:
-            if topic not in profile["struggling_topics"]:
-                profile["struggling_topics"].append(topic)
+            profile = self.get_profile(user_id)  # This now gets the correct profile
+            changes = apply_performance(profile, topic, performance)
+            self.versions[user_id] = self.versions.get(user_id, 0) + profile_changed(changes)
+            for listener in self.listeners:
+                listener(user_id, topic, performance, changes)
 
         print(f"\n--- Log for User ID: {user_id} on {topic} ({performance}) ---")
         print("Updated Student Profile:")
@@ -0,0 +1,317 @@
+"""
+Curriculum graph with prerequisite edges, and a per-user spaced-repetition scheduler.
+
+CurriculumGraph is a DAG of topics (cycles are rejected). A topic is unlocked for a user once
+all of its prerequisites are mastered.
+
+SpacedRepetitionScheduler keeps, for each user, the state of every unlocked topic (SM-2 style
+ease, interval, due time and a mastery estimate) in two heaps:
+    upcoming  keyed by due time: topics scheduled for later review
+    ready     keyed by (mastery, new, curriculum order): topics that are due now
+next_topic() moves the topics that fell due from `upcoming` to `ready` and returns the top of
+`ready`: the weakest due topic, and among new topics the first in curriculum order. Every step is
+a heap operation, O(log n) in the user's unlocked topics; stale heap entries are skipped lazily.
+next_lesson() is what the adaptive route serves: the due topic, or when nothing is due yet the
+topic that falls due first, reviewed early. It is None only once every topic is mastered.
+
+The scheduler listens to LearningAnalyzer events. Free-text topics (the logged request) are
+mapped to curriculum topics by name; "correct" raises mastery and spaces out the next review,
+"*_requested" events count as an exposure (review again after EXPOSURE_DELAY), and any other
+performance counts as a miss, like LearningAnalyzer's struggling_topics. Outcomes come from
+answers posted to /api/assistant/answer; lessons alone never master a topic.
+
+    CURRICULUM_PATH   optional JSON file: [{"topic", "track", "prerequisites": [...]}, ...]
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("DirectEd")
+
+CURRICULUM_PATH = os.getenv("CURRICULUM_PATH")
+
+DAY = 86400.0
+MASTERY_THRESHOLD = 0.5   # prerequisites count as mastered at this estimate (one correct answer)
+MASTERY_RATE = 0.5        # weight of the newest outcome in the mastery estimate
+EXPOSURE_DELAY = 600.0    # seconds before a topic that was only explained comes back
+START_EASE, MIN_EASE, MAX_EASE = 2.5, 1.3, 3.0
+FIRST_INTERVALS = (DAY, 6 * DAY)
+
+# (topic, track, prerequisites) in curriculum order. Topic names follow the fine-tuning data.
+DEFAULT_CURRICULUM: List[Tuple[str, str, List[str]]] = [
+    ("Tokenization", "Gen AI", []),
+    ("Embeddings", "Gen AI", ["Tokenization"]),
+    ("Transformers", "Gen AI", ["Tokenization"]),
+    ("Prompt Engineering", "Gen AI", ["Transformers"]),
+    ("LLM reasoning", "Gen AI", ["Prompt Engineering"]),
+    ("Langchain", "Gen AI", ["Prompt Engineering"]),
+    ("RAG", "Gen AI", ["Embeddings", "Langchain"]),
+    ("Fine-tuning with LoRA", "Gen AI", ["Transformers"]),
+    ("Node.js Event Loop", "MERN", []),
+    ("Express Middleware", "MERN", ["Node.js Event Loop"]),
+    ("REST APIs", "MERN", ["Express Middleware"]),
+    ("MongoDB Queries", "MERN", ["REST APIs"]),
+    ("JWT Authentication", "MERN", ["REST APIs"]),
+    ("React State", "MERN", ["REST APIs"]),
+    ("User Research", "UI/UX", []),
+    ("Usability", "UI/UX", ["User Research"]),
+    ("Design", "UI/UX", ["User Research"]),
+    ("Visual Hierarchy", "UI/UX", ["Design"]),
+    ("Prototyping", "UI/UX", ["Design"]),
+    ("Accessibility (WCAG)", "UI/UX", ["Visual Hierarchy"]),
+    ("Design Systems", "UI/UX", ["Visual Hierarchy", "Prototyping"]),
+]
+
+
+class CurriculumGraph:
+    """Topics with prerequisite edges, kept in a topological (curriculum) order."""
+
+    def __init__(self):
+        self.order: Dict[str, int] = {}
+        self.tracks: Dict[str, Optional[str]] = {}
+        self.prerequisites: Dict[str, List[str]] = {}
+        self.dependents: Dict[str, List[str]] = {}
+        self._names: Dict[str, str] = {}
+        self._pattern: Optional[re.Pattern] = None
+
+    def add_topic(self, topic: str, track: Optional[str] = None, prerequisites: Iterable[str] = ()) -> None:
+        """Prerequisites must already be in the graph, which keeps it acyclic by construction."""
+        if topic in self.order:
+            raise ValueError(f"Topic {topic!r} is already in the curriculum")
+        prerequisites = list(prerequisites)
+        missing = [p for p in prerequisites if p not in self.order]
+        if missing:
+            raise ValueError(f"Topic {topic!r} has unknown prerequisites {missing} (or they form a cycle)")
+        self.order[topic] = len(self.order)
+        self.tracks[topic] = track
+        self.prerequisites[topic] = prerequisites
+        self.dependents[topic] = []
+        for prerequisite in prerequisites:
+            self.dependents[prerequisite].append(topic)
+        self._names[topic.lower()] = topic
+        self._pattern = None
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, Optional[str], Iterable[str]]]) -> "CurriculumGraph":
+        """
+        Builds the graph from (topic, track, prerequisites). Listed order is kept as the
+        curriculum order, except that a topic listed before its prerequisites moves after them.
+        """
+        pending = {topic: (track, list(prereqs)) for topic, track, prereqs in entries}
+        graph = cls()
+        while pending:
+            added = 0
+            for topic in list(pending):
+                track, prereqs = pending[topic]
+                if all(p in graph.order for p in prereqs):
+                    graph.add_topic(topic, track, prereqs)
+                    del pending[topic]
+                    added += 1
+            if not added:
+                raise ValueError(f"Curriculum has a cycle or unknown prerequisites among {sorted(pending)}")
+        return graph
+
+    @classmethod
+    def from_json(cls, path: str) -> "CurriculumGraph":
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        return cls.from_entries((e["topic"], e.get("track"), e.get("prerequisites", [])) for e in entries)
+
+    def roots(self) -> List[str]:
+        return [topic for topic, prereqs in self.prerequisites.items() if not prereqs]
+
+    def resolve(self, text: str) -> Optional[str]:
+        """The curriculum topic named in `text` (longest name wins), or None."""
+        if not text:
+            return None
+        if self._pattern is None:
+            names = sorted(self._names, key=len, reverse=True)
+            self._pattern = re.compile(r"(?<!\w)(" + "|".join(map(re.escape, names)) + r")(?!\w)")
+        match = self._pattern.search(text.lower())
+        return self._names[match.group(1)] if match else None
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+
+def load_curriculum(path: Optional[str] = CURRICULUM_PATH) -> CurriculumGraph:
+    if path:
+        graph = CurriculumGraph.from_json(path)
+        logger.info("Loaded curriculum with %d topics from %s", len(graph), path)
+        return graph
+    return CurriculumGraph.from_entries(DEFAULT_CURRICULUM)
+
+
+# ------------------------
+# Spaced repetition
+# ------------------------
+@dataclass
+class TopicState:
+    due: float
+    mastery: float = 0.0
+    ease: float = START_EASE
+    interval: float = 0.0
+    repetitions: int = 0
+    reviews: int = 0
+    version: int = 0
+
+
+@dataclass
+class UserSchedule:
+    # Only topics the user has interacted with have a state; unlocked topics without one are
+    # new (due since they were unlocked, mastery 0, version 0).
+    states: Dict[str, TopicState] = field(default_factory=dict)
+    unlocked: set = field(default_factory=set)            # unlocked topics that are not roots
+    mastered: set = field(default_factory=set)
+    upcoming: List[tuple] = field(default_factory=list)  # (due, order, topic, version)
+    ready: List[tuple] = field(default_factory=list)     # (mastery, new, order, topic, version)
+
+
+class SpacedRepetitionScheduler:
+    """Per-user review queues over a CurriculumGraph."""
+
+    def __init__(self, graph: CurriculumGraph):
+        self.graph = graph
+        self.users: Dict[str, UserSchedule] = {}
+        self._lock = threading.Lock()
+        # Ready entries of the root topics, sorted by curriculum order and therefore already a
+        # heap: a new user's queue is a copy of it.
+        self._root_entries = sorted((0.0, True, graph.order[t], t, 0) for t in graph.roots())
+
+    def _schedule(self, user_id: str) -> UserSchedule:
+        schedule = self.users.get(user_id)
+        if schedule is None:
+            schedule = self.users[user_id] = UserSchedule(ready=list(self._root_entries))
+        return schedule
+
+    def _push(self, schedule: UserSchedule, topic: str, state: TopicState) -> None:
+        state.version += 1
+        heapq.heappush(schedule.upcoming, (state.due, self.graph.order[topic], topic, state.version))
+        # Lazy deletion leaves stale entries behind; rebuild once they outnumber the live ones.
+        if len(schedule.upcoming) + len(schedule.ready) > 2 * (len(schedule.states) + len(self._root_entries)
+                                                                + len(schedule.unlocked)) + 32:
+            order = self.graph.order
+            schedule.upcoming = [(s.due, order[t], t, s.version) for t, s in schedule.states.items()]
+            heapq.heapify(schedule.upcoming)
+            schedule.ready = [entry for entry in self._root_entries if entry[3] not in schedule.states]
+            schedule.ready += [(0.0, True, order[t], t, 0) for t in schedule.unlocked if t not in schedule.states]
+            heapq.heapify(schedule.ready)
+
+    def record(self, user_id: str, topic: str, performance: str, changes: Optional[Dict[str, bool]] = None,
+               now: Optional[float] = None) -> Optional[str]:
+        """
+        Updates the user's schedule after an interaction (LearningAnalyzer listener signature).
+        Returns the curriculum topic it was mapped to, or None when `topic` names none.
+        """
+        topic = topic if topic in self.graph.order else self.graph.resolve(topic)
+        if topic is None:
+            return None
+        if now is None:
+            now = (changes or {}).get("timestamp") or time.time()
+        with self._lock:
+            schedule = self._schedule(user_id)
+            state = schedule.states.get(topic)
+            if state is None:
+                # First interaction; the topic may not even be unlocked yet (asked about directly).
+                state = schedule.states[topic] = TopicState(due=now)
+
+            if performance.endswith("_requested"):
+                state.due = now + EXPOSURE_DELAY
+            else:
+                correct = performance == "correct"
+                state.reviews += 1
+                state.mastery += MASTERY_RATE * ((1.0 if correct else 0.0) - state.mastery)
+                if correct:
+                    state.repetitions += 1
+                    if state.repetitions <= len(FIRST_INTERVALS):
+                        state.interval = FIRST_INTERVALS[state.repetitions - 1]
+                    else:
+                        state.interval *= state.ease
+                    state.ease = min(MAX_EASE, state.ease + 0.1)
+                else:
+                    state.repetitions = 0
+                    state.interval = 0.0
+                    state.ease = max(MIN_EASE, state.ease - 0.2)
+                state.due = now + state.interval
+                if state.mastery >= MASTERY_THRESHOLD and topic not in schedule.mastered:
+                    schedule.mastered.add(topic)
+                    for dependent in self.graph.dependents[topic]:
+                        if dependent not in schedule.unlocked and all(
+                                p in schedule.mastered for p in self.graph.prerequisites[dependent]):
+                            schedule.unlocked.add(dependent)
+                            if dependent not in schedule.states:
+                                heapq.heappush(schedule.ready, (0.0, True, self.graph.order[dependent], dependent, 0))
+            self._push(schedule, topic, state)
+        return topic
+
+    def next_topic(self, user_id: str, now: Optional[float] = None) -> Optional[str]:
+        """The weakest topic due for this user, or None when nothing is due."""
+        now = time.time() if now is None else now
+        with self._lock:
+            schedule = self._schedule(user_id)
+            states = schedule.states
+            while schedule.upcoming and schedule.upcoming[0][0] <= now:
+                due, order, topic, version = heapq.heappop(schedule.upcoming)
+                state = states[topic]
+                if version == state.version:
+                    heapq.heappush(schedule.ready, (state.mastery, state.reviews == 0, order, topic, version))
+            while schedule.ready:
+                _, _, _, topic, version = schedule.ready[0]
+                state = states.get(topic)
+                if state is None and version == 0:
+                    return topic
+                if state is not None and version == state.version and state.due <= now:
+                    return topic
+                heapq.heappop(schedule.ready)
+            return None
+
+    def upcoming_topic(self, user_id: str) -> Optional[Tuple[str, float]]:
+        """(topic, due time) of the topic that falls due first, or None when none is scheduled."""
+        with self._lock:
+            schedule = self.users.get(user_id)
+            if schedule is None:
+                return None
+            while schedule.upcoming:
+                due, _, topic, version = schedule.upcoming[0]
+                if version == schedule.states[topic].version:
+                    return topic, due
+                heapq.heappop(schedule.upcoming)
+            return None
+
+    def finished(self, user_id: str) -> bool:
+        """Whether the user has mastered every topic of the curriculum."""
+        with self._lock:
+            schedule = self.users.get(user_id)
+            return schedule is not None and len(schedule.mastered) == len(self.graph)
+
+    def next_lesson(self, user_id: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        The due topic (next_topic), or when nothing is due yet the topic that falls due first.
+        None once the whole curriculum is mastered and no review is due.
+        """
+        topic = self.next_topic(user_id, now)
+        if topic is not None or self.finished(user_id):
+            return topic
+        upcoming = self.upcoming_topic(user_id)
+        return upcoming[0] if upcoming else None
+
+    def progress(self, user_id: str) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            schedule = self.users.get(user_id)
+            if schedule is None:
+                return {}
+            return {topic: {"mastery": round(s.mastery, 3), "due": s.due, "reviews": s.reviews}
+                    for topic, s in schedule.states.items()}
@@ -12,9 +12,16 @@ from dotenv import load_dotenv
 from pathlib import Path
 import os
 
+from .ingestion import load_manifest
+from .retrieval import TrackRetriever
+from .serving import register_after_fork
+from .vectorstore import connect_vector_store
+
 project_root = Path(__file__).resolve().parent.parent.parent
 knowledge_path = project_root / "knowledge"
 database_path = project_root/"db"
+# Collection name langchain_chroma uses when none is given (databases built before ingestion.py).
+LEGACY_COLLECTION = "langchain"
 
 
 load_dotenv()
@@ -87,7 +94,35 @@ embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001",
 # )
 
 
-vectordb = Chroma(persist_directory=persist_directory,
-                  embedding_function=embeddings)
+# Collections built by `python -m src.core.ingestion` are searched per track; a database
+# built before that (no collections.json) is still searched as one unfiltered collection.
+# DIRECTED_VECTOR_STORE chooses between the embedded store on db/ and a Chroma server.
+vector_store = connect_vector_store(embeddings, persist_directory)
+collections_manifest = load_manifest(persist_directory)
+if collections_manifest is not None:
+    retriever = TrackRetriever.from_manifest(collections_manifest, embeddings, persist_directory,
+                                             connection=vector_store)
+else:
+    vectordb = vector_store.collection(LEGACY_COLLECTION)
+    retriever = vectordb.as_retriever()
+
+
+def _reopen_vector_store():
+    """
+    The embeddings gRPC channel, Chroma's SQLite handles and HTTP connections must not be
+    shared with the preloaded master process; each forked server worker opens its own.
+    """
+    global embeddings
+    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001",
+                                              google_api_key=GOOGLE_API_KEY)
+    vector_store.reset()
+    vector_store.embeddings = embeddings
+    if isinstance(retriever, TrackRetriever):
+        retriever.stores = TrackRetriever.from_manifest(collections_manifest, embeddings, persist_directory,
+                                                        connection=vector_store).stores
+        retriever.embeddings = embeddings
+    else:
+        retriever.vectorstore = vector_store.collection(LEGACY_COLLECTION).store
+
 
-retriever = vectordb.as_retriever()
+register_after_fork(_reopen_vector_store)
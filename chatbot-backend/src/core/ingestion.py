@@ -0,0 +1,218 @@
+"""
+Builds the knowledge vector store from the files in knowledge/ (and optionally the web resources).
+
+Documents are chunked by chunking.py (headings, pages, boilerplate and near-duplicate removal).
+Every chunk is tagged with metadata the retriever can filter on:
+    track       "Gen AI" | "MERN" | "UI/UX" | "General"   (detected from the source title and text;
+                "General" unless one track clearly dominates, see source_track)
+    topic       human-readable title of the source document
+    source      file name or URL
+    difficulty  "Beginner" | "Intermediate" | "Advanced"  (keyword heuristic over the source)
+
+With sharding (the default) each track gets its own Chroma collection, so a UX question only
+searches UX material; without it all chunks share one collection and are filtered by track at
+query time. The resulting layout is written to db/collections.json, which data_handlers.py reads.
+
+    python -m src.core.ingestion            # per-track collections from knowledge/
+    python -m src.core.ingestion --web      # also load the web resources
+    python -m src.core.ingestion --single   # one collection, metadata filtering only
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .chunking import baseline_split, chunk_documents
+from .tracks import GENERAL_TRACK, track_scores, track_slug
+
+logger = logging.getLogger("DirectEd")
+
+project_root = Path(__file__).resolve().parent.parent.parent
+knowledge_path = project_root / "knowledge"
+database_path = project_root / "db"
+COLLECTIONS_MANIFEST = "collections.json"
+
+SINGLE_COLLECTION = "directed_knowledge"
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 20
+
+# A source belongs to a track only with this many of its keywords, and this many times as many
+# keyword occurrences as the runner-up; otherwise it is General, searched by every track.
+MIN_TRACK_KEYWORDS = 2
+TRACK_MARGIN = 2.0
+
+DIFFICULTY_KEYWORDS = {
+    "Beginner": ["basics", "introduction", "getting started", "beginner", "cheat sheet", "overview", "what is", "from 0"],
+    "Advanced": ["advanced", "production", "fine-tun", "optimiz", "architecture", "deploy", "scaling", "llmops"],
+}
+
+
+def collection_name(track: str) -> str:
+    return f"directed_{track_slug(track)}"
+
+
+# ------------------------
+# Tagging
+# ------------------------
+def source_title(source: str) -> str:
+    """Readable title from a file name or URL: "09-UX.txt" -> "UX", ".../fastapi.tiangolo.com/tutorial/" -> "tutorial"."""
+    name = source.rstrip("/").rsplit("/", 1)[-1]
+    name = re.sub(r"\.(txt|pdf|html?)$", "", name, flags=re.IGNORECASE)
+    name = re.sub(r"^\d+[-_ ]*", "", name)
+    return re.sub(r"[-_]+", " ", name).strip() or source
+
+
+def source_track(text: str) -> str:
+    """
+    The track of a whole source. One passing mention ("user interface" in a git cheat sheet) is
+    not enough: the track needs several of its keywords and a clear lead over the others.
+    """
+    scores = track_scores(text)
+    ranked = sorted(scores, key=lambda track: scores[track][1], reverse=True)
+    best, runner_up = scores[ranked[0]], scores[ranked[1]]
+    if best[0] >= MIN_TRACK_KEYWORDS and best[1] >= TRACK_MARGIN * runner_up[1]:
+        return ranked[0]
+    return GENERAL_TRACK
+
+
+def infer_difficulty(text: str) -> str:
+    lowered = text.lower()
+    scores = {level: sum(lowered.count(k) for k in keywords) for level, keywords in DIFFICULTY_KEYWORDS.items()}
+    if scores["Advanced"] > scores["Beginner"]:
+        return "Advanced"
+    if scores["Beginner"] > 0:
+        return "Beginner"
+    return "Intermediate"
+
+
+def tag_documents(docs: Iterable) -> List:
+    """
+    Sets track/topic/source/difficulty metadata on every document. The values are decided per
+    source (all pages of one PDF share them), from the title plus the beginning of the text.
+    """
+    docs = list(docs)
+    by_source: Dict[str, List] = {}
+    for doc in docs:
+        by_source.setdefault(str(doc.metadata.get("source", "unknown")), []).append(doc)
+
+    for source, source_docs in by_source.items():
+        title = source_title(source)
+        sample = " ".join(d.page_content for d in source_docs)[:20000]
+        track = source_track(f"{title} {title} {sample}")
+        difficulty = infer_difficulty(f"{title} {sample}")
+        for doc in source_docs:
+            doc.metadata.update({
+                "track": track,
+                "topic": title,
+                "source": Path(source).name if "://" not in source else source,
+                "difficulty": difficulty,
+            })
+    return docs
+
+
+# ------------------------
+# Loading and storing
+# ------------------------
+def load_knowledge(path: Path = knowledge_path, links: Optional[List[str]] = None) -> List:
+    """Loads the PDFs and text files under `path`, plus the given web pages (through the page cache)."""
+    from langchain_community.document_loaders import DirectoryLoader, TextLoader
+
+    from .pdf_extract import load_pdfs
+
+    docs = load_pdfs(path)
+    docs += DirectoryLoader(str(path), loader_cls=TextLoader, glob="*.txt").load()
+    if links:
+        from .web_fetcher import load_web_documents
+
+        docs += load_web_documents(links)
+    return docs
+
+
+def split_documents(docs: List) -> List:
+    """The plain character splitter, kept as the baseline the structured chunker is measured against."""
+    return baseline_split(docs, CHUNK_SIZE, CHUNK_OVERLAP)
+
+
+def build_collections(chunks: List, embeddings, persist_directory: Path = database_path,
+                      sharded: bool = True, connection=None) -> Dict[str, object]:
+    """
+    Writes tagged chunks to Chroma (one collection per track when `sharded`) and records the
+    layout in collections.json. Returns the vector stores by track ("*" for the single collection).
+    The collections are written through `connection` (see vectorstore.py; by default the one
+    DIRECTED_VECTOR_STORE selects), the manifest always goes to `persist_directory`.
+    """
+    from .vectorstore import connect_vector_store
+
+    persist_directory = Path(persist_directory)
+    persist_directory.mkdir(parents=True, exist_ok=True)
+    connection = connection or connect_vector_store(embeddings, persist_directory)
+    # The new layout is built under new names and only replaces the previous one once it is
+    # complete, so a failure halfway through leaves the previous collections and manifest intact.
+    previous = load_manifest(persist_directory) or {}
+    generation = previous.get("generation", 0) + 1
+
+    groups: Dict[str, List] = {}
+    if sharded:
+        for chunk in chunks:
+            groups.setdefault(chunk.metadata["track"], []).append(chunk)
+    else:
+        groups["*"] = chunks
+
+    stores, manifest = {}, {"sharded": sharded, "generation": generation, "collections": {}}
+    for track, group in sorted(groups.items()):
+        name = f"{SINGLE_COLLECTION if track == '*' else collection_name(track)}_v{generation}"
+        connection.delete_collection(name)  # left over by a rebuild that failed
+        stores[track] = connection.create_collection(name, group)
+        manifest["collections"][track] = {"name": name, "chunks": len(group)}
+    _atomic_write(persist_directory / COLLECTIONS_MANIFEST, json.dumps(manifest, indent=2))
+
+    current = {entry["name"] for entry in manifest["collections"].values()}
+    for entry in previous.get("collections", {}).values():
+        if entry["name"] not in current:
+            connection.delete_collection(entry["name"])
+    return stores
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def load_manifest(persist_directory: Path = database_path) -> Optional[dict]:
+    path = Path(persist_directory) / COLLECTIONS_MANIFEST
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+
+
+def cached_embeddings(embeddings, cache_dir: Path = database_path / "embedding_cache"):
+    """Embeddings cached on disk by chunk text, so chunks of unchanged sources are not embedded again."""
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
+
+    namespace = getattr(embeddings, "model", type(embeddings).__name__)
+    return CacheBackedEmbeddings.from_bytes_store(embeddings, LocalFileStore(str(cache_dir)), namespace=namespace)
+
+
+def ingest(web: bool = False, sharded: bool = True) -> Dict[str, object]:
+    from .data_handlers import embeddings, resources_links
+
+    docs = tag_documents(load_knowledge(knowledge_path, resources_links if web else None))
+    chunks, report = chunk_documents(docs, CHUNK_SIZE, CHUNK_OVERLAP)
+    counts = Counter(chunk.metadata["track"] for chunk in chunks)
+    print(f"{len(chunks)} chunks from {len(docs)} documents: {dict(counts)}")
+    print(f"Chunking: {report.to_dict()}")
+    return build_collections(chunks, cached_embeddings(embeddings), database_path, sharded=sharded)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--web", action="store_true", help="also load the web resources in data_handlers.py")
+    parser.add_argument("--single", action="store_true", help="one collection with metadata instead of one per track")
+    args = parser.parse_args()
+    ingest(web=args.web, sharded=not args.single)
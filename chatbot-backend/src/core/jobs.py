@@ -0,0 +1,314 @@
+"""
+Background jobs for long-running work (content generation), with status polling.
+
+Jobs live in a local SQLite database, so queued work survives restarts and can be shared by
+several server processes. Each job type has its own number of asyncio workers; handlers are
+plain functions run in a thread, so the event loop keeps serving requests while they work.
+
+- Deduplication: submitting a job identical (same type and parameters) to one that is still
+  queued or running returns the existing job instead of adding another.
+- Leases: a running job holds a lease that its worker renews. If the process dies, the lease
+  expires and any worker picks the job up again (up to max_attempts runs in total).
+
+    DIRECTED_JOBS_DB            SQLite file (default data/jobs.sqlite3)
+    DIRECTED_JOB_CONCURRENCY    workers per job type, e.g. "quiz=2,flashcards=1" (default 2 each)
+    DIRECTED_JOB_LEASE_S        lease length in seconds (default 60)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("DirectEd")
+
+project_root = Path(__file__).resolve().parent.parent.parent
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+DEFAULT_CONCURRENCY = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (type, status, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_dedupe ON jobs (dedupe_key)
+    WHERE status IN ('queued', 'running');
+"""
+
+
+@dataclass
+class Job:
+    id: str
+    type: str
+    params: Dict[str, Any]
+    status: str
+    attempts: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"], type=row["type"], params=json.loads(row["params"]), status=row["status"],
+            attempts=row["attempts"], created_at=row["created_at"], started_at=row["started_at"],
+            finished_at=row["finished_at"], result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def dedupe_key(job_type: str, params: Dict[str, Any]) -> str:
+    canonical = json.dumps({"type": job_type, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """The SQLite job table. Every method is blocking; JobQueue calls them from threads."""
+
+    def __init__(self, path: Path, lease_seconds: float = 60.0, max_attempts: int = 3):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; writes that read first take the write lock with BEGIN IMMEDIATE.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, job_type: str, params: Dict[str, Any]) -> Tuple[Job, bool]:
+        """Returns (job, created); created is False when an identical job was already active."""
+        key = dedupe_key(job_type, params)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)", (key, QUEUED, RUNNING)
+                ).fetchone()
+                if row is None:
+                    job_id = uuid.uuid4().hex
+                    conn.execute(
+                        "INSERT INTO jobs (id, type, params, dedupe_key, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (job_id, job_type, json.dumps(params), key, QUEUED, time.time()),
+                    )
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                    created = True
+                else:
+                    created = False
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return Job.from_row(row), created
+
+    def claim(self, job_type: str) -> Optional[Job]:
+        """Oldest queued job of this type (or one whose worker's lease ran out), now running."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        "SELECT * FROM jobs WHERE type = ? AND (status = ? OR (status = ? AND lease_until < ?)) "
+                        "ORDER BY created_at LIMIT 1",
+                        (job_type, QUEUED, RUNNING, now),
+                    ).fetchone()
+                    if row is None or row["attempts"] < self.max_attempts:
+                        break
+                    # A lost worker used up the last attempt.
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+                        (FAILED, "Worker stopped while running the job", now, row["id"]),
+                    )
+                if row is not None:
+                    if row["status"] == RUNNING:
+                        logger.warning("Job %s lease expired; running it again", row["id"])
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_until = ? "
+                        "WHERE id = ?",
+                        (RUNNING, now, now + self.lease_seconds, row["id"]),
+                    )
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return Job.from_row(row) if row is not None else None
+
+    def renew(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ?",
+                         (time.time() + self.lease_seconds, job_id, RUNNING))
+
+    def complete(self, job_id: str, result: Any) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, lease_until = NULL WHERE id = ?",
+                (SUCCEEDED, json.dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str, retry: bool) -> None:
+        with self._connect() as conn:
+            if retry:
+                conn.execute("UPDATE jobs SET status = ?, error = ?, lease_until = NULL WHERE id = ?",
+                             (QUEUED, error, job_id))
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+                    (FAILED, error, time.time(), job_id),
+                )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Deletes finished jobs older than the given age. Returns how many were deleted."""
+        cutoff = time.time() - older_than_seconds
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                                (SUCCEEDED, FAILED, cutoff)).rowcount
+
+
+class JobQueue:
+    """asyncio workers over a JobStore, a fixed number per job type."""
+
+    def __init__(self, store: JobStore, concurrency: Optional[Dict[str, int]] = None, poll_interval: float = 1.0):
+        self.store = store
+        self.concurrency = concurrency or {}
+        self.poll_interval = poll_interval
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        concurrency = {}
+        for item in filter(None, os.getenv("DIRECTED_JOB_CONCURRENCY", "").split(",")):
+            job_type, _, count = item.partition("=")
+            concurrency[job_type.strip()] = int(count)
+        store = JobStore(
+            Path(os.getenv("DIRECTED_JOBS_DB") or project_root / "data" / "jobs.sqlite3"),
+            lease_seconds=float(os.getenv("DIRECTED_JOB_LEASE_S", "60")),
+        )
+        return cls(store, concurrency)
+
+    def register(self, job_type: str, handler: Callable[[Dict[str, Any]], Any]) -> None:
+        """`handler(params)` runs in a worker thread and returns a JSON-serialisable result."""
+        self.handlers[job_type] = handler
+
+    async def submit(self, job_type: str, params: Dict[str, Any]) -> Tuple[Job, bool]:
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type {job_type!r}")
+        job, created = await asyncio.to_thread(self.store.submit, job_type, params)
+        if created and job_type in self._wakeups:
+            self._wakeups[job_type].set()
+        return job, created
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    # ------------------------
+    # Workers
+    # ------------------------
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        for job_type in self.handlers:
+            self._wakeups[job_type] = asyncio.Event()
+            for index in range(self.concurrency.get(job_type, DEFAULT_CONCURRENCY)):
+                self._tasks.append(asyncio.create_task(self._worker(job_type), name=f"job-{job_type}-{index}"))
+        logger.info("Job workers started: %s", {t: self.concurrency.get(t, DEFAULT_CONCURRENCY) for t in self.handlers})
+
+    async def stop(self) -> None:
+        """Stops the workers. Jobs they were running stay leased and are picked up after a restart."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, job_type: str) -> None:
+        wakeup = self._wakeups[job_type]
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, job_type)
+            except sqlite3.Error:
+                logger.exception("Could not claim a %s job", job_type)
+                job = None
+            if job is None:
+                # Woken by a local submit, or polling for jobs submitted by other processes.
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        renewal = asyncio.create_task(self._renew(job.id))
+        try:
+            result = await asyncio.to_thread(self.handlers[job.type], job.params)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            retry = job.attempts < self.store.max_attempts
+            logger.warning("Job %s (%s) failed on attempt %d: %s", job.id, job.type, job.attempts, exc)
+            await asyncio.to_thread(self.store.fail, job.id, str(exc), retry)
+        else:
+            await asyncio.to_thread(self.store.complete, job.id, result)
+        finally:
+            renewal.cancel()
+
+    async def _renew(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            await asyncio.to_thread(self.store.renew, job_id)
+
+
+job_queue = JobQueue.from_env()
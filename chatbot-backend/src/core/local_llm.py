@@ -0,0 +1,486 @@
+"""
+In-process CPU inference for the fine-tuned Gemma LoRA adapters.
+
+- LocalInferenceEngine loads the base model once (optionally int8 or 4-bit) and generates for
+  a batch of prompts at once. Per-track LoRA adapters are swapped in per batch by an AdapterPool. Key/values of registered prompt-template
+  prefixes are reused from a PrefixKVCache (see prefix_cache.py).
+- DynamicBatcher collects concurrent requests into batches: it waits at most
+  `max_wait_ms` after the first request, or until `max_batch_size` requests are queued.
+- LocalLLM is the object handed to ContentGenerator as `llm`: `generate(text)` for the
+  service layer and `as_runnable()` for LCEL chains.
+
+Configuration (environment):
+    DIRECTED_LLM_BACKEND=local     select this backend in chatbot.py
+    LOCAL_MODEL_NAME               base model (default google/gemma-2b)
+    LOCAL_ADAPTER_PATH             LoRA adapter directory ("none" to serve the base model); per-track
+                                   adapters live in sub-directories named by track (gen_ai, mern, ui_ux)
+    LOCAL_MAX_ADAPTERS             per-track adapters kept in memory at once (default 4)
+    LOCAL_QUANTIZATION             none | int8 | 4bit (default none)
+    LOCAL_MAX_BATCH_SIZE           default 8
+    LOCAL_MAX_WAIT_MS              default 20
+    LOCAL_MAX_NEW_TOKENS           default 256
+    LOCAL_PREFIX_CACHE_MB          prefix key/value budget, 0 disables (default 256)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .prefix_cache import PrefixKVCache, template_prefix
+from .serving import register_after_fork
+from .tracing import tracer
+from .tracks import track_slug
+
+load_dotenv()
+
+logger = logging.getLogger("DirectEd")
+
+project_root = Path(__file__).resolve().parent.parent.parent
+DEFAULT_MODEL_NAME = "google/gemma-2b"
+DEFAULT_ADAPTER_PATH = project_root / "finetuning" / "finetuned_adapters"
+
+# Prompt format used by finetuning/prepare_data.py; the adapter was trained on it.
+INSTRUCTION_TEMPLATE = "### Instruction:\n{prompt}\n\n### Response:\n"
+
+
+def instruction_prefix(template: Any) -> str:
+    """
+    Static opening of `template` once wrapped in INSTRUCTION_TEMPLATE: the text before {prompt}
+    followed by the template's own prefix. Every formatted prompt of the template starts with it.
+    """
+    return INSTRUCTION_TEMPLATE.split("{prompt}")[0] + template_prefix(template)
+
+
+# Name of the adapter stored directly in the adapter directory, used for tracks without their own.
+SHARED_ADAPTER = "shared"
+
+
+class AdapterPool:
+    """
+    LoRA adapters sharing one base model, one per learning track.
+
+    Adapters are read on first use and the least recently used one is unloaded once more than
+    `max_resident` are in memory, so adding tracks does not grow memory without bound. The base
+    weights are loaded once; only the small adapter weights are swapped.
+    """
+
+    def __init__(self, base_model: Any, adapters: Dict[str, str], max_resident: int = 4):
+        self.base_model = base_model
+        self.adapters = adapters  # adapter name -> directory
+        self.max_resident = max(1, max_resident)
+        self.model = base_model  # becomes a PeftModel once the first adapter is loaded
+        self._resident: "OrderedDict[str, None]" = OrderedDict()
+        self.stats: Dict[str, int] = {"loads": 0, "evictions": 0, "switches": 0}
+
+    @staticmethod
+    def discover(adapter_path: str) -> Dict[str, str]:
+        """
+        Adapters under `adapter_path`: one per track sub-directory (named by track slug), plus
+        the directory itself as the shared adapter if it holds one.
+        """
+        root = Path(adapter_path)
+        adapters: Dict[str, str] = {}
+        if (root / "adapter_config.json").exists():
+            adapters[SHARED_ADAPTER] = str(root)
+        if root.is_dir():
+            for child in sorted(root.iterdir()):
+                # Trainer checkpoints (checkpoint-N) also hold adapter configs; they are not tracks.
+                if not child.name.startswith("checkpoint-") and (child / "adapter_config.json").exists():
+                    adapters[child.name] = str(child)
+        return adapters
+
+    def resolve(self, track: Optional[str]) -> Optional[str]:
+        """Adapter for `track`: its own, else the shared one, else None (the base model)."""
+        if track and track_slug(track) in self.adapters:
+            return track_slug(track)
+        return SHARED_ADAPTER if SHARED_ADAPTER in self.adapters else None
+
+    def _load(self, name: str) -> None:
+        from peft import PeftModel
+
+        if self.model is self.base_model:
+            self.model = PeftModel.from_pretrained(self.base_model, self.adapters[name], adapter_name=name)
+        else:
+            self.model.load_adapter(self.adapters[name], adapter_name=name)
+        self.model.eval()
+        self._resident[name] = None
+        self.stats["loads"] += 1
+        logger.info("Loaded LoRA adapter '%s' from %s", name, self.adapters[name])
+        while len(self._resident) > self.max_resident:
+            evicted, _ = self._resident.popitem(last=False)
+            self.model.delete_adapter(evicted)
+            self.stats["evictions"] += 1
+            logger.info("Unloaded LoRA adapter '%s'", evicted)
+
+    @contextmanager
+    def use(self, name: Optional[str]):
+        """Yields the model with adapter `name` active (None: adapters disabled)."""
+        if name is None:
+            if self.model is self.base_model:
+                yield self.model
+            else:
+                with self.model.disable_adapter():
+                    yield self.model
+            return
+        if name in self._resident:
+            self._resident.move_to_end(name)
+        else:
+            self._load(name)
+        if self.model.active_adapter != name:
+            self.model.set_adapter(name)
+            self.stats["switches"] += 1
+        yield self.model
+
+
+class LocalInferenceEngine:
+    """
+    Base model + optional LoRA adapters on CPU, generating for whole batches of prompts.
+    With `merge_adapter=False` a single adapter is kept separate so the base model stays usable.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, adapter_path: Optional[str] = None,
+                 quantization: str = "none", num_threads: Optional[int] = None,
+                 prefix_cache: Optional[PrefixKVCache] = None, max_adapters: int = 4,
+                 merge_adapter: bool = True):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # Decoder-only models must be left-padded so every prompt ends right before generation.
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        load_kwargs: Dict[str, Any] = {"torch_dtype": torch.float32, "low_cpu_mem_usage": True}
+        if quantization == "4bit":
+            from transformers import BitsAndBytesConfig
+
+            load_kwargs["quantization_config"] = BitsAndBytesConfig(
+                load_in_4bit=True, bnb_4bit_quant_type="nf4", bnb_4bit_compute_dtype=torch.float32
+            )
+            load_kwargs["device_map"] = "cpu"
+        model = AutoModelForCausalLM.from_pretrained(model_name, **load_kwargs)
+        model.eval()
+
+        adapters = AdapterPool.discover(adapter_path) if adapter_path else {}
+        self.adapters: Optional[AdapterPool] = None
+        if merge_adapter and list(adapters) == [SHARED_ADAPTER] and quantization != "4bit":
+            from peft import PeftModel
+
+            # A single adapter is folded into the base weights, which removes its per-token overhead.
+            model = PeftModel.from_pretrained(model, adapters[SHARED_ADAPTER]).merge_and_unload()
+        elif adapters:
+            self.adapters = AdapterPool(model, adapters, max_resident=max_adapters)
+
+        if quantization == "int8":
+            if self.adapters is not None:
+                logger.warning("int8 quantization is not applied when serving several LoRA adapters.")
+            else:
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        self.model = model
+        self.model_name = model_name
+        self.adapter_path = adapter_path
+        self.quantization = quantization
+        self.prefix_cache = prefix_cache
+
+    def adapter_for(self, track: Optional[str]) -> Optional[str]:
+        return self.adapters.resolve(track) if self.adapters is not None else None
+
+    def use_adapter(self, adapter: Optional[str]):
+        """Context manager yielding the model with `adapter` active (None: the base model)."""
+        return self.adapters.use(adapter) if self.adapters is not None else nullcontext(self.model)
+
+    def prefix_for(self, prompt: str) -> Optional[str]:
+        return self.prefix_cache.match(prompt) if self.prefix_cache is not None else None
+
+    def _encode_prefix(self, prefix: str, adapter: Optional[str] = None) -> Tuple[List[int], Tuple]:
+        """Runs the prefix through the model once and returns its ids and per-layer key/values."""
+        ids = self.tokenizer(prefix)["input_ids"]
+        with self.torch.inference_mode(), self.use_adapter(adapter) as model:
+            past = model(input_ids=self.torch.tensor([ids]), use_cache=True).past_key_values
+        if hasattr(past, "to_legacy_cache"):
+            past = past.to_legacy_cache()
+        return ids, tuple((k, v) for k, v in past)
+
+    def _prefixed_inputs(self, prefix: str, prompts: List[str], adapter: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Batch inputs whose first tokens are the cached prefix. Padding goes between the prefix
+        and each suffix; the attention mask hides it and position ids follow the mask.
+        """
+        from transformers import DynamicCache
+
+        torch = self.torch
+        entry = self.prefix_cache.get_or_build(
+            prefix, lambda text: self._encode_prefix(text, adapter), namespace=adapter
+        )
+        suffixes = [self.tokenizer(p[len(prefix):], add_special_tokens=False)["input_ids"] for p in prompts]
+        width = max(len(s) for s in suffixes)
+        pad = self.tokenizer.pad_token_id
+        ids, mask = [], []
+        for suffix in suffixes:
+            gap = width - len(suffix)
+            ids.append(entry.input_ids + [pad] * gap + suffix)
+            mask.append([1] * len(entry.input_ids) + [0] * gap + [1] * len(suffix))
+        batch = len(prompts)
+        # generate() extends the cache in place, so every call gets its own copy.
+        past = DynamicCache.from_legacy_cache(tuple(
+            (k.expand(batch, -1, -1, -1).contiguous(), v.expand(batch, -1, -1, -1).contiguous())
+            for k, v in entry.key_values
+        ))
+        return {"input_ids": torch.tensor(ids), "attention_mask": torch.tensor(mask), "past_key_values": past}
+
+    def generate_batch(self, prompts: List[str], max_new_tokens: int = 256, temperature: float = 0.0,
+                       adapter: Optional[str] = None) -> Tuple[List[str], int]:
+        """
+        Generates completions for all prompts in one forward pass per token, with LoRA adapter
+        `adapter` active. Returns (texts, new tokens).
+        """
+        torch = self.torch
+        prefix = self.prefix_cache.match_all(prompts) if self.prefix_cache is not None else None
+        if prefix is not None:
+            inputs = self._prefixed_inputs(prefix, prompts, adapter)
+        else:
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        gen_kwargs: Dict[str, Any] = {
+            "max_new_tokens": max_new_tokens,
+            "pad_token_id": self.tokenizer.pad_token_id,
+        }
+        if temperature > 0:
+            gen_kwargs.update({"do_sample": True, "temperature": temperature})
+        else:
+            gen_kwargs["do_sample"] = False
+
+        with torch.inference_mode(), self.use_adapter(adapter) as model:
+            output = model.generate(**inputs, **gen_kwargs)
+        new_tokens = output[:, inputs["input_ids"].shape[1]:]
+        texts = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        generated = int((new_tokens != self.tokenizer.pad_token_id).sum())
+        return [t.strip() for t in texts], generated
+
+
+@dataclass
+class _Request:
+    prompt: str
+    max_new_tokens: int
+    temperature: float
+    prefix: Optional[str] = None
+    adapter: Optional[str] = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class DynamicBatcher:
+    """
+    Queues generation requests from any thread and runs them through the engine in batches.
+    Requests with different generation settings, cached prefixes or LoRA adapters are never
+    mixed in one batch.
+    """
+
+    def __init__(self, engine: LocalInferenceEngine, max_batch_size: int = 8, max_wait_ms: float = 20.0):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats: Dict[str, Any] = {"batches": 0, "requests": 0, "generated_tokens": 0, "batch_sizes": {}}
+        self._start()
+        # A forked server worker inherits the batcher but not its thread.
+        register_after_fork(self._start)
+
+    def _start(self) -> None:
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._pending: List[_Request] = []
+        self._stats_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="directed-local-llm", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str, max_new_tokens: int = 256, temperature: float = 0.0,
+               adapter: Optional[str] = None) -> Future:
+        request = _Request(prompt, max_new_tokens, temperature, self.engine.prefix_for(prompt), adapter)
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, prompt: str, max_new_tokens: int = 256, temperature: float = 0.0,
+                 timeout: Optional[float] = None, adapter: Optional[str] = None) -> str:
+        return self.submit(prompt, max_new_tokens, temperature, adapter).result(timeout=timeout)
+
+    @staticmethod
+    def _key(request: _Request) -> Tuple[int, float, Optional[str], Optional[str]]:
+        return request.max_new_tokens, request.temperature, request.prefix, request.adapter
+
+    def _collect(self) -> List[_Request]:
+        first = self._pending.pop(0) if self._pending else self._queue.get()
+        key = self._key(first)
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+
+        # Requests left over from the previous round that are compatible go first.
+        for request in list(self._pending):
+            if len(batch) >= self.max_batch_size:
+                break
+            if self._key(request) == key:
+                batch.append(request)
+                self._pending.remove(request)
+
+        while len(batch) < self.max_batch_size:
+            # Requests already queued are always taken; only waiting for new ones is bounded.
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if self._key(request) == key:
+                batch.append(request)
+            else:
+                self._pending.append(request)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                texts, generated = self.engine.generate_batch(
+                    [r.prompt for r in batch], batch[0].max_new_tokens, batch[0].temperature, batch[0].adapter
+                )
+            except Exception as exc:
+                logger.exception("Local generation failed for a batch of %d: %s", len(batch), exc)
+                for request in batch:
+                    request.future.set_exception(exc)
+                continue
+            for request, text in zip(batch, texts):
+                request.future.set_result(text)
+            with self._stats_lock:
+                self.stats["batches"] += 1
+                self.stats["requests"] += len(batch)
+                self.stats["generated_tokens"] += generated
+                sizes = self.stats["batch_sizes"]
+                sizes[len(batch)] = sizes.get(len(batch), 0) + 1
+
+
+class LocalLLM:
+    """
+    LLM backend for ContentGenerator backed by the local engine.
+    Calls from concurrent requests are batched together by the DynamicBatcher.
+
+    The adapter is chosen by track, which callers detect from the user's request (or take from
+    metadata): a prompt also holds retrieved material that may quote another track. Without a
+    track the shared adapter is used.
+    """
+
+    def __init__(self, batcher: DynamicBatcher, max_new_tokens: int = 256, temperature: float = 0.0,
+                 timeout: Optional[float] = 120.0, track: Optional[str] = None):
+        self.batcher = batcher
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+        self.track = track
+
+    def with_track(self, track: Optional[str]) -> "LocalLLM":
+        """This LLM with `track` as the default adapter track; shares the batcher and engine."""
+        bound = copy.copy(self)
+        bound.track = track
+        return bound
+
+    @classmethod
+    def from_env(cls) -> "LocalLLM":
+        adapter = os.getenv("LOCAL_ADAPTER_PATH") or str(DEFAULT_ADAPTER_PATH)
+        if adapter.lower() == "none" or not Path(adapter).exists():
+            if adapter.lower() != "none":
+                logger.warning("LoRA adapter not found at %s; serving the base model.", adapter)
+            adapter = None
+        cache_mb = int(os.getenv("LOCAL_PREFIX_CACHE_MB", "256"))
+        engine = LocalInferenceEngine(
+            model_name=os.getenv("LOCAL_MODEL_NAME", DEFAULT_MODEL_NAME),
+            adapter_path=adapter,
+            quantization=os.getenv("LOCAL_QUANTIZATION", "none").lower(),
+            prefix_cache=PrefixKVCache(cache_mb * 1024 * 1024) if cache_mb > 0 else None,
+            max_adapters=int(os.getenv("LOCAL_MAX_ADAPTERS", "4")),
+        )
+        batcher = DynamicBatcher(
+            engine,
+            max_batch_size=int(os.getenv("LOCAL_MAX_BATCH_SIZE", "8")),
+            max_wait_ms=float(os.getenv("LOCAL_MAX_WAIT_MS", "20")),
+        )
+        return cls(batcher, max_new_tokens=int(os.getenv("LOCAL_MAX_NEW_TOKENS", "256")))
+
+    def register_templates(self, *templates: Any) -> int:
+        """Registers the static prefix of each prompt template for key/value reuse. Returns how many were kept."""
+        cache = self.batcher.engine.prefix_cache
+        if cache is None:
+            return 0
+        return sum(cache.register(instruction_prefix(t)) for t in templates)
+
+    def _submit(self, prompt: str, track: Optional[str] = None) -> Future:
+        track = track or self.track
+        adapter = self.batcher.engine.adapter_for(track)
+        return self.batcher.submit(INSTRUCTION_TEMPLATE.format(prompt=prompt), self.max_new_tokens,
+                                   self.temperature, adapter)
+
+    def generate(self, prompt: str, track: Optional[str] = None) -> str:
+        """
+        Formats `prompt` as an instruction (the adapter's training format) and generates a response
+        with the adapter of `track` (this LLM's own track when not given).
+        """
+        track = track or self.track
+        adapter = self.batcher.engine.adapter_for(track)
+        with tracer.span("llm.local_generate", prompt_chars=len(prompt), track=track, adapter=adapter):
+            return self.batcher.generate(
+                INSTRUCTION_TEMPLATE.format(prompt=prompt), self.max_new_tokens, self.temperature,
+                self.timeout, adapter,
+            )
+
+    def generate_many(self, prompts: List[str], return_exceptions: bool = False,
+                      tracks: Optional[List[Optional[str]]] = None) -> List[Any]:
+        """
+        Submits all prompts at once so the batcher can put them in the same batches. `tracks` gives
+        the track of each prompt's request.
+        """
+        tracks = tracks or [None] * len(prompts)
+        with tracer.span("llm.local_generate_many", prompts=len(prompts)):
+            futures = [self._submit(prompt, track) for prompt, track in zip(prompts, tracks)]
+            results: List[Any] = []
+            for future in futures:
+                try:
+                    results.append(future.result(timeout=self.timeout))
+                except Exception as exc:
+                    if not return_exceptions:
+                        raise
+                    results.append(exc)
+            return results
+
+    async def agenerate_many(self, prompts: List[str], return_exceptions: bool = False,
+                             tracks: Optional[List[Optional[str]]] = None) -> List[Any]:
+        tracks = tracks or [None] * len(prompts)
+        futures = [asyncio.wrap_future(self._submit(prompt, track)) for prompt, track in zip(prompts, tracks)]
+        return list(await asyncio.wait_for(asyncio.gather(*futures, return_exceptions=return_exceptions),
+                                           self.timeout))
+
+    def as_runnable(self):
+        """
+        LCEL-compatible wrapper: accepts a prompt value or string, returns the generated text.
+        The track comes from the run's metadata ({"track": ...}) when the caller sets it.
+        """
+        from langchain_core.runnables import RunnableLambda
+
+        def _call(prompt: Any, config: Optional[Dict[str, Any]] = None) -> str:
+            text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+            return self.generate(text, ((config or {}).get("metadata") or {}).get("track"))
+
+        return RunnableLambda(_call, name="LocalLLM")
@@ -0,0 +1,188 @@
+"""
+Page-parallel PDF text extraction with an on-disk cache.
+
+Pages are extracted by a process pool in contiguous ranges (each worker opens the PDF once
+per range). Text is cached per (file hash, page, mode) under data/pdf_cache, so re-ingesting
+an unchanged PDF reads the cache instead of parsing.
+
+Modes:
+    plumber  pdfplumber for every page (what PDFPlumberLoader does)
+    fast     pypdfium2 text extraction for every page
+    auto     pypdfium2 for text-only pages, pdfplumber for pages with images or drawn
+             lines/tables, where its layout handling matters (default)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("DirectEd")
+
+project_root = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CACHE_DIR = project_root / "data" / "pdf_cache"
+MODES = ("plumber", "fast", "auto")
+PAGES_PER_TASK = 8
+# A page with more vector paths than this is treated as a table/diagram page in "auto" mode.
+MAX_TEXT_ONLY_PATHS = 20
+
+
+@dataclass
+class ExtractionStats:
+    files: int = 0
+    pages: int = 0
+    cached_pages: int = 0
+    fast_pages: int = 0
+    plumber_pages: int = 0
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_count(path: Path) -> int:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(str(path))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _is_text_only(page) -> bool:
+    import pypdfium2.raw as pdfium_c
+
+    paths = 0
+    for obj in page.get_objects():
+        if obj.type in (pdfium_c.FPDF_PAGEOBJ_IMAGE, pdfium_c.FPDF_PAGEOBJ_SHADING, pdfium_c.FPDF_PAGEOBJ_FORM):
+            return False
+        if obj.type == pdfium_c.FPDF_PAGEOBJ_PATH:
+            paths += 1
+            if paths > MAX_TEXT_ONLY_PATHS:
+                return False
+    return True
+
+
+def _extract_range(task: Tuple[str, int, int, str]) -> List[Tuple[int, str, str]]:
+    """Worker: (page, text, parser) for pages [start, end) of one PDF."""
+    path, start, end, mode = task
+    results: List[Tuple[int, str, str]] = []
+    plumber_pages: List[int] = []
+
+    if mode in ("fast", "auto"):
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(path)
+        try:
+            for number in range(start, end):
+                page = pdf[number]
+                try:
+                    if mode == "auto" and not _is_text_only(page):
+                        plumber_pages.append(number)
+                        continue
+                    textpage = page.get_textpage()
+                    results.append((number, textpage.get_text_range(), "fast"))
+                    textpage.close()
+                finally:
+                    page.close()
+        finally:
+            pdf.close()
+    else:
+        plumber_pages = list(range(start, end))
+
+    if plumber_pages:
+        import pdfplumber
+
+        with pdfplumber.open(path) as pdf:
+            for number in plumber_pages:
+                results.append((number, pdf.pages[number].extract_text() or "", "plumber"))
+    return sorted(results)
+
+
+class PDFExtractor:
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, mode: str = "auto", workers: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.cache_dir = Path(cache_dir)
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.stats = ExtractionStats()
+
+    def _cache_path(self, digest: str, page: int) -> Path:
+        return self.cache_dir / digest / self.mode / f"page-{page:05d}.txt"
+
+    def extract(self, paths: Iterable[Path]) -> Dict[Path, List[str]]:
+        """Text of every page of every PDF, in page order."""
+        paths = [Path(p) for p in paths]
+        texts: Dict[Path, List[Optional[str]]] = {}
+        digests: Dict[Path, str] = {}
+        tasks = []
+        for path in paths:
+            digest = digests[path] = file_digest(path)
+            pages = page_count(path)
+            texts[path] = [None] * pages
+            missing = []
+            for number in range(pages):
+                cached = self._cache_path(digest, number)
+                if cached.exists():
+                    texts[path][number] = cached.read_text(encoding="utf-8")
+                    self.stats.cached_pages += 1
+                else:
+                    missing.append(number)
+            # Contiguous runs of uncached pages, split into ranges so every worker gets work.
+            runs: List[List[int]] = []
+            for number in missing:
+                if runs and runs[-1][-1] == number - 1 and len(runs[-1]) < PAGES_PER_TASK:
+                    runs[-1].append(number)
+                else:
+                    runs.append([number])
+            tasks += [(str(path), run[0], run[-1] + 1, self.mode) for run in runs]
+            self.stats.files += 1
+            self.stats.pages += pages
+
+        if tasks:
+            by_name = {str(p): p for p in paths}
+            if self.workers > 1 and len(tasks) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                    outputs = list(pool.map(_extract_range, tasks))
+            else:
+                outputs = [_extract_range(task) for task in tasks]
+            for task, output in zip(tasks, outputs):
+                path = by_name[task[0]]
+                for number, text, parser in output:
+                    texts[path][number] = text
+                    cache_path = self._cache_path(digests[path], number)
+                    cache_path.parent.mkdir(parents=True, exist_ok=True)
+                    cache_path.write_text(text, encoding="utf-8")
+                    if parser == "fast":
+                        self.stats.fast_pages += 1
+                    else:
+                        self.stats.plumber_pages += 1
+        return {path: [t or "" for t in pages] for path, pages in texts.items()}
+
+
+def load_pdfs(directory: Path, mode: str = "auto", cache_dir: Path = DEFAULT_CACHE_DIR,
+              workers: Optional[int] = None) -> List:
+    """One Document per PDF page, with the same source/page metadata as PDFPlumberLoader."""
+    from langchain_core.documents import Document
+
+    extractor = PDFExtractor(cache_dir, mode, workers)
+    extracted = extractor.extract(sorted(Path(directory).glob("*.pdf")))
+    logger.info("PDF extraction: %s", extractor.stats)
+    docs = []
+    for path, pages in extracted.items():
+        for number, text in enumerate(pages):
+            docs.append(Document(page_content=text,
+                                 metadata={"source": str(path), "file_path": str(path),
+                                           "page": number, "total_pages": len(pages)}))
+    return docs
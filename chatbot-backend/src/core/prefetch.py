@@ -0,0 +1,211 @@
+"""
+Background prefetch of each user's next adaptive lesson.
+
+After a chat turn (and after an adaptive lesson is served) the request that
+/api/assistant/adaptive_learning would serve next is computed from the user's schedule and its
+content generated in a small background pool whose threads run at a lower CPU priority. The
+result is kept per user, tagged with the request and the profile version it was generated for.
+A click serves it only when the next request is still the same, the profile has not changed
+since and the entry has not expired; otherwise the lesson is generated on the spot as before.
+Profile updates drop the user's entry right away. A prefetch asked for while the user's previous
+one is still generating (after a click, say) runs once that one finishes, and so does one whose
+profile changed during generation, so the entry always catches up with the latest click.
+
+Counters (served by /debug/prefetch_stats): hit rate is hits over adaptive requests, wasted
+rate is prefetched lessons that were dropped (invalidated, expired, evicted, or not matching
+the click) over lessons generated.
+
+    DIRECTED_PREFETCH              "0" disables prefetching (default on)
+    DIRECTED_PREFETCH_WORKERS      background generations at a time (default 1)
+    DIRECTED_PREFETCH_TTL_S        seconds a prefetched lesson stays valid (default 900)
+    DIRECTED_PREFETCH_MAX_PENDING  queued prefetches before new ones are dropped (default 64)
+    DIRECTED_PREFETCH_MAX_USERS    cached lessons kept, oldest evicted first (default 10000)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from .state_store import profile_changed
+from .tracing import tracer
+
+load_dotenv()
+
+logger = logging.getLogger("DirectEd")
+
+PREFETCH_ENABLED = os.getenv("DIRECTED_PREFETCH", "1") != "0"
+PREFETCH_WORKERS = int(os.getenv("DIRECTED_PREFETCH_WORKERS", "1"))
+PREFETCH_TTL_S = float(os.getenv("DIRECTED_PREFETCH_TTL_S", "900"))
+PREFETCH_MAX_PENDING = int(os.getenv("DIRECTED_PREFETCH_MAX_PENDING", "64"))
+PREFETCH_MAX_USERS = int(os.getenv("DIRECTED_PREFETCH_MAX_USERS", "10000"))
+# Added to the niceness of the pool's threads (Linux schedules threads individually).
+PREFETCH_NICE = 10
+
+
+def _lower_priority() -> None:
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PREFETCH_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+@dataclass
+class PrefetchedLesson:
+    request: str
+    version: int
+    content: Any
+    expires: float
+
+
+class LessonPrefetcher:
+    """
+    Per-user cache of the next adaptive lesson, filled in the background.
+
+    next_request(user_id) gives the request the adaptive route would serve (None when there is
+    nothing to learn), generate(request) its content, version(user_id) the profile's update
+    counter (LearningAnalyzer.profile_version).
+    """
+
+    FIELDS = ("scheduled", "requeued", "skipped", "dropped", "generated", "errors", "hits", "misses", "wasted")
+
+    def __init__(self, next_request: Callable[[str], Optional[str]], generate: Callable[[str], Any],
+                 version: Callable[[str], int], ttl: float = PREFETCH_TTL_S, workers: int = PREFETCH_WORKERS,
+                 max_pending: int = PREFETCH_MAX_PENDING, max_users: int = PREFETCH_MAX_USERS,
+                 enabled: bool = PREFETCH_ENABLED):
+        self.next_request = next_request
+        self.generate = generate
+        self.version = version
+        self.ttl = ttl
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_users = max_users
+        self.enabled = enabled
+        self.lessons: "OrderedDict[str, PrefetchedLesson]" = OrderedDict()
+        self.pending: set = set()
+        # Users whose prefetch in flight is outdated: another one is submitted when it finishes.
+        self.requeued: set = set()
+        self.counts: Dict[str, int] = dict.fromkeys(self.FIELDS, 0)
+        self._lock = threading.Lock()
+        # Created on first use, so a preloaded gunicorn master never starts threads before forking.
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch",
+                                                    initializer=_lower_priority)
+            return self._executor
+
+    # ------------------------
+    # Filling
+    # ------------------------
+    def schedule(self, user_id: str) -> bool:
+        """Queues a prefetch of the user's next lesson (a post-response hook). Never blocks."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if user_id in self.pending:
+                # The prefetch in flight may be for an older request or profile; follow it with a fresh one.
+                if user_id not in self.requeued:
+                    self.requeued.add(user_id)
+                    self.counts["requeued"] += 1
+                return True
+            if len(self.pending) >= self.max_pending:
+                self.counts["dropped"] += 1
+                return False
+            self.pending.add(user_id)
+            self.counts["scheduled"] += 1
+        self._pool().submit(self._prefetch, user_id)
+        return True
+
+    def _prefetch(self, user_id: str) -> None:
+        with self._lock:
+            # Requests made while this one waited in the queue are covered by what it reads now.
+            self.requeued.discard(user_id)
+        try:
+            request = self.next_request(user_id)
+            if request is None:
+                return
+            # Read before generating: an update during generation leaves the entry outdated, not wrong.
+            version = self.version(user_id)
+            with self._lock:
+                lesson = self.lessons.get(user_id)
+                if lesson is not None and lesson.request == request and lesson.version == version \
+                        and lesson.expires > time.monotonic():
+                    self.counts["skipped"] += 1
+                    return
+            with tracer.trace("prefetch_lesson", user_id=user_id):
+                content = self.generate(request)
+            outdated = self.version(user_id) != version
+            with self._lock:
+                self.counts["generated"] += 1
+                if outdated:
+                    # The profile changed while generating: the lesson would never be served.
+                    self.counts["wasted"] += 1
+                    if user_id not in self.requeued:
+                        self.requeued.add(user_id)
+                        self.counts["requeued"] += 1
+                    return
+                if self.lessons.pop(user_id, None) is not None:
+                    self.counts["wasted"] += 1
+                self.lessons[user_id] = PrefetchedLesson(request, version, content, time.monotonic() + self.ttl)
+                while len(self.lessons) > self.max_users:
+                    self.lessons.popitem(last=False)
+                    self.counts["wasted"] += 1
+        except Exception as e:
+            with self._lock:
+                self.counts["errors"] += 1
+            logger.warning("Prefetching the next lesson for user %s failed: %s", user_id, e)
+        finally:
+            with self._lock:
+                again = user_id in self.requeued
+                self.requeued.discard(user_id)
+                if again:
+                    # Still pending, so schedule() keeps marking it instead of queueing a duplicate.
+                    self.counts["scheduled"] += 1
+                else:
+                    self.pending.discard(user_id)
+            if again:
+                self._pool().submit(self._prefetch, user_id)
+
+    # ------------------------
+    # Serving
+    # ------------------------
+    def take(self, user_id: str, request: str) -> Optional[Any]:
+        """The prefetched content for `request` if it is still valid (it is served once), else None."""
+        with self._lock:
+            lesson = self.lessons.pop(user_id, None)
+        valid = (lesson is not None and lesson.request == request and lesson.expires > time.monotonic()
+                 and lesson.version == self.version(user_id))
+        with self._lock:
+            self.counts["hits" if valid else "misses"] += 1
+            if lesson is not None and not valid:
+                self.counts["wasted"] += 1
+        return lesson.content if valid else None
+
+    def invalidate(self, user_id: str, topic: str, performance: str, changes: Dict[str, Any]) -> None:
+        """LearningAnalyzer listener: a profile change makes the user's prefetched lesson outdated."""
+        if not profile_changed(changes):
+            return
+        with self._lock:
+            if self.lessons.pop(user_id, None) is not None:
+                self.counts["wasted"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            counts["cached"] = len(self.lessons)
+            counts["pending"] = len(self.pending)
+        served = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / served, 4) if served else 0.0
+        counts["wasted_rate"] = round(counts["wasted"] / counts["generated"], 4) if counts["generated"] else 0.0
+        return counts
@@ -0,0 +1,142 @@
+"""
+Key/value cache for the fixed opening of prompt templates, reused across local generations.
+
+Every tutoring prompt starts with the same instruction block; only the question, topic and
+retrieved content change. The local engine encodes each registered prefix once, keeps its
+past key/values here and only prefills the variable part of later prompts.
+
+- `template_prefix(template)` returns the static text of a template before its first variable.
+- `PrefixKVCache` holds the registered prefixes and their key/values, evicting least recently
+  used entries once `max_bytes` is exceeded. The prefixes stay registered; an evicted entry is
+  simply rebuilt the next time it is needed.
+"""
+
+from __future__ import annotations
+
+import logging
+import string
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("DirectEd")
+
+# Prefixes shorter than this are not worth a cache entry.
+MIN_PREFIX_CHARS = 64
+
+
+def template_prefix(template: Any) -> str:
+    """
+    Static text of a prompt template (a format string or a PromptTemplate) before its first
+    variable, cut back to the last newline so the prefix and the rest tokenize independently.
+    """
+    text = getattr(template, "template", template)
+    literal = []
+    for literal_text, field_name, _, _ in string.Formatter().parse(text):
+        literal.append(literal_text)
+        if field_name is not None:
+            break
+    prefix = "".join(literal)
+    cut = prefix.rfind("\n")
+    return prefix[: cut + 1] if cut >= 0 else ""
+
+
+@dataclass
+class PrefixEntry:
+    input_ids: List[int]
+    key_values: Tuple[Tuple[Any, Any], ...]  # per layer (key, value), batch size 1
+    nbytes: int
+    build_ms: float
+
+
+class PrefixKVCache:
+    """LRU of prefix key/values under a memory budget. Safe to share between threads."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, min_prefix_chars: int = MIN_PREFIX_CHARS):
+        self.max_bytes = max_bytes
+        self.min_prefix_chars = min_prefix_chars
+        self._prefixes: List[str] = []  # longest first
+        self._entries: "OrderedDict[Tuple[Optional[str], str], PrefixEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"hits": 0, "misses": 0, "evictions": 0, "prefill_ms_saved": 0.0}
+
+    def register(self, prefix: str) -> bool:
+        """Registers a prefix. Returns False if it is too short to be worth caching."""
+        if len(prefix) < self.min_prefix_chars:
+            logger.debug("Prefix of %d chars not cached (minimum %d).", len(prefix), self.min_prefix_chars)
+            return False
+        with self._lock:
+            if prefix not in self._prefixes:
+                self._prefixes.append(prefix)
+                self._prefixes.sort(key=len, reverse=True)
+        return True
+
+    def match(self, prompt: str) -> Optional[str]:
+        """Longest registered prefix that `prompt` starts with and extends."""
+        for prefix in self._prefixes:
+            if len(prompt) > len(prefix) and prompt.startswith(prefix):
+                return prefix
+        return None
+
+    def match_all(self, prompts: Sequence[str]) -> Optional[str]:
+        """Registered prefix shared by every prompt in a batch, if any."""
+        prefix = self.match(prompts[0]) if prompts else None
+        if prefix is None or any(len(p) <= len(prefix) or not p.startswith(prefix) for p in prompts):
+            return None
+        return prefix
+
+    def get_or_build(self, prefix: str, build: Callable[[str], Tuple[List[int], Tuple]],
+                     namespace: Optional[str] = None) -> PrefixEntry:
+        """
+        Returns the entry for `prefix`, building it with `build(prefix) -> (input_ids, key_values)` on a miss.
+        Key/values depend on the weights, so each LoRA adapter uses its own `namespace`.
+        """
+        key = (namespace, prefix)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["prefill_ms_saved"] += entry.build_ms
+                return entry
+            self.stats["misses"] += 1
+
+        start = time.perf_counter()
+        input_ids, key_values = build(prefix)
+        entry = PrefixEntry(
+            input_ids=input_ids,
+            key_values=key_values,
+            nbytes=sum(t.numel() * t.element_size() for layer in key_values for t in layer),
+            build_ms=(time.perf_counter() - start) * 1000,
+        )
+        if entry.nbytes > self.max_bytes:
+            logger.warning("Prefix key/values (%d bytes) exceed the cache budget; not cached.", entry.nbytes)
+            return entry
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.stats["evictions"] += 1
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "registered": len(self._prefixes),
+                "resident": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
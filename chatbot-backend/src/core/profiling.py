@@ -0,0 +1,292 @@
+"""
+Opt-in, per-request statistical profiling.
+
+A request is profiled when either:
+- it carries `X-DirectEd-Profile: <DIRECTED_ADMIN_TOKEN>`, or
+- it is picked by DIRECTED_PROFILE_SAMPLE_RATE (fraction of requests, default 0).
+
+While a profiled call runs, a background thread samples the calling thread's stack
+every DIRECTED_PROFILE_INTERVAL_MS (default 5ms). The result is stored per request id
+as collapsed stacks (flamegraph.pl / speedscope import) and as a speedscope JSON file
+under DIRECTED_PROFILE_DIR. When profiling is off, the wrapper only checks a context var
+and a float before calling straight through.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("DirectEd")
+
+PROFILE_HEADER = "x-directed-profile"
+REQUEST_ID_HEADER = "x-request-id"
+
+project_root = Path(__file__).resolve().parent.parent.parent
+
+Frame = Tuple[str, str, int]
+
+# Request ids come from clients and become file names; keep them to a safe alphabet.
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Longest client id kept as the prefix of a server-assigned id (prefix, "-", 12 hex digits).
+_CLIENT_ID_MAX = 48
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack on a timer until stopped."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._target = threading.get_ident()
+        self._base_frame = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def start(self) -> None:
+        # Frames above the caller (server, event loop) are the same for every sample; skip them.
+        self._base_frame = sys._getframe(1)
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="directed-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        self._base_frame = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack: List[Frame] = []
+            while frame is not None and frame is not self._base_frame:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, frame.f_lineno))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+                self.samples += 1
+
+    # ------------------------
+    # Output formats
+    # ------------------------
+    @staticmethod
+    def _frame_name(frame: Frame) -> str:
+        filename, func, line = frame
+        return f"{func} ({os.path.basename(filename)}:{line})"
+
+    def to_collapsed(self) -> str:
+        lines = [
+            ";".join(self._frame_name(f) for f in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict[str, Any]] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        interval_ms = self.interval * 1000.0
+        for stack, count in self.stacks.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[1], "file": frame[0], "line": frame[2]})
+                indices.append(frame_index[frame])
+            samples.append(indices)
+            weights.append(count * interval_ms)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": "directed-profiler",
+            "name": name,
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+class ProfileStore:
+    """Keeps the most recent profiles on disk, one pair of files per request id."""
+
+    def __init__(self, directory: Path, max_profiles: int = 50):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, request_id: str, profiler: SamplingProfiler, label: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "request_id": request_id,
+            "label": label,
+            "created_at": time.time(),
+            "duration_ms": round(profiler.duration * 1000.0, 3),
+            "samples": profiler.samples,
+            "interval_ms": profiler.interval * 1000.0,
+        }
+        with self._lock:
+            (self.directory / f"{request_id}.collapsed.txt").write_text(profiler.to_collapsed(), encoding="utf-8")
+            (self.directory / f"{request_id}.speedscope.json").write_text(
+                json.dumps(profiler.to_speedscope(f"{label} {request_id}")), encoding="utf-8"
+            )
+            (self.directory / f"{request_id}.meta.json").write_text(json.dumps(meta), encoding="utf-8")
+            self._prune()
+
+    def _prune(self) -> None:
+        metas = sorted(self.directory.glob("*.meta.json"), key=lambda p: p.stat().st_mtime)
+        for meta in metas[: max(0, len(metas) - self.max_profiles)]:
+            request_id = meta.name[: -len(".meta.json")]
+            for suffix in (".meta.json", ".collapsed.txt", ".speedscope.json"):
+                (self.directory / f"{request_id}{suffix}").unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for meta in self.directory.glob("*.meta.json"):
+            try:
+                profiles.append(json.loads(meta.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+    def path_for(self, request_id: str, fmt: str) -> Optional[Path]:
+        suffix = {"speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}.get(fmt)
+        if suffix is None or not _SAFE_ID.match(request_id):
+            return None
+        path = self.directory / f"{request_id}{suffix}"
+        return path if path.exists() else None
+
+
+# Request id of the current HTTP request when it asked to be profiled, else None.
+_requested: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("directed_profile_request", default=None)
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("directed_request_id", default=None)
+
+
+class RequestProfiler:
+    """Decides which calls to profile and stores their output."""
+
+    def __init__(self, store: ProfileStore, sample_rate: float = 0.0, interval: float = 0.005,
+                 admin_token: Optional[str] = None):
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.admin_token = admin_token
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler":
+        directory = os.getenv("DIRECTED_PROFILE_DIR") or str(project_root / "profiles")
+        return cls(
+            store=ProfileStore(Path(directory), max_profiles=int(os.getenv("DIRECTED_PROFILE_MAX", "50"))),
+            sample_rate=float(os.getenv("DIRECTED_PROFILE_SAMPLE_RATE", "0")),
+            interval=float(os.getenv("DIRECTED_PROFILE_INTERVAL_MS", "5")) / 1000.0,
+            admin_token=os.getenv("DIRECTED_ADMIN_TOKEN") or None,
+        )
+
+    def profiled(self, label: Optional[str] = None) -> Callable:
+        """Decorator that profiles the wrapped call when the current request opted in."""
+
+        def deco(fn: Callable) -> Callable:
+            name = label or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                request_id = _requested.get()
+                if request_id is None:
+                    if not self.sample_rate or random.random() >= self.sample_rate:
+                        return fn(*args, **kwargs)
+                    request_id = _request_id.get() or uuid.uuid4().hex
+
+                profiler = SamplingProfiler(self.interval)
+                profiler.start()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    profiler.stop()
+                    try:
+                        self.store.save(request_id, profiler, name)
+                    except OSError as exc:
+                        logger.warning("Failed to store profile %s: %s", request_id, exc)
+
+            return wrapper
+
+        return deco
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that assigns a request id and marks the request for profiling
+    when the profile header carries the admin token. The id is echoed in `X-Request-ID`.
+    A client-supplied id is only kept as a prefix of a server-generated one, so two clients
+    sending the same id never overwrite each other's profiles.
+    """
+
+    def __init__(self, app, profiler: "RequestProfiler"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        client_id = (headers.get(REQUEST_ID_HEADER.encode()) or b"").decode("latin-1")
+        if _SAFE_ID.match(client_id) and len(client_id) <= _CLIENT_ID_MAX:
+            request_id = f"{client_id}-{uuid.uuid4().hex[:12]}"
+        else:
+            request_id = uuid.uuid4().hex
+        wanted = headers.get(PROFILE_HEADER.encode())
+        token = self.profiler.admin_token
+        requested = bool(wanted) and token is not None and secrets.compare_digest(wanted, token.encode())
+
+        id_token = _request_id.set(request_id)
+        req_token = _requested.set(request_id if requested else None)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _requested.reset(req_token)
+            _request_id.reset(id_token)
+
+
+request_profiler = RequestProfiler.from_env()
@@ -0,0 +1,114 @@
+"""
+Track-aware retrieval over the collections written by ingestion.py.
+
+A query is searched within its learning track plus the "General" chunks that belong to no track:
+in those collections when the store is sharded, or with a metadata filter per track on the single
+collection otherwise, keeping the closest chunks of both. Queries whose track cannot be detected,
+or whose track has no chunks, search every collection and keep the closest chunks overall.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .tracks import GENERAL_TRACK, detect_track
+
+logger = logging.getLogger("DirectEd")
+
+
+class TrackRetriever:
+    """Routes or filters similarity search by learning track."""
+
+    def __init__(self, stores: Dict[str, object], sharded: bool, k: int = 4, embeddings=None):
+        # track -> vector store; a single unsharded collection is stored under "*".
+        self.stores = stores
+        self.sharded = sharded
+        self.k = k
+        # Used by asearch_many to embed a batch of queries in one call.
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_manifest(cls, manifest: dict, embeddings, persist_directory: str, k: int = 4,
+                      connection=None) -> "TrackRetriever":
+        from .vectorstore import connect_vector_store
+
+        connection = connection or connect_vector_store(embeddings, persist_directory)
+        stores = {track: connection.collection(entry["name"]) for track, entry in manifest["collections"].items()}
+        return cls(stores, sharded=manifest["sharded"], k=k, embeddings=embeddings)
+
+    def _targets(self, track: Optional[str]) -> List[Tuple[object, Optional[dict]]]:
+        """(store, filter) pairs holding the chunks of `track` and the General ones; [] for no track."""
+        if track is None:
+            return []
+        tracks = [track] if track == GENERAL_TRACK else [track, GENERAL_TRACK]
+        if not self.sharded:
+            return [(self.stores["*"], {"track": name}) for name in tracks]
+        return [(self.stores[name], None) for name in tracks if name in self.stores]
+
+    def _everywhere(self) -> List[Tuple[object, Optional[dict]]]:
+        return [(store, None) for store in self.stores.values()]
+
+    def search(self, query: str, track: Optional[str] = None, k: Optional[int] = None) -> List:
+        k = k or self.k
+        docs = self._search(query, self._targets(track), k)
+        if not docs:
+            # Unknown track, or no chunks for it: the closest chunks overall.
+            docs = self._search(query, self._everywhere(), k)
+        return docs
+
+    @staticmethod
+    def _search(query: str, targets: List[Tuple[object, Optional[dict]]], k: int) -> List:
+        scored = []
+        for store, filter in targets:
+            scored.extend(store.similarity_search_with_score(query, k=k, filter=filter))
+        return _closest(scored, k)
+
+    def invoke(self, query: str) -> List:
+        """Retriever-compatible entry point; the track is detected from the query."""
+        return self.search(query, detect_track(query))
+
+    async def _ascored(self, store, query: str, embedding: Optional[List[float]], filter=None) -> List:
+        if embedding is not None and hasattr(store, "asimilarity_search_by_vector_with_score"):
+            return await store.asimilarity_search_by_vector_with_score(embedding, k=self.k, filter=filter)
+        return await store.asimilarity_search_with_score(query, k=self.k, filter=filter)
+
+    async def _asearch(self, query: str, targets: List[Tuple[object, Optional[dict]]],
+                       embedding: Optional[List[float]]) -> List:
+        results = await asyncio.gather(*(self._ascored(store, query, embedding, filter) for store, filter in targets))
+        return _closest([pair for result in results for pair in result], self.k)
+
+    async def asearch(self, query: str, track: Optional[str] = None,
+                      embedding: Optional[List[float]] = None) -> List:
+        """search() without blocking the event loop; the collections are queried concurrently."""
+        docs = await self._asearch(query, self._targets(track), embedding)
+        if not docs:
+            docs = await self._asearch(query, self._everywhere(), embedding)
+        return docs
+
+    async def asearch_many(self, queries: List[str], tracks: List[Optional[str]]) -> List[List]:
+        """Searches for a batch of queries: one embedding call for all of them, then every search concurrently."""
+        embedded: List[Optional[List[float]]] = [None] * len(queries)
+        if self.embeddings is not None and queries:
+            embedded = await _embed_queries(self.embeddings, list(queries))
+        return list(await asyncio.gather(
+            *(self.asearch(query, track, embedding) for query, track, embedding in zip(queries, tracks, embedded))
+        ))
+
+    async def ainvoke(self, query: str) -> List:
+        return await self.asearch(query, detect_track(query))
+
+
+def _closest(scored: List[Tuple[object, float]], k: int) -> List:
+    # Chroma and the ANN index both score by distance: lower is closer.
+    scored.sort(key=lambda pair: pair[1])
+    return [doc for doc, _ in scored[:k]]
+
+
+async def _embed_queries(embeddings, queries: List[str]) -> List[List[float]]:
+    # Google embeddings distinguish query from document vectors; embed_documents defaults to documents.
+    if "task_type" in inspect.signature(embeddings.embed_documents).parameters:
+        return await asyncio.to_thread(embeddings.embed_documents, queries, task_type="retrieval_query")
+    return await embeddings.aembed_documents(queries)
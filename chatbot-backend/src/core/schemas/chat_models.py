@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 
 class ChatRequest(BaseModel):
@@ -10,19 +10,77 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     user_type: str = Field(..., description="The type of user (Student or Instructor).")
     content_type: str = Field(..., description="The type of content generated (TUTORING or QUIZ).")
-    output: str = Field(..., description="The generated educational content.")
+    output: Any = Field(..., description="The generated educational content: {\"text\"} for tutoring, the quiz for quizzes, or a message.")
     updated_profile: Dict[str, Any] = Field(..., description="The updated learning profile of the user.")
+    topic: Optional[str] = Field(None, description="The curriculum topic of an adaptive lesson.")
+
+class AnswerRequest(BaseModel):
+    user_id: str = Field(..., description="The unique identifier for the user.")
+    topic: str = Field(..., description="The curriculum topic the answer was about.")
+    correct: bool = Field(..., description="Whether the student answered correctly.")
+
+class AnswerResponse(BaseModel):
+    user_id: str
+    topic: str = Field(..., description="The curriculum topic the answer was recorded for.")
+    mastery: float = Field(..., description="The student's mastery estimate of the topic, from 0 to 1.")
+    updated_profile: Dict[str, Any]
 
 class ContentGenerateRequest(BaseModel):
     user_id: str = Field(..., description="The unique identifier for the user.")
     subject: str = Field(..., description="The subject or topic for content generation.")
     request_type: str = Field("quiz", description="The type of content to generate (e.g., 'quiz', 'flashcard').")
+    num_items: int = Field(5, ge=1, le=50, description="Number of questions, flashcards or practice items.")
+    level: Optional[str] = Field("beginner", description="Difficulty level of the generated content.")
 
 class AnalyticsResponse(BaseModel):
     user_id: str
     completed_quizzes: list
     struggling_topics: list
 
+class TopicStats(BaseModel):
+    topic: str
+    attempts: int
+    correct: int
+    students: int
+    completed: int
+    struggling: int
+    completion_rate: float = Field(..., description="Share of the topic's students who completed it.")
+
+class StrugglingTopic(BaseModel):
+    topic: str
+    struggling: int
+
+class CohortAnalyticsResponse(BaseModel):
+    students: int
+    events: int
+    top_struggling: List[StrugglingTopic]
+    topics: List[TopicStats]
+
+class TimelineBucket(BaseModel):
+    start: int = Field(..., description="Bucket start as a Unix timestamp.")
+    attempts: int
+    correct: int
+
+class CohortTimelineResponse(BaseModel):
+    granularity: str
+    topic: Optional[str] = None
+    buckets: List[TimelineBucket]
+
 class ContentGenerateResponse(BaseModel):
     subject: str
-    content: str
\ No newline at end of file
+    content: Any
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    deduplicated: bool = Field(False, description="True when an identical queued or running job was reused.")
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    type: str
+    status: str = Field(..., description="queued, running, succeeded or failed.")
+    attempts: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
\ No newline at end of file
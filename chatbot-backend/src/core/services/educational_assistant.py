@@ -1,9 +1,12 @@
 from __future__ import annotations
 from enum import Enum
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from pydantic import BaseModel, ValidationError, Field
 import random
 
+from ..tracing import tracer
+from ..tracks import detect_track
+
 
 # ------------------------
 # Lightweight schemas (internal)
@@ -78,22 +81,36 @@ class ContentGenerationError(ServiceError):
 # ------------------------
 class ContentGenerator:
     """
-    Deterministic content generator used by the chatbot.
+    Content generator used by the chatbot: LLM-written when an LLM is configured, otherwise (and
+    as the fallback) extracted from retrieved course material without any API call.
     Keeps return values as Python objects (pydantic models) for ease of conversion.
     """
 
-    def __init__(self, llm=None, retriever=None):
+    def __init__(self, llm=None, retriever=None, answer_template: str | None = None):
         """
-        llm and retriever are optional. If provided, future versions can call the LLM.
-        For now, generator uses simple deterministic templates so it's testable offline.
+        llm and retriever are optional. Without an LLM, items are extracted from what the retriever
+        finds (or built from simple templates without one), so the generator works offline.
+        answer_template ({question}, {content}) frames an answer prompt when retrieved context is given.
         """
         self.llm = llm
         self.retriever = retriever
+        self.answer_template = answer_template
 
     # Public API
     def generate_flashcards(self, subject: str, n: int = 5, level: str | None = "beginner", notes: str | None = None) -> List[Flashcard]:
+        """With an LLM the cards are written by concurrent shards (see fanout.py); the deterministic cards are the fallback."""
         try:
-            return self._gen_flashcards(subject, n, level, notes)
+            with tracer.span("generate_flashcards", n=n):
+                if self.llm is not None:
+                    from .fanout import llm_flashcards
+
+                    llm = self._llm_for(subject)
+                    try:
+                        produce = lambda count, shard_notes: llm_flashcards(llm, subject, count, level, shard_notes)
+                        return list(self._fan_out(produce, subject, n, notes, lambda card: f"{card.front}\n{card.back}"))
+                    except ContentGenerationError:
+                        pass
+                return self._gen_flashcards(subject, n, level, notes)
         except ValidationError as ve:
             raise ContentGenerationError("Invalid flashcard shape", detail={"errors": ve.errors()}) from ve
         except Exception as e:
@@ -103,45 +120,163 @@ class ContentGenerator:
         """
         `subject_or_request` can be either a subject string or a user request string.
         Keep it flexible so older calls like content_generator.generate_quiz(request_string) still work.
+        With an LLM the questions come from stream_quiz(); the deterministic quiz is the fallback.
         """
         try:
-            # For now, derive a short topic name from the input
-            topic = subject_or_request.split("about")[-1].strip() if "about" in subject_or_request else subject_or_request.strip()
-            return self._gen_quiz(topic or "General", n, level, notes)
+            topic = self._quiz_topic(subject_or_request)
+            with tracer.span("generate_quiz", n=n):
+                if self.llm is None:
+                    return self._gen_quiz(topic, n, level, notes)
+                questions = list(self.stream_quiz(topic, n, level, notes))
+                return Quiz(title=f"{topic} Quiz", topic=topic, level=level, questions=questions)
         except ValidationError as ve:
             raise ContentGenerationError("Invalid quiz shape", detail={"errors": ve.errors()}) from ve
         except Exception as e:
             raise ContentGenerationError("Quiz generation failed", detail={"reason": str(e)}) from e
 
+    def stream_quiz(self, subject_or_request: str, n: int = 5, level: str | None = "beginner",
+                    notes: str | None = None) -> Iterator[QuizQuestion]:
+        """
+        Yields validated questions one by one, each as soon as the LLM has completed it. Large
+        quizzes are split into concurrent shards and yielded shard by shard (see fanout.py). Without
+        an LLM, or when it produced no valid question, the deterministic quiz is yielded instead.
+        """
+        topic = self._quiz_topic(subject_or_request)
+        if self.llm is not None:
+            from .fanout import SHARD_SIZE
+            from .quiz_stream import stream_quiz_questions
+
+            llm = self._llm_for(subject_or_request)
+            try:
+                if n > SHARD_SIZE:
+                    produce = lambda count, shard_notes: stream_quiz_questions(llm, topic, count, level, shard_notes)
+                    yield from self._fan_out(produce, topic, n, notes, lambda question: question.question)
+                else:
+                    yield from stream_quiz_questions(llm, topic, n, level, notes)
+                return
+            except ContentGenerationError:
+                pass
+        yield from self._gen_quiz(topic, n, level, notes).questions
+
+    def _llm_for(self, request: str):
+        """The LLM bound to the track of the user's request (local adapters are chosen by track)."""
+        return self.llm.with_track(detect_track(request)) if hasattr(self.llm, "with_track") else self.llm
+
+    def _fan_out(self, produce, topic: str, n: int, notes: str | None, text_of) -> Iterator:
+        """fanout.fan_out() with each shard given its own share of the chunks retrieved for `topic`."""
+        from .fanout import CHUNKS_PER_SHARD, fan_out, shard_notes, shard_sizes
+
+        shards = len(shard_sizes(n))
+        documents = []
+        if self.retriever is not None:
+            try:
+                documents = self.retriever.documents(topic, k=shards * CHUNKS_PER_SHARD)
+            except Exception:
+                documents = []
+        return fan_out(produce, n, shard_notes(documents, shards, notes), text_of,
+                       embeddings=getattr(self.retriever, "embeddings", None))
+
+    @staticmethod
+    def _quiz_topic(subject_or_request: str) -> str:
+        # For now, derive a short topic name from the input
+        topic = subject_or_request.split("about")[-1].strip() if "about" in subject_or_request else subject_or_request.strip()
+        return topic or "General"
+
     def generate_practice(self, subject: str, n: int = 5, level: str | None = "beginner", notes: str | None = None) -> List[PracticeQuestion]:
         try:
-            return self._gen_practice(subject, n, level, notes)
+            with tracer.span("generate_practice", n=n):
+                return self._gen_practice(subject, n, level, notes)
         except ValidationError as ve:
             raise ContentGenerationError("Invalid practice-question shape", detail={"errors": ve.errors()}) from ve
         except Exception as e:
             raise ContentGenerationError("Practice question generation failed", detail={"reason": str(e)}) from e
 
-    def answer_generator(self, request_text: str) -> str:
+    def answer_generator(self, request_text: str, context: str | None = None) -> str:
         """
         Short text answer generator. If an LLM is available, this should call it.
         For now: deterministic fallback that echoes and offers an example.
         """
-        if self.llm is not None:
-            # Placeholder: future LLM call e.g., self.llm.generate(...)
-            try:
-                # If your LLM client has a sync method, call it here; otherwise adapt as needed.
-                return self.llm.generate(request_text)
-            except Exception:
-                # Fall through to simple answer below
-                pass
+        return self.answer_batch([request_text], [context])[0]
+
+    def answer_batch(self, requests: List[str], contexts: List[str | None] | None = None) -> List[str]:
+        """Answers several requests with one batched LLM call (the provider's `batch`)."""
+        prompts = self._answer_prompts(requests, contexts)
+        if self.llm is None:
+            return [self._fallback_answer(r) for r in requests]
+        try:
+            with tracer.span("llm.generate", prompts=len(prompts), prompt_chars=sum(map(len, prompts))):
+                if hasattr(self.llm, "generate_many"):
+                    results = self.llm.generate_many(prompts, return_exceptions=True,
+                                                     tracks=[detect_track(r) for r in requests])
+                else:
+                    results = self.llm.batch(prompts, return_exceptions=True)
+        except Exception:
+            results = [None] * len(prompts)
+        return self._answers(requests, results)
 
+    async def aanswer_batch(self, requests: List[str], contexts: List[str | None] | None = None) -> List[str]:
+        """answer_batch() through the provider's `abatch`, without blocking the event loop."""
+        prompts = self._answer_prompts(requests, contexts)
+        if self.llm is None:
+            return [self._fallback_answer(r) for r in requests]
+        try:
+            with tracer.span("llm.generate", prompts=len(prompts), prompt_chars=sum(map(len, prompts))):
+                if hasattr(self.llm, "agenerate_many"):
+                    results = await self.llm.agenerate_many(prompts, return_exceptions=True,
+                                                            tracks=[detect_track(r) for r in requests])
+                else:
+                    results = await self.llm.abatch(prompts, return_exceptions=True)
+        except Exception:
+            results = [None] * len(prompts)
+        return self._answers(requests, results)
+
+    def _answer_prompts(self, requests: List[str], contexts: List[str | None] | None) -> List[str]:
+        contexts = contexts or [None] * len(requests)
+        return [
+            self.answer_template.format(question=request, content=context)
+            if context and self.answer_template else request
+            for request, context in zip(requests, contexts)
+        ]
+
+    def _answers(self, requests: List[str], results: List) -> List[str]:
+        # Failed items fall back one by one; chat models return messages, plain LLMs strings.
+        answers = []
+        for request, result in zip(requests, results):
+            if result is None or isinstance(result, Exception):
+                answers.append(self._fallback_answer(request))
+            else:
+                answers.append(getattr(result, "content", result))
+        return answers
+
+    @staticmethod
+    def _fallback_answer(request_text: str) -> str:
         # Deterministic fallback
         return f"Short explanation for: '{request_text}'.\nExample: This is a concise example describing {request_text}."
 
     # ------------------------
     # Internal deterministic helpers
     # ------------------------
+    # Without an LLM, items are extracted from the chunks retrieved for the topic (see extractive.py);
+    # the placeholder items below are only used when there is no retriever or nothing to extract.
+    def _extractive(self, topic: str, n: int, level: str | None):
+        if self.retriever is None:
+            return None
+        from .extractive import ExtractiveGenerator
+
+        try:
+            documents = self.retriever.documents(topic, k=min(50, max(8, n)))
+        except Exception:
+            return None
+        if not documents:
+            return None
+        # Seeded per request: equal requests get equal items, and no global RNG state is touched.
+        return ExtractiveGenerator([doc.page_content for doc in documents], seed=f"{topic}|{n}|{level}")
+
     def _gen_flashcards(self, topic: str, n: int, level: str | None, notes: str | None) -> List[Flashcard]:
+        extractive = self._extractive(topic, n, level)
+        cards = extractive.flashcards(n, topic, level) if extractive is not None else []
+        if cards:
+            return cards
         suffix = f" ({level})" if level else ""
         cards: List[Flashcard] = []
         for i in range(1, max(1, n) + 1):
@@ -151,11 +286,14 @@ class ContentGenerator:
         return cards
 
     def _gen_quiz(self, topic: str, n: int, level: str | None, notes: str | None) -> Quiz:
-        random.seed(42)
-        questions = []
+        extractive = self._extractive(topic, n, level)
+        questions = extractive.quiz_questions(n) if extractive is not None else []
+        if questions:
+            return Quiz(title=f"{topic} Quiz", topic=topic, level=level, questions=questions)
+        rng = random.Random(f"{topic}|{n}|{level}")
         for i in range(1, max(1, n) + 1):
             q_text = f"[{topic}] Question #{i}" + (f" ({level})" if level else "")
-            correct_idx = random.randint(0, 3)
+            correct_idx = rng.randint(0, 3)
             opts = []
             for idx, label in enumerate(["A", "B", "C", "D"]):
                 text = f"Option {label} about {topic}"
@@ -171,7 +309,10 @@ class ContentGenerator:
         return Quiz(title=f"{topic} Quiz", topic=topic, level=level, questions=questions)
 
     def _gen_practice(self, topic: str, n: int, level: str | None, notes: str | None) -> List[PracticeQuestion]:
-        qs = []
+        extractive = self._extractive(topic, n, level)
+        qs = extractive.practice(n, topic, level) if extractive is not None else []
+        if qs:
+            return qs
         for i in range(1, max(1, n) + 1):
             prompt = f"Practice: Explain '{topic}' concept #{i}" + (f" ({level})" if level else "")
             answer = f"Sample answer emphasizing {topic} key idea #{i}."
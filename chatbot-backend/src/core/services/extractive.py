@@ -0,0 +1,334 @@
+"""
+Extractive flashcards, cloze deletions and definition MCQs built from retrieved chunks.
+
+No LLM is involved: the chunks are split into sentences, key terms are weighted by how often
+they recur across the chunks, and sentences are scored by the weight of the terms they contain.
+Definition sentences ("A persona is a ...") become "What is ...?" flashcards and definition MCQs
+whose distractors are definitions (or key terms) from the other chunks; the best remaining
+sentences become cloze deletions of their key term. All randomness comes from the generator's
+own random.Random, so equal requests give equal content and concurrent requests do not share
+state.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .educational_assistant import Flashcard, MCQOption, PracticeQuestion, QuizQuestion
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either even every few for
+from further had has have having he her here hers him his how however i if in into is it its itself
+just least less like made make many may me might more most much must my no nor not now of off often
+on once one only or other our ours out over own per rather same she should since so some such than
+that the their theirs them then there these they this those through thus to too under until up upon
+us use used uses using very was we well were what when where whether which while who whom whose why
+will with within without would yet you your yours
+able across actually already always another around away back based best better big called come
+comes different done easy example first get gets give given go going good great help important
+keep know last let lot need needs new next part people really right say see seen something
+take thing things think want wants way ways work works year years
+""".split())
+# Subjects that make "X is a ..." a statement about something else, not a definition.
+_NOT_TERMS = frozenset("it this that these those they there he she we you which what who here one each".split())
+# Words that open a clause, not a noun phrase: "Whether you are a manager or ..." defines nothing.
+_SUBORDINATORS = frozenset("whether if when because although though since unless while whereas once until".split())
+# Stopwords allowed inside a defined term, as in "quality of life" or "research and development".
+_CONNECTORS = frozenset("of and for".split())
+# Evidence of a finite verb, so that titles, bylines and captions are not taken for sentences:
+# auxiliaries and modals (also the stems of contractions such as "don't"), common irregular pasts,
+# a subject pronoun, an -ed or -s form, or a word followed by a determiner ("provide a", "use your").
+_FINITE_VERBS = frozenset("""
+is are was were am be has have had do does did can could will would shall should may might must
+don doesn didn isn aren wasn weren won couldn shouldn wouldn hasn haven hadn re ve ll
+got made took gave went came said told knew thought felt found saw became began kept left led put set let
+""".split())
+_SUBJECTS = frozenset("i you we they he she it these those who".split())
+_DETERMINERS = frozenset("a an the your our their my his her its this that these those it them yourself".split())
+_LINKS = frozenset("""
+of in on at by for with from to as between into about such than and or but up out over under through via like
+""".split())
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9'+#-]*")
+_DOMAIN = re.compile(r"\b[\w-]+\.(?:org|com|net|io|edu)\b", re.IGNORECASE)
+_DEFINITION = re.compile(
+    r"^(?:(?:a|an|the)\s+)?(?P<term>[A-Za-z][\w'()/+#-]*(?:\s+[\w'()/+#-]+){0,4}?)\s*"
+    r"(?:,[^,]{1,60},\s*)?"
+    r"\b(?:is|are|refers to|means|is defined as|is known as|describes)\s+"
+    r"(?P<definition>(?:a|an|the|any|one|when|how|what|used|made|process|set|way)\b.{12,})$",
+    re.IGNORECASE,
+)
+MIN_WORDS, MAX_WORDS = 7, 45
+BLANK = "_____"
+
+
+@dataclass
+class Sentence:
+    text: str
+    chunk: int
+    position: int
+    words: List[str] = field(default_factory=list)
+    score: float = 0.0
+
+
+@dataclass
+class Definition:
+    term: str
+    definition: str
+    sentence: Sentence
+
+
+def split_sentences(text: str) -> List[str]:
+    text = re.sub(r"\s+", " ", text).strip()
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _clean(sentence: str) -> Optional[str]:
+    """A sentence usable as study material, or None (fragments, headers, links, notices, tables)."""
+    words = sentence.split()
+    if not MIN_WORDS <= len(words) <= MAX_WORDS or sentence[-1] not in ".!?":
+        return None
+    if not (sentence[0].isupper() or sentence[0].isdigit() or sentence[0] in "\"'("):
+        return None  # starts mid-sentence, where the chunk was cut
+    if sum(any(c.isdigit() for c in word) for word in words) > 0.15 * len(words):
+        return None  # tables and figures flattened into text
+    lowered = sentence.lower()
+    if "http" in lowered or "www." in lowered or "copyright" in lowered or sentence.count("|") > 1:
+        return None
+    if _DOMAIN.search(sentence):
+        return None  # page footers such as "INTERACTION-DESIGN.ORG 14 The Basics of ..." run into the text
+    letters = [c for c in sentence if c.isalpha()]
+    if not letters or sum(c.isupper() for c in letters) > 0.3 * len(letters):
+        return None  # running headers in capitals
+    tokens = _WORD.findall(sentence)
+    if sum(token[0].isupper() for token in tokens) > 0.5 * len(tokens):
+        return None  # titles, contents entries and bylines: "What is Design Thinking and Why Is It So Popular?"
+    if not _has_finite_verb(tokens):
+        return None  # captions and fragments: "17 The age of user experience design Blackberry Playbook."
+    return sentence
+
+
+def _has_finite_verb(tokens: Sequence[str]) -> bool:
+    """A cheap, generous test: only sentences without any sign of a finite verb fail it."""
+    lowered = [token.lower().split("'")[0] for token in tokens]
+    for word in lowered:
+        if word in _FINITE_VERBS or word in _SUBJECTS or word.endswith("ed"):
+            return True
+        if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            return True
+    # Imperatives: "Maintain eye contact, keep a conversation flowing, and record the interview."
+    return any(following in _DETERMINERS and word.isalpha() and word not in _LINKS
+               for word, following in zip(lowered, lowered[1:]))
+
+
+def _noun_phrase(term: str) -> Optional[str]:
+    """`term` if it reads as a noun phrase ("user personas", "design thinking"), else None."""
+    words = term.split()
+    # A heading run into the sentence repeats the term: "User Personas User personas are ...".
+    repeats = [i for i in range(1, len(words)) if words[i].lower() == words[0].lower()]
+    if repeats:
+        words = words[repeats[-1]:]
+    lowered = [word.lower().split("'")[0] for word in words]
+    if lowered[0] in _SUBORDINATORS or lowered[0] in _NOT_TERMS:
+        return None
+    if lowered[0] in STOPWORDS or lowered[-1] in STOPWORDS:
+        return None
+    if any(word in STOPWORDS and word not in _CONNECTORS for word in lowered[1:-1]):
+        return None
+    if any(word in _FINITE_VERBS or len(word) < 2 for word in lowered):
+        return None  # a clause such as "Don t forget that scripts"
+    return " ".join(words)
+
+
+def _terms(words: Sequence[str], max_len: int = 3) -> Iterable[Tuple[int, str]]:
+    """Candidate key terms with their start: 1-3 word spans that neither start nor end with a stopword."""
+    lowered = [w.lower() for w in words]
+    for size in range(1, max_len + 1):
+        for start in range(len(words) - size + 1):
+            span = lowered[start:start + size]
+            if span[0] in STOPWORDS or span[-1] in STOPWORDS or any(len(w) < 3 and not w.isupper() for w in span):
+                continue
+            yield start, " ".join(words[start:start + size])
+
+
+class ExtractiveGenerator:
+    """Study items from the text of retrieved chunks (the closest chunks first)."""
+
+    def __init__(self, chunks: Sequence[str], seed: object = None):
+        self.rng = random.Random(seed)
+        self.sentences: List[Sentence] = []
+        for index, chunk in enumerate(chunks):
+            for position, raw in enumerate(split_sentences(chunk)):
+                text = _clean(raw)
+                if text is not None:
+                    self.sentences.append(Sentence(text, index, position, _WORD.findall(text)))
+        self.weights = self._term_weights()
+        self.definitions = self._definitions()
+        defined = {id(d.sentence) for d in self.definitions}
+        for sentence in self.sentences:
+            sentence.score = self._score(sentence) + (1.0 if id(sentence) in defined else 0.0)
+
+    # ------------------------
+    # Analysis
+    # ------------------------
+    def _term_weights(self) -> Dict[str, float]:
+        counts: Counter = Counter()
+        display: Dict[str, Counter] = {}
+        for sentence in self.sentences:
+            for key, forms in self._sentence_terms(sentence).items():
+                counts[key] += 1
+                display.setdefault(key, Counter()).update(forms)
+        # Recurring terms are key terms; longer ones are more specific, capitalised ones are names.
+        weights = {}
+        for key, count in counts.items():
+            if count < 2:
+                continue
+            form = display[key].most_common(1)[0][0]
+            weight = count * (1 + 0.6 * (form.count(" "))) * (1.3 if form[0].isupper() else 1.0)
+            weights[key] = weight
+        self._display = {key: display[key].most_common(1)[0][0] for key in weights}
+        return weights
+
+    @staticmethod
+    def _sentence_terms(sentence: Sentence) -> Dict[str, List[str]]:
+        # A capital at the start of a sentence says nothing about the term, so it is lowered there.
+        forms: Dict[str, List[str]] = {}
+        for start, term in _terms(sentence.words):
+            form = term[0].lower() + term[1:] if start == 0 and not term.split()[0].isupper() else term
+            forms.setdefault(term.lower(), []).append(form)
+        return forms
+
+    def _definitions(self) -> List[Definition]:
+        found, seen = [], set()
+        for sentence in self.sentences:
+            match = _DEFINITION.match(sentence.text)
+            if not match:
+                continue
+            term = _noun_phrase(match.group("term").strip(" ,"))
+            if term is None or term.lower() in seen:
+                continue
+            seen.add(term.lower())
+            definition = match.group("definition").rstrip(".!?")
+            found.append(Definition(term, definition[0].upper() + definition[1:], sentence))
+        return found
+
+    def _score(self, sentence: Sentence) -> float:
+        weight = sum(self.weights.get(w.lower(), 0.0) for w in sentence.words if w.lower() not in STOPWORDS)
+        # Denser sentences first; earlier chunks and the start of a chunk are closer to the query.
+        return weight / len(sentence.words) / (1 + 0.1 * sentence.chunk) / (1 + 0.05 * sentence.position)
+
+    def key_term(self, sentence: Sentence) -> Optional[str]:
+        """The highest-weighted key term of `sentence`, as it is written there."""
+        best: Tuple[float, Optional[str]] = (0.0, None)
+        for _, term in _terms(sentence.words):
+            weight = self.weights.get(term.lower(), 0.0)
+            if weight > best[0]:
+                best = (weight, term)
+        return best[1]
+
+    def ranked(self) -> List[Sentence]:
+        return sorted(self.sentences, key=lambda s: -s.score)
+
+    @staticmethod
+    def cloze(sentence: Sentence, term: str) -> str:
+        return re.sub(rf"\b{re.escape(term)}\b", BLANK, sentence.text, count=1)
+
+    def _clozes(self) -> Iterable[Tuple[Sentence, str]]:
+        used = set()
+        for sentence in self.ranked():
+            term = self.key_term(sentence)
+            if term is None or term.lower() in used:
+                continue
+            used.add(term.lower())
+            yield sentence, term
+
+    # ------------------------
+    # Items
+    # ------------------------
+    def flashcards(self, n: int, topic: Optional[str] = None, level: Optional[str] = None) -> List[Flashcard]:
+        cards = [Flashcard(front=f"What is {d.term}?", back=d.definition + ".", topic=topic, level=level)
+                 for d in self.definitions[:n]]
+        covered = {d.term.lower() for d in self.definitions[:n]}
+        for sentence, term in self._clozes():
+            if len(cards) >= n:
+                break
+            if term.lower() in covered:
+                continue
+            cards.append(Flashcard(front=self.cloze(sentence, term), back=f"{term}: {sentence.text}",
+                                   topic=topic, level=level))
+        return cards
+
+    def practice(self, n: int, topic: Optional[str] = None, level: Optional[str] = None) -> List[PracticeQuestion]:
+        questions = []
+        for sentence, term in self._clozes():
+            if len(questions) >= n:
+                break
+            words = len(term.split())
+            hint = f"{words} words, starting with \"{term[0]}\"." if words > 1 else f"One word, starting with \"{term[0]}\"."
+            questions.append(PracticeQuestion(prompt=f"Fill in the blank: {self.cloze(sentence, term)}", answer=term,
+                                              hint=hint, topic=topic, level=level))
+        return questions
+
+    def quiz_questions(self, n: int) -> List[QuizQuestion]:
+        questions = [q for q in (self._definition_mcq(d) for d in self.definitions) if q is not None][:n]
+        asked = {q.explanation for q in questions}
+        for sentence, term in self._clozes():
+            if len(questions) >= n:
+                break
+            if sentence.text in asked:
+                continue
+            question = self._term_mcq(sentence, term)
+            if question is not None:
+                questions.append(question)
+        return questions
+
+    def _definition_mcq(self, definition: Definition) -> Optional[QuizQuestion]:
+        # Distractors: definitions of other terms, preferably from other chunks.
+        others = [d for d in self.definitions if d.term.lower() != definition.term.lower()]
+        others.sort(key=lambda d: d.sentence.chunk == definition.sentence.chunk)
+        distractors = [_shorten(d.definition) for d in others[:3]]
+        if len(distractors) < 3:
+            return None
+        return self._mcq(f"Which of these best describes {definition.term}?", _shorten(definition.definition),
+                         distractors, definition.sentence.text)
+
+    def _term_mcq(self, sentence: Sentence, term: str) -> Optional[QuizQuestion]:
+        # Distractors: key terms of the same length from sibling chunks, the most important first.
+        words, lowered = len(term.split()), term.lower()
+        pool = sorted(((w, self._display[t]) for t, w in self.weights.items()
+                       if t != lowered and t not in lowered and lowered not in t and t.count(" ") + 1 == words),
+                      key=lambda pair: -pair[0])
+        sibling = {t.lower() for s in self.sentences if s.chunk != sentence.chunk for _, t in _terms(s.words)}
+        pool = [form for _, form in pool if form.lower() in sibling] + [form for _, form in pool]
+        # One form per stem ("user" and "users"), none sharing the answer's stem.
+        stems, distractors = {_stem(term)}, []
+        for form in pool:
+            if _stem(form) not in stems and len(distractors) < 3:
+                stems.add(_stem(form))
+                distractors.append(form)
+        if len(distractors) < 3:
+            return None
+        return self._mcq(f"Which term completes the sentence? {self.cloze(sentence, term)}", term, distractors,
+                         sentence.text)
+
+    def _mcq(self, question: str, correct: str, distractors: List[str], explanation: str) -> QuizQuestion:
+        texts = [correct] + distractors
+        self.rng.shuffle(texts)
+        options = [MCQOption(label=label, text=text) for label, text in zip("ABCD", texts)]
+        return QuizQuestion(question=question, options=options, correct_label="ABCD"[texts.index(correct)],
+                            explanation=explanation)
+
+
+def _stem(term: str) -> str:
+    return " ".join(word[:-1] if word.endswith("s") and len(word) > 3 else word for word in term.lower().split())
+
+
+def _shorten(text: str, words: int = 25) -> str:
+    parts = text.split()
+    return text if len(parts) <= words else " ".join(parts[:words]) + " ..."
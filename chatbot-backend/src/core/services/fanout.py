@@ -0,0 +1,223 @@
+"""
+Fan-out generation for large quizzes and flashcard sets.
+
+A request for more than DIRECTED_FANOUT_SHARD_SIZE items (default 5) is split into shards of
+about that size that run concurrently (at most DIRECTED_FANOUT_WORKERS at a time, default 4).
+Each shard is prompted with its own share of the retrieved chunks, so the shards cover different
+material. Shard results are merged as they finish, and an item whose embedding is at least
+DIRECTED_FANOUT_SIMILARITY (default 0.9) cosine-similar to one already kept is dropped. Shards
+still running after DIRECTED_FANOUT_TIMEOUT_S seconds (default 45) are abandoned and the items
+gathered so far are returned; a failed shard only loses its own items, and a set left short
+by duplicates or failures gets one more round for the missing items.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from ..tracing import tracer
+from .educational_assistant import ContentGenerationError, Flashcard
+
+logger = logging.getLogger("DirectEd")
+
+SHARD_SIZE = max(1, int(os.getenv("DIRECTED_FANOUT_SHARD_SIZE", "5")))
+WORKERS = max(1, int(os.getenv("DIRECTED_FANOUT_WORKERS", "4")))
+TIMEOUT_S = float(os.getenv("DIRECTED_FANOUT_TIMEOUT_S", "45"))
+SIMILARITY = float(os.getenv("DIRECTED_FANOUT_SIMILARITY", "0.9"))
+# Retrieved chunks per shard; the closest chunks are dealt out first.
+CHUNKS_PER_SHARD = 2
+
+
+# ------------------------
+# Sharding
+# ------------------------
+def shard_sizes(n: int, size: int = SHARD_SIZE) -> List[int]:
+    """n split into the fewest shards of at most `size` items, as even as possible."""
+    count = max(1, math.ceil(n / size))
+    base, extra = divmod(n, count)
+    return [base + (1 if i < extra else 0) for i in range(count)]
+
+
+def shard_notes(documents: Sequence[Any], shards: int, notes: Optional[str] = None) -> List[str]:
+    """
+    Prompt notes per shard: the retrieved chunks dealt out round-robin, so the closest chunks are
+    spread over all shards. Without chunks each shard is only told which part it writes.
+    """
+    groups: List[List[str]] = [[] for _ in range(shards)]
+    for index, doc in enumerate(documents):
+        groups[index % shards].append(getattr(doc, "page_content", str(doc)))
+    result = []
+    for index, group in enumerate(groups):
+        lines = [notes] if notes else []
+        if shards > 1:
+            lines.append(f"This is part {index + 1} of {shards} of a larger set; the other parts cover other material.")
+        if group:
+            lines.append("Base every item on this material only:\n" + "\n\n".join(group))
+        result.append("\n".join(lines))
+    return result
+
+
+# ------------------------
+# Semantic deduplication
+# ------------------------
+def _lexical_vectors(texts: Sequence[str], dim: int = 1024) -> np.ndarray:
+    """Hashed word and word-pair counts, used when no embedding model is available."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = re.findall(r"\w+", text.lower())
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            vectors[row, int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "little") % dim] += 1
+    return vectors
+
+
+class Deduplicator:
+    """Keeps items whose text is less than `threshold` cosine-similar to every item kept before."""
+
+    def __init__(self, embeddings: Any = None, threshold: float = SIMILARITY):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.texts: List[str] = []
+        self._kept = np.zeros((0, 0), dtype=np.float32)
+        self.dropped = 0
+
+    def _vectors(self, texts: Sequence[str]) -> np.ndarray:
+        if self.embeddings is not None:
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents(list(texts)), dtype=np.float32)
+            except Exception as exc:
+                # Switch to lexical vectors for good; the kept ones are recomputed to match.
+                logger.warning("Embedding for deduplication failed, using lexical similarity: %s", exc)
+                self.embeddings = None
+                self._kept = self._normalise(_lexical_vectors(self.texts)) if self.texts else self._kept
+                vectors = _lexical_vectors(texts)
+        else:
+            vectors = _lexical_vectors(texts)
+        return self._normalise(vectors)
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def filter(self, items: Sequence[Any], texts: Sequence[str]) -> List[Any]:
+        if not items:
+            return []
+        vectors = self._vectors(texts)
+        kept = []
+        for item, text, vector in zip(items, texts, vectors):
+            if len(self.texts) and float(np.max(self._kept @ vector)) >= self.threshold:
+                self.dropped += 1
+                continue
+            self._kept = vector[None, :] if not len(self.texts) else np.vstack([self._kept, vector])
+            self.texts.append(text)
+            kept.append(item)
+        return kept
+
+
+# ------------------------
+# Fan-out
+# ------------------------
+def fan_out(produce: Callable[[int, str], Iterable[Any]], n: int, notes: Sequence[str],
+            text_of: Callable[[Any], str], embeddings: Any = None, timeout: float = TIMEOUT_S,
+            workers: int = WORKERS, size: int = SHARD_SIZE) -> Iterator[Any]:
+    """
+    Runs produce(count, notes) for each shard of shard_sizes(n) concurrently and yields up to n
+    deduplicated items, shard by shard as they finish. `notes` has one entry per shard. When
+    duplicates or failed shards leave the set short, one more round asks for the missing items
+    before the deadline. Raises ContentGenerationError when no shard produced anything.
+    """
+    sizes = shard_sizes(n, size)
+    dedup = Deduplicator(embeddings)
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(sizes)), thread_name_prefix="fanout")
+
+    def submit(counts: Sequence[int], shard_notes: Sequence[str]) -> set:
+        # Each shard runs in a copy of the caller's context so its spans join the request trace.
+        return {executor.submit(contextvars.copy_context().run, lambda c=count, s=note: list(produce(c, s)))
+                for count, note in zip(counts, shard_notes)}
+
+    pending = submit(sizes, notes)
+    deadline = time.monotonic() + timeout
+    delivered = failed = 0
+    topped_up = False
+    with tracer.span("fanout", items=n, shards=len(sizes)) as span:
+        try:
+            while delivered < n:
+                if not pending:
+                    if topped_up:
+                        break
+                    topped_up = True
+                    missing = shard_sizes(n - delivered, size)
+                    covered = "Already covered, do not repeat: " + " | ".join(dedup.texts)
+                    pending = submit(missing, [f"{notes[i % len(notes)]}\n{covered}" for i in range(len(missing))])
+                    span.set_attribute("topped_up", n - delivered)
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    logger.warning("Fan-out: %d shards still running after %.0fs, returning %d of %d items",
+                                   len(pending), timeout, delivered, n)
+                    break
+                for future in done:
+                    try:
+                        items = future.result()
+                    except Exception as exc:
+                        failed += 1
+                        logger.warning("Fan-out shard failed: %s", exc)
+                        continue
+                    for item in dedup.filter(items, [text_of(item) for item in items])[: n - delivered]:
+                        delivered += 1
+                        yield item
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            span.set_attribute("delivered", delivered)
+            span.set_attribute("failed", failed)
+            span.set_attribute("timed_out", len(pending))
+            span.set_attribute("duplicates", dedup.dropped)
+    if not delivered:
+        raise ContentGenerationError("Fan-out generation produced no items",
+                                     detail={"shards": len(sizes), "failed": failed, "timed_out": len(pending)})
+
+
+# ------------------------
+# Flashcards from the LLM
+# ------------------------
+FLASHCARD_JSON_TEMPLATE = (
+    "You are an AI tutor writing study flashcards.\n"
+    'Reply with a JSON array and nothing else. Each element is {{"front": "...", "back": "..."}}: '
+    "the front asks about one concept, the back answers it in one or two sentences.\n"
+    "\n"
+    "Topic: {topic}\n"
+    "Level: {level}\n"
+    "Number of flashcards: {num_items}\n"
+    "{notes}"
+)
+
+
+def llm_flashcards(llm: Any, topic: str, n: int, level: Optional[str] = "beginner",
+                   notes: Optional[str] = None) -> List[Flashcard]:
+    """Up to `n` flashcards from one LLM call; elements that do not validate are skipped."""
+    prompt = FLASHCARD_JSON_TEMPLATE.format(topic=topic, level=level or "any", num_items=n,
+                                            notes=f"{notes}\n" if notes else "")
+    with tracer.span("llm.flashcards", items=n):
+        result = llm.generate(prompt) if hasattr(llm, "generate_many") else llm.invoke(prompt)
+    text = getattr(result, "content", result)
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        raise ContentGenerationError("The model returned no flashcard list")
+    cards = []
+    for raw in json.loads(text[start:end + 1]):
+        try:
+            cards.append(Flashcard(front=raw["front"], back=raw["back"], topic=topic, level=level))
+        except Exception:
+            continue
+    return cards[:n]
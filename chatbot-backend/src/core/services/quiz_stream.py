@@ -0,0 +1,223 @@
+"""
+Schema-constrained quiz generation with incremental parsing.
+
+The model is asked for JSON matching the Quiz model; chat models also get the schema as a
+decoding constraint (response_format). While the answer streams, IncrementalQuizParser
+returns each question as soon as it is complete and valid, so callers can forward it at
+once. A malformed question is dropped and counted; a retry only asks for the questions still
+missing. Counters are kept in quiz_stats.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from ..tracing import tracer
+from .educational_assistant import ContentGenerationError, Quiz, QuizQuestion
+
+logger = logging.getLogger("DirectEd")
+
+
+# ------------------------
+# Schema-constrained prompt
+# ------------------------
+def quiz_json_schema() -> Dict[str, Any]:
+    # pydantic v2 name first, v1 fallback
+    schema_fn = getattr(Quiz, "model_json_schema", None) or Quiz.schema
+    return schema_fn()
+
+
+def quiz_response_format() -> Dict[str, Any]:
+    """OpenAI-style response_format (also accepted by Groq) constraining decoding to the Quiz schema."""
+    return {"type": "json_schema", "json_schema": {"name": "quiz", "schema": quiz_json_schema()}}
+
+
+def _escaped(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+# The schema is part of the fixed instructions, before any variable, so a local backend can
+# reuse its encoded prefix across requests (see prefix_cache.py).
+QUIZ_JSON_TEMPLATE = (
+    "You are an AI tutor writing multiple-choice quizzes.\n"
+    "Reply with a single JSON object and nothing else. It must match this JSON schema:\n"
+    + _escaped(json.dumps(quiz_json_schema(), separators=(",", ":")))
+    + "\n"
+    "Every question has four options labelled A, B, C and D, exactly one correct_label among them, "
+    "and a one-sentence explanation. Write the questions in order, each complete before the next.\n"
+    "\n"
+    "Topic: {topic}\n"
+    "Level: {level}\n"
+    "Number of questions: {num_questions}\n"
+    "{notes}"
+)
+
+
+def constrained(llm: Any) -> Any:
+    """Chat models get the schema as a decoding constraint; other backends only see it in the prompt."""
+    if hasattr(llm, "bind_tools") and hasattr(llm, "bind"):
+        return llm.bind(response_format=quiz_response_format())
+    return llm
+
+
+# ------------------------
+# Incremental parsing
+# ------------------------
+class IncrementalQuizParser:
+    """
+    Consumes the JSON text of a quiz as it streams in and returns each element of its
+    "questions" array as soon as the element's closing brace arrives and it validates.
+    Text around the JSON object (code fences, a preamble) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.questions: List[QuizQuestion] = []
+        self.malformed = 0
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._in_questions = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[QuizQuestion]:
+        self.text += chunk
+        completed = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        # Keys (and string values) of the top-level object.
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+            if not self._stack and char != "{":
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                if char == "[" and len(self._stack) == 1:
+                    self._in_questions = self._last_string == "questions"
+                elif char == "{" and self._in_questions and len(self._stack) == 2:
+                    self._item_start = i
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and len(self._stack) == 2 and self._item_start is not None:
+                    question = self._validate(text[self._item_start:i + 1])
+                    self._item_start = None
+                    if question is not None:
+                        self.questions.append(question)
+                        completed.append(question)
+                elif char == "]" and len(self._stack) == 1:
+                    self._in_questions = False
+        self._pos = len(text)
+        return completed
+
+    def _validate(self, raw: str) -> Optional[QuizQuestion]:
+        try:
+            question = QuizQuestion(**json.loads(raw))
+        except Exception:
+            self.malformed += 1
+            return None
+        if question.correct_label not in {option.label for option in question.options} or len(question.options) < 2:
+            self.malformed += 1
+            return None
+        return question
+
+
+def parse_quiz(text: str, topic: str, level: Optional[str] = "beginner") -> Quiz:
+    """Validated quiz from complete model output; malformed questions are dropped."""
+    parser = IncrementalQuizParser()
+    parser.feed(text)
+    if not parser.questions:
+        raise ContentGenerationError("The model returned no valid quiz questions",
+                                     detail={"malformed": parser.malformed})
+    return Quiz(title=f"{topic} Quiz", topic=topic, level=level, questions=parser.questions)
+
+
+# ------------------------
+# Generation with retries
+# ------------------------
+class QuizStreamStats:
+    """Process-wide counters for schema-constrained quiz generation (served by /debug/quiz_stats)."""
+
+    FIELDS = ("requests", "attempts", "retries", "questions", "malformed_questions", "stream_errors", "short")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self._counts[name] += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["retries_per_request"] = round(counts["retries"] / counts["requests"], 4) if counts["requests"] else 0.0
+        return counts
+
+
+quiz_stats = QuizStreamStats()
+
+
+def _stream_text(llm: Any, prompt: str) -> Iterable[str]:
+    if hasattr(llm, "stream"):
+        for chunk in constrained(llm).stream(prompt):
+            yield getattr(chunk, "content", chunk)
+    else:
+        # Backends without streaming (LocalLLM) return the whole text at once.
+        yield llm.generate(prompt)
+
+
+def stream_quiz_questions(llm: Any, topic: str, n: int = 5, level: Optional[str] = "beginner",
+                          notes: Optional[str] = None, max_attempts: int = 3,
+                          stats: QuizStreamStats = quiz_stats) -> Iterator[QuizQuestion]:
+    """
+    Yields up to `n` validated questions as the model streams them. A retry (at most
+    max_attempts - 1) only asks for the questions still missing, so valid ones are never
+    regenerated. Raises ContentGenerationError when no question could be produced.
+    """
+    produced: List[QuizQuestion] = []
+    stats.add(requests=1)
+    for attempt in range(max_attempts):
+        remaining = n - len(produced)
+        extra = f"Notes: {notes}\n" if notes else ""
+        if produced:
+            extra += "Do not repeat these questions: " + " | ".join(q.question for q in produced) + "\n"
+        prompt = QUIZ_JSON_TEMPLATE.format(topic=topic, level=level or "any", num_questions=remaining, notes=extra)
+        parser = IncrementalQuizParser()
+        stats.add(attempts=1, retries=1 if attempt else 0)
+        with tracer.span("quiz_stream.attempt", attempt=attempt, remaining=remaining) as span:
+            try:
+                for chunk in _stream_text(llm, prompt):
+                    for question in parser.feed(chunk):
+                        if len(produced) < n:
+                            produced.append(question)
+                            stats.add(questions=1)
+                            yield question
+            except Exception as exc:
+                stats.add(stream_errors=1)
+                logger.warning("Quiz stream for %r failed on attempt %d: %s", topic, attempt + 1, exc)
+            stats.add(malformed_questions=parser.malformed)
+            span.set_attribute("malformed", parser.malformed)
+        if len(produced) >= n:
+            return
+    stats.add(short=1)
+    if not produced:
+        raise ContentGenerationError("Quiz generation produced no valid questions", detail={"topic": topic})
@@ -0,0 +1,59 @@
+"""
+Support for serving from several forked worker processes (gunicorn with preload_app, see
+gunicorn.conf.py at the project root).
+
+The app is imported once in the master: prompt templates, the curriculum graph, the local
+model's tokenizer and weights are built there and shared copy-on-write by every worker.
+freeze_preloaded() moves those objects out of the garbage collector's reach, so collections
+in the workers do not write to (and thereby copy) the shared pages.
+
+Resources that cannot cross a fork (threads, open SQLite/Chroma connections) register a hook
+with register_after_fork(); after_fork() runs the hooks in each new worker.
+
+    DIRECTED_WORKERS   worker processes (default: one per CPU core)
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import sys
+from typing import Callable, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("DirectEd")
+
+_after_fork_hooks: List[Callable[[], None]] = []
+
+
+def default_workers() -> int:
+    return int(os.getenv("DIRECTED_WORKERS") or 0) or os.cpu_count() or 1
+
+
+def register_after_fork(hook: Callable[[], None]) -> Callable[[], None]:
+    """Runs `hook` in every worker right after it is forked from the preloaded master."""
+    _after_fork_hooks.append(hook)
+    return hook
+
+
+def freeze_preloaded() -> None:
+    """Call in the master once the app is imported, before workers are forked."""
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded %d objects frozen for copy-on-write sharing", gc.get_freeze_count())
+
+
+def after_fork(workers: int) -> None:
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        # Split the cores between workers instead of every worker using all of them.
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, workers)))
+    for hook in _after_fork_hooks:
+        try:
+            hook()
+        except Exception:
+            logger.exception("After-fork hook %s failed", getattr(hook, "__qualname__", hook))
@@ -0,0 +1,175 @@
+"""
+Learner state shared by every server process.
+
+With several workers, an in-process LearningAnalyzer would only see the requests its own
+worker served. SQLiteLearningStore keeps the profiles in one SQLite database instead, and
+appends every logged interaction to an event log. Derived views that live in process memory
+(cohort counters, review schedules) catch up by reading the events they have not applied yet,
+so each worker converges on the same state and rebuilds it after a restart.
+
+    DIRECTED_STATE_DB   SQLite file for shared learner state; unset keeps state in memory
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    performance TEXT NOT NULL,
+    changes TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def empty_profile() -> Dict[str, Any]:
+    return {"completed_quizzes": [], "struggling_topics": []}
+
+
+def profile_changed(changes: Dict[str, Any]) -> bool:
+    """Whether apply_performance altered the profile, i.e. its version (and HTTP ETag) moves on."""
+    return changes["completed"] or changes["struggling"]
+
+
+def apply_performance(profile: Dict[str, Any], topic: str, performance: str) -> Dict[str, Any]:
+    """
+    Updates a profile in place for one interaction and returns what changed:
+    new_student, first_attempt (first event on this topic), completed, struggling, timestamp.
+    """
+    changes = {
+        # Every update adds a topic to one list, so empty lists mean a first interaction.
+        "new_student": not profile["completed_quizzes"] and not profile["struggling_topics"],
+        "first_attempt": topic not in profile["completed_quizzes"] and topic not in profile["struggling_topics"],
+        "completed": False,
+        "struggling": False,
+        "timestamp": time.time(),
+    }
+    if performance == "correct":
+        if topic not in profile["completed_quizzes"]:
+            profile["completed_quizzes"].append(topic)
+            changes["completed"] = True
+    else:
+        if topic not in profile["struggling_topics"]:
+            profile["struggling_topics"].append(topic)
+            changes["struggling"] = True
+    return changes
+
+
+@dataclass
+class LearningEvent:
+    id: int
+    user_id: str
+    topic: str
+    performance: str
+    changes: Dict[str, Any]
+
+
+class SQLiteLearningStore:
+    """Profiles plus an append-only event log in one SQLite database."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(profiles)")}
+            if "version" not in columns:
+                # Databases created before profiles were versioned.
+                conn.execute("ALTER TABLE profiles ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        # One connection per thread and process; a connection must not be used across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        yield conn
+
+    def get_profile(self, user_id: str) -> Dict[str, Any]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT profile FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else empty_profile()
+
+    def profile_version(self, user_id: str) -> int:
+        """Number of updates that changed the profile; 0 for a user without one."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT version FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def log(self, user_id: str, topic: str, performance: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Applies one interaction atomically. Returns (updated profile, changes)."""
+        return self.log_many([(user_id, topic, performance)])[0]
+
+    def log_many(self, entries: List[Tuple[str, str, str]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Applies (user_id, topic, performance) interactions in order, in one transaction.
+        Returns (profile after that interaction, changes) for each entry.
+        """
+        results: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                profiles: Dict[str, Dict[str, Any]] = {}
+                versions: Dict[str, int] = {}
+                events = []
+                for user_id, topic, performance in entries:
+                    if user_id not in profiles:
+                        row = conn.execute("SELECT profile, version FROM profiles WHERE user_id = ?",
+                                           (user_id,)).fetchone()
+                        profiles[user_id] = json.loads(row[0]) if row else empty_profile()
+                        versions[user_id] = row[1] if row else 0
+                    changes = apply_performance(profiles[user_id], topic, performance)
+                    versions[user_id] += profile_changed(changes)
+                    results.append((copy.deepcopy(profiles[user_id]), changes))
+                    events.append((user_id, topic, performance, json.dumps(changes), changes["timestamp"]))
+                conn.executemany("INSERT OR REPLACE INTO profiles (user_id, profile, version) VALUES (?, ?, ?)",
+                                 [(user_id, json.dumps(profile), versions[user_id])
+                                  for user_id, profile in profiles.items()])
+                conn.executemany(
+                    "INSERT INTO events (user_id, topic, performance, changes, created_at) VALUES (?, ?, ?, ?, ?)",
+                    events,
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return results
+
+    def events_since(self, last_id: int, limit: int = 10000) -> List[LearningEvent]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, user_id, topic, performance, changes FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, limit),
+            ).fetchall()
+        return [LearningEvent(row[0], row[1], row[2], row[3], json.loads(row[4])) for row in rows]
+
+
+def learning_store_from_env() -> Optional[SQLiteLearningStore]:
+    path = os.getenv("DIRECTED_STATE_DB")
+    return SQLiteLearningStore(Path(path)) if path else None
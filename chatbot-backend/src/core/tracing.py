@@ -0,0 +1,375 @@
+"""
+Local span tracing for the educational assistant.
+
+- Head sampling decides (once per request) whether child spans are recorded at all.
+  Requests that are sampled out only pay for a context-var lookup per span.
+- Tail sampling keeps every slow or failed trace, and a fraction of the rest.
+- Kept traces go into an in-process ring buffer (served by /debug/traces) and,
+  optionally, into a JSONL file.
+
+Configuration (environment):
+    DIRECTED_TRACE_SAMPLE_RATE   head sampling probability (default 0.1)
+    DIRECTED_TRACE_KEEP_RATE     tail keep probability for fast, successful traces (default 1.0)
+    DIRECTED_TRACE_SLOW_MS       traces at least this slow are always kept (default 2000)
+    DIRECTED_TRACE_BUFFER        ring buffer size (default 200)
+    DIRECTED_TRACE_EXPORT_PATH   JSONL file to append kept traces to (disabled when unset)
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("DirectEd")
+
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """A single timed operation inside a trace."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[int], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class _NoopSpan:
+    """Returned for spans that are not recorded; accepts and drops everything."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans recorded for one request."""
+
+    def __init__(self, name: str, sampled: bool, attributes: Dict[str, Any]):
+        self.trace_id = f"{int(time.time() * 1000):x}-{random.getrandbits(32):08x}"
+        self.started_at = time.time()
+        self.sampled = sampled
+        self.root = Span(name, None, attributes)
+        self.spans: List[Span] = [self.root]
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the trace as a nested span tree."""
+        nodes: Dict[int, Dict[str, Any]] = {}
+        for span in self.spans:
+            nodes[span.span_id] = {
+                "name": span.name,
+                "start_ms": round((span.start - self.root.start) * 1000.0, 3),
+                "duration_ms": round(span.duration_ms, 3),
+                "attributes": span.attributes,
+                "error": span.error,
+                "children": [],
+            }
+        for span in self.spans:
+            if span.parent_id is not None and span.parent_id in nodes:
+                nodes[span.parent_id]["children"].append(nodes[span.span_id])
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "sampled": self.sampled,
+            "root": nodes[self.root.span_id],
+        }
+
+
+class JsonlExporter:
+    """Appends finished traces to a JSONL file, one trace per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace_dict: Dict[str, Any]) -> None:
+        line = json.dumps(trace_dict, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+# (trace, current span) for the active request, if it is being recorded.
+_active: contextvars.ContextVar[Optional[tuple]] = contextvars.ContextVar("directed_active_span", default=None)
+
+
+class Tracer:
+    """
+    Records nested spans for sampled requests and keeps the interesting ones.
+    Use `trace()` around a whole request and `span()` / `traced()` inside it.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.1,
+        keep_rate: float = 1.0,
+        slow_ms: float = 2000.0,
+        buffer_size: int = 200,
+        exporter: Optional[JsonlExporter] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.keep_rate = keep_rate
+        self.slow_ms = slow_ms
+        self.exporter = exporter
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        export_path = os.getenv("DIRECTED_TRACE_EXPORT_PATH")
+        return cls(
+            sample_rate=float(os.getenv("DIRECTED_TRACE_SAMPLE_RATE", "0.1")),
+            keep_rate=float(os.getenv("DIRECTED_TRACE_KEEP_RATE", "1.0")),
+            slow_ms=float(os.getenv("DIRECTED_TRACE_SLOW_MS", "2000")),
+            buffer_size=int(os.getenv("DIRECTED_TRACE_BUFFER", "200")),
+            exporter=JsonlExporter(export_path) if export_path else None,
+        )
+
+    # ------------------------
+    # Recording
+    # ------------------------
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """
+        Start a root span for one request. Nested calls (a request already being traced)
+        behave like `span()` so entrypoints can be composed freely.
+        """
+        if _active.get() is not None:
+            with self.span(name, **attributes) as span:
+                yield span
+            return
+
+        sampled = random.random() < self.sample_rate
+        trace = Trace(name, sampled, attributes)
+        token = _active.set((trace, trace.root)) if sampled else None
+        try:
+            yield trace.root if sampled else NOOP_SPAN
+        except BaseException as exc:
+            trace.root.error = repr(exc)
+            raise
+        finally:
+            trace.root.end = time.perf_counter()
+            if token is not None:
+                _active.reset(token)
+            self._finish(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """Record a child span of the current one; a no-op when the request is not sampled."""
+        active = _active.get()
+        if active is None:
+            yield NOOP_SPAN
+            return
+
+        trace, parent = active
+        span = Span(name, parent.span_id, attributes)
+        trace.spans.append(span)
+        token = _active.set((trace, span))
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = repr(exc)
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _active.reset(token)
+
+    def traced(self, name: Optional[str] = None, root: bool = False) -> Callable:
+        """Decorator form of `span()` (or `trace()` when root=True)."""
+
+        def deco(fn: Callable) -> Callable:
+            span_name = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not root and _active.get() is None:
+                    return fn(*args, **kwargs)
+                ctx = self.trace(span_name) if root else self.span(span_name)
+                with ctx:
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return deco
+
+    def is_recording(self) -> bool:
+        return _active.get() is not None
+
+    # ------------------------
+    # Tail sampling / storage
+    # ------------------------
+    def _finish(self, trace: Trace) -> None:
+        duration = trace.duration_ms
+        failed = trace.root.error is not None
+        slow = duration >= self.slow_ms
+        if trace.sampled:
+            keep = slow or failed or random.random() < self.keep_rate
+        else:
+            # Unsampled requests only carry the root span; keep it when it is worth looking at.
+            keep = slow or failed
+        if not keep:
+            return
+
+        trace_dict = trace.to_dict()
+        with self._lock:
+            self._buffer.append(trace_dict)
+        if self.exporter is not None:
+            try:
+                self.exporter.export(trace_dict)
+            except Exception as exc:
+                logger.warning("Trace export failed: %s", exc)
+
+    def recent(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._buffer)
+
+    def slowest(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return the slowest traces currently held in the ring buffer."""
+        return sorted(self.recent(), key=lambda t: t["duration_ms"], reverse=True)[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buffer.clear()
+
+
+# ------------------------
+# LangChain integration
+# ------------------------
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except Exception:
+    BaseCallbackHandler = object
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler that mirrors chain, prompt, retriever and LLM runs as spans.
+    Spans are opened under whatever span is current when the runnable is invoked.
+    """
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self._spans: Dict[Any, Any] = {}
+
+    def _start(self, run_id, parent_run_id, name: str, **attributes: Any) -> None:
+        active = _active.get()
+        if active is None:
+            return
+        trace, current = active
+        parent = self._spans.get(parent_run_id)
+        span = Span(name, (parent or current).span_id, attributes)
+        trace.spans.append(span)
+        self._spans[run_id] = span
+
+    def _end(self, run_id, error: Optional[BaseException] = None) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        span.end = time.perf_counter()
+        if error is not None:
+            span.error = repr(error)
+
+    @staticmethod
+    def _run_name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any], default: str) -> str:
+        if kwargs.get("name"):
+            return kwargs["name"]
+        if serialized:
+            if serialized.get("name"):
+                return serialized["name"]
+            ids = serialized.get("id") or []
+            if ids:
+                return ids[-1]
+        return default
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        name = self._run_name(serialized, kwargs, "chain")
+        kind = "prompt" if "Prompt" in name else "chain"
+        self._start(run_id, parent_run_id, f"{kind}:{name}")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, f"llm:{self._run_name(serialized, kwargs, 'llm')}",
+                    prompt_chars=sum(len(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, f"llm:{self._run_name(serialized, kwargs, 'chat_model')}")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._spans.get(run_id)
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage")
+        if span is not None and usage:
+            span.set_attribute("token_usage", usage)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, f"retrieval:{self._run_name(serialized, kwargs, 'retriever')}")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.set_attribute("documents", len(documents))
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+tracer = Tracer.from_env()
+
+
+def langchain_config() -> Dict[str, Any]:
+    """
+    Runnable config that records LangChain sub-runs as spans.
+    Returns an empty config when the current request is not sampled, so no handler is attached.
+    """
+    if _active.get() is None or BaseCallbackHandler is object:
+        return {}
+    return {"callbacks": [TracingCallbackHandler(tracer)]}
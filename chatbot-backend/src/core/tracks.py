@@ -0,0 +1,59 @@
+"""
+Learning tracks offered by DirectEd and keyword-based detection of the track a request belongs to.
+
+The track names are the "track" field of the fine-tuning data; finetuning/generate_dataset.py and
+run_finetuning.py import TRACKS and track_slug from here. Detect a track from the user's request, not
+from a whole prompt, whose retrieved material may quote another track.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+TRACKS: List[str] = ["Gen AI", "MERN", "UI/UX"]
+# Chunks that belong to no track (ingestion.py); they are searched along with every track.
+GENERAL_TRACK = "General"
+
+TRACK_KEYWORDS: Dict[str, List[str]] = {
+    "Gen AI": [
+        "gen ai", "generative ai", "llm", "large language model", "prompt", "rag", "retrieval",
+        "transformer", "attention", "embedding", "vector", "fine-tun", "lora", "token", "gpt", "langchain",
+    ],
+    "MERN": [
+        "mern", "react", "usestate", "hook", "component", "jsx", "mongodb", "mongoose", "express",
+        "middleware", "node", "event loop", "rest api", "endpoint", "jwt", "javascript",
+    ],
+    "UI/UX": [
+        "ui/ux", "ux", "user interface", "user experience", "wcag", "accessibility", "usability",
+        "prototype", "wireframe", "figma", "visual hierarchy", "user research", "persona", "design system",
+    ],
+}
+
+_PATTERNS = {
+    track: [re.compile(r"\b" + re.escape(keyword)) for keyword in keywords]
+    for track, keywords in TRACK_KEYWORDS.items()
+}
+
+
+def track_scores(text: str) -> Dict[str, Tuple[int, int]]:
+    """(distinct keywords found, keyword occurrences) of each track in `text`."""
+    lowered = (text or "").lower()
+    scores = {}
+    for track, patterns in _PATTERNS.items():
+        counts = [len(p.findall(lowered)) for p in patterns]
+        scores[track] = (sum(1 for c in counts if c), sum(counts))
+    return scores
+
+
+def detect_track(text: str) -> Optional[str]:
+    """Track whose keywords occur most often in `text`, or None when no keyword matches."""
+    lowered = (text or "").lower()
+    scores = {track: sum(1 for p in patterns if p.search(lowered)) for track, patterns in _PATTERNS.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else None
+
+
+def track_slug(track: str) -> str:
+    """Filesystem-safe name of a track: "Gen AI" -> "gen_ai", "UI/UX" -> "ui_ux"."""
+    return re.sub(r"[^a-z0-9]+", "_", track.lower()).strip("_")
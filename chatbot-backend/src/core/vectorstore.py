@@ -0,0 +1,296 @@
+"""
+Connection layer for the knowledge vector store.
+
+Collections are opened through a VectorStoreConnection, which decides where Chroma runs:
+    embedded  PersistentClient on db/ inside this process (default, for development)
+    http      a Chroma server shared by every process, e.g. `chroma run --path db --port 8001`
+    mmap      int8 HNSW indexes under db/ann/, memory-mapped and shared by every process
+              (ann_index.py, which lists its own settings)
+
+Either way `collection(name)` returns a LangChain vector store. Its async searches
+(asimilarity_search, asimilarity_search_with_score) are bounded per process by
+DIRECTED_VECTOR_POOL concurrent queries and by a timeout. Backends without an async client
+run their searches in a dedicated pool of DIRECTED_VECTOR_POOL threads, so searches that time
+out and keep running cannot pile up threads. In http mode they go through one pooled chromadb
+AsyncHttpClient per event loop instead. Other backends can be added with register_backend().
+
+    DIRECTED_VECTOR_STORE       embedded | http (default embedded)
+    CHROMA_HOST / CHROMA_PORT   Chroma server address (default localhost:8001)
+    CHROMA_SSL                  "true" to use https
+    DIRECTED_VECTOR_TIMEOUT_S   timeout of one async query in seconds (default 10)
+    DIRECTED_VECTOR_POOL        concurrent async queries per process (default 16)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("DirectEd")
+
+
+class PooledStore:
+    """
+    A LangChain vector store whose async searches go through the connection's concurrency
+    limit and timeout. Everything else (similarity_search, as_retriever, ...) is the store's own.
+    """
+
+    def __init__(self, store: Any, connection: "VectorStoreConnection", name: str):
+        self.store = store
+        self.connection = connection
+        self.name = name
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self.store, attribute)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4,
+                                            filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Any, float]]:
+        return await self.connection.asearch(self, query, k, filter)
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, filter)]
+
+    async def asimilarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                                      filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Any, float]]:
+        """Search with a query already embedded, e.g. one of a batch embedded in a single call."""
+        return await self.connection.asearch(self, None, k, filter, embedding=embedding)
+
+
+class VectorStoreConnection(ABC):
+    mode = "base"
+
+    def __init__(self, embeddings: Any, persist_directory: Path, timeout: float = 10.0, max_concurrency: int = 16):
+        self.embeddings = embeddings
+        self.persist_directory = Path(persist_directory)
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Created on first use, so a preloaded gunicorn master never starts threads before forking.
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # Implemented by each backend
+    @abstractmethod
+    def _open(self, name: str) -> Any:
+        ...
+
+    @abstractmethod
+    def _create(self, name: str, documents: List) -> Any:
+        ...
+
+    @abstractmethod
+    def delete_collection(self, name: str) -> None:
+        ...
+
+    def _in_thread(self, function: Callable, *args: Any) -> asyncio.Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="vector-search")
+        return asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(function, *args))
+
+    async def _asearch(self, store: PooledStore, query: Optional[str], k: int, filter: Optional[Dict[str, Any]],
+                       embedding: Optional[List[float]] = None) -> List[Tuple[Any, float]]:
+        # Backends without an async client run the synchronous search in the connection's threads.
+        if embedding is not None:
+            # Despite the name, LangChain's Chroma returns distances here, like similarity_search_with_score.
+            return await self._in_thread(store.store.similarity_search_by_vector_with_relevance_scores,
+                                         embedding, k, filter)
+        return await self._in_thread(store.store.similarity_search_with_score, query, k, filter)
+
+    def reset(self) -> None:
+        """Drops clients, threads and per-loop state, e.g. in a freshly forked server worker."""
+        self._loop = None
+        self._semaphore = None
+        # A forked child has none of the parent's threads; the executor object is simply dropped.
+        self._executor = None
+
+    # Common API
+    def collection(self, name: str) -> PooledStore:
+        return PooledStore(self._open(name), self, name)
+
+    def create_collection(self, name: str, documents: List) -> PooledStore:
+        """Embeds `documents` into a new collection `name`."""
+        return PooledStore(self._create(name, documents), self, name)
+
+    def _loop_state(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Semaphores and async clients belong to one event loop.
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._on_new_loop()
+
+    def _on_new_loop(self) -> None:
+        pass
+
+    async def asearch(self, store: PooledStore, query: Optional[str], k: int = 4,
+                      filter: Optional[Dict[str, Any]] = None,
+                      embedding: Optional[List[float]] = None) -> List[Tuple[Any, float]]:
+        self._loop_state()
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(self._asearch(store, query, k, filter, embedding), self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Vector search in %s timed out after %.1fs (%s mode)", store.name, self.timeout, self.mode)
+                raise TimeoutError(f"Vector search timed out after {self.timeout}s") from None
+
+
+class EmbeddedChroma(VectorStoreConnection):
+    """Chroma PersistentClient in this process; async queries run in worker threads."""
+
+    mode = "embedded"
+
+    def _open(self, name: str) -> Any:
+        from langchain_chroma import Chroma
+
+        return Chroma(collection_name=name, embedding_function=self.embeddings,
+                      persist_directory=str(self.persist_directory))
+
+    def _create(self, name: str, documents: List) -> Any:
+        from langchain_chroma import Chroma
+
+        return Chroma.from_documents(documents=documents, embedding=self.embeddings, collection_name=name,
+                                     persist_directory=str(self.persist_directory))
+
+    def delete_collection(self, name: str) -> None:
+        from langchain_chroma import Chroma
+
+        Chroma(collection_name=name, persist_directory=str(self.persist_directory)).delete_collection()
+
+    def reset(self) -> None:
+        # PersistentClient systems are cached per path; their SQLite handles must not cross a fork.
+        from chromadb.api.client import SharedSystemClient
+
+        SharedSystemClient.clear_system_cache()
+        super().reset()
+
+
+class ChromaServer(VectorStoreConnection):
+    """A Chroma server over HTTP: a sync HttpClient plus a pooled AsyncHttpClient per event loop."""
+
+    mode = "http"
+
+    def __init__(self, embeddings: Any, persist_directory: Path, timeout: float = 10.0, max_concurrency: int = 16,
+                 host: str = "localhost", port: int = 8001, ssl: bool = False):
+        super().__init__(embeddings, persist_directory, timeout, max_concurrency)
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self._client = None
+        self._async_client = None
+        self._async_collections: Dict[str, Any] = {}
+
+    def _settings(self):
+        from chromadb.config import Settings
+
+        return Settings(anonymized_telemetry=False)
+
+    def client(self):
+        if self._client is None:
+            import chromadb
+
+            self._client = chromadb.HttpClient(host=self.host, port=self.port, ssl=self.ssl, settings=self._settings())
+        return self._client
+
+    def _open(self, name: str) -> Any:
+        from langchain_chroma import Chroma
+
+        return Chroma(client=self.client(), collection_name=name, embedding_function=self.embeddings)
+
+    def _create(self, name: str, documents: List) -> Any:
+        from langchain_chroma import Chroma
+
+        return Chroma.from_documents(documents=documents, embedding=self.embeddings, collection_name=name,
+                                     client=self.client())
+
+    def delete_collection(self, name: str) -> None:
+        try:
+            self.client().delete_collection(name)
+        except Exception as exc:  # missing collections raise different errors across chromadb versions
+            logger.info("Collection %s not deleted: %s", name, exc)
+
+    def _on_new_loop(self) -> None:
+        self._async_client = None
+        self._async_collections = {}
+
+    async def _asearch(self, store, query, k, filter, embedding=None):
+        from langchain_core.documents import Document
+
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(query)
+        if self._async_client is None:
+            import chromadb
+
+            self._async_client = await chromadb.AsyncHttpClient(host=self.host, port=self.port, ssl=self.ssl,
+                                                                settings=self._settings())
+        collection = self._async_collections.get(store.name)
+        if collection is None:
+            collection = self._async_collections[store.name] = await self._async_client.get_collection(store.name)
+        result = await collection.query(query_embeddings=[embedding], n_results=k, where=filter or None,
+                                        include=["documents", "metadatas", "distances"])
+        return [
+            (Document(page_content=text or "", metadata=metadata or {}), distance)
+            for text, metadata, distance in zip(result["documents"][0], result["metadatas"][0], result["distances"][0])
+        ]
+
+    def reset(self) -> None:
+        self._client = None
+        super().reset()
+        self._on_new_loop()
+
+
+BACKENDS: Dict[str, Callable[..., VectorStoreConnection]] = {}
+
+
+def register_backend(mode: str, factory: Callable[..., VectorStoreConnection]) -> None:
+    """`factory(embeddings, persist_directory, timeout=, max_concurrency=)` returns a connection."""
+    BACKENDS[mode] = factory
+
+
+register_backend("embedded", EmbeddedChroma)
+register_backend(
+    "http",
+    lambda embeddings, persist_directory, **options: ChromaServer(
+        embeddings, persist_directory,
+        host=os.getenv("CHROMA_HOST", "localhost"),
+        port=int(os.getenv("CHROMA_PORT", "8001")),
+        ssl=os.getenv("CHROMA_SSL", "false").lower() == "true",
+        **options,
+    ),
+)
+
+
+def _mmap_backend(embeddings: Any, persist_directory: Path, **options: Any) -> VectorStoreConnection:
+    from .ann_index import AnnConnection
+
+    return AnnConnection(
+        embeddings, persist_directory,
+        m=int(os.getenv("DIRECTED_ANN_M", "16")),
+        ef=int(os.getenv("DIRECTED_ANN_EF", "64")),
+        rerank=int(os.getenv("DIRECTED_ANN_RERANK", "4")),
+        **options,
+    )
+
+
+register_backend("mmap", _mmap_backend)
+
+
+def connect_vector_store(embeddings: Any, persist_directory: Path,
+                         mode: Optional[str] = None) -> VectorStoreConnection:
+    mode = (mode or os.getenv("DIRECTED_VECTOR_STORE", "embedded")).lower()
+    if mode not in BACKENDS:
+        raise ValueError(f"DIRECTED_VECTOR_STORE must be one of {sorted(BACKENDS)}, got {mode!r}")
+    return BACKENDS[mode](
+        embeddings, persist_directory,
+        timeout=float(os.getenv("DIRECTED_VECTOR_TIMEOUT_S", "10")),
+        max_concurrency=int(os.getenv("DIRECTED_VECTOR_POOL", "16")),
+    )
@@ -0,0 +1,221 @@
+"""
+Async fetcher for the web resources of the knowledge base, with a local page cache.
+
+- One pooled httpx.AsyncClient for all requests, at most `per_host` requests in flight per host.
+- Conditional GETs: the ETag / Last-Modified of the cached copy are sent back, and a
+  304 Not Modified costs no download.
+- Response bodies are stored content-addressed (objects/<sha256>), so a page whose bytes did not
+  change keeps its object, and its parsed text (parsed/<sha256>.json) is reused without parsing.
+
+`load_web_documents(urls)` returns LangChain Documents for ingestion; with `changed_only=True`
+pages that did not change since the last run are skipped entirely.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger("DirectEd")
+
+project_root = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CACHE_DIR = project_root / "data" / "web_cache"
+USER_AGENT = "DirectEd-knowledge-fetcher/1.0"
+
+NEW, CHANGED, UNCHANGED, NOT_MODIFIED, ERROR = "new", "changed", "unchanged", "not_modified", "error"
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: str                 # new | changed | unchanged | not_modified | error
+    sha256: Optional[str] = None
+    content_type: Optional[str] = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return self.status in (NEW, CHANGED)
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class PageCache:
+    """Content-addressed response bodies plus a URL index with the validators of each page."""
+
+    def __init__(self, directory: Path = DEFAULT_CACHE_DIR):
+        self.directory = Path(directory)
+        self.index_path = self.directory / "index.json"
+        self.index: Dict[str, dict] = (
+            json.loads(self.index_path.read_text(encoding="utf-8")) if self.index_path.exists() else {}
+        )
+
+    def object_path(self, sha256: str) -> Path:
+        return self.directory / "objects" / sha256[:2] / sha256
+
+    def parsed_path(self, sha256: str) -> Path:
+        return self.directory / "parsed" / f"{sha256}.json"
+
+    def has(self, url: str) -> bool:
+        """Whether a body of `url` is cached, so that a 304 for it can be served from the cache."""
+        entry = self.index.get(url)
+        return bool(entry) and self.object_path(entry["sha256"]).exists()
+
+    def validators(self, url: str) -> Dict[str, str]:
+        if not self.has(url):
+            return {}
+        entry = self.index[url]
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, body: bytes, headers) -> str:
+        """Stores a 200 response. Returns new, changed or unchanged."""
+        sha256 = hashlib.sha256(body).hexdigest()
+        previous = self.index.get(url)
+        if not self.object_path(sha256).exists():
+            _atomic_write(self.object_path(sha256), body)
+        self.index[url] = {
+            "sha256": sha256,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type"),
+            "fetched_at": time.time(),
+        }
+        if previous is None:
+            return NEW
+        return UNCHANGED if previous["sha256"] == sha256 else CHANGED
+
+    def save(self) -> None:
+        _atomic_write(self.index_path, json.dumps(self.index, indent=2).encode("utf-8"))
+
+
+class WebFetcher:
+    """Fetches many URLs concurrently through one connection pool, politely per host."""
+
+    def __init__(self, cache: PageCache, max_connections: int = 20, per_host: int = 4,
+                 timeout: float = 20.0, retries: int = 2):
+        self.cache = cache
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+
+    async def _get(self, client, url: str, headers: Dict[str, str]):
+        """GET with retries on transport errors; the last one is raised."""
+        import httpx
+
+        for attempt in range(self.retries + 1):
+            try:
+                return await client.get(url, headers=headers)
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def _fetch(self, client, semaphores, url: str) -> FetchResult:
+        import httpx
+
+        start = time.perf_counter()
+        try:
+            async with semaphores[urlparse(url).netloc]:
+                response = await self._get(client, url, self.cache.validators(url))
+                if response.status_code == 304 and not self.cache.has(url):
+                    # A 304 with nothing cached to reuse (sent without validators, or the object
+                    # went missing): a miss, so the page is fetched again in full.
+                    response = await self._get(client, url, {"Cache-Control": "no-cache"})
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError) as exc:
+            # Redirect loops, bad URLs and undecodable bodies fail this URL only, not the whole run.
+            return FetchResult(url, ERROR, error=f"{type(exc).__name__}: {exc}",
+                               elapsed_ms=(time.perf_counter() - start) * 1000)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code == 304 and self.cache.has(url):
+            entry = self.cache.index[url]
+            return FetchResult(url, NOT_MODIFIED, entry["sha256"], entry.get("content_type"), elapsed_ms=elapsed)
+        if response.status_code != 200:
+            return FetchResult(url, ERROR, error=f"HTTP {response.status_code}", elapsed_ms=elapsed)
+        status = self.cache.store(url, response.content, response.headers)
+        entry = self.cache.index[url]
+        return FetchResult(url, status, entry["sha256"], entry["content_type"], elapsed_ms=elapsed)
+
+    async def fetch_all(self, urls: List[str]) -> List[FetchResult]:
+        import httpx
+
+        semaphores = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=True,
+                                     headers={"User-Agent": USER_AGENT}) as client:
+            results = await asyncio.gather(*(self._fetch(client, semaphores, url) for url in urls))
+        self.cache.save()
+        return list(results)
+
+    def fetch(self, urls: List[str]) -> List[FetchResult]:
+        return asyncio.run(self.fetch_all(urls))
+
+
+# ------------------------
+# Parsing
+# ------------------------
+def parse_page(body: bytes, content_type: Optional[str]) -> Dict[str, str]:
+    """Title and visible text of an HTML page (plain text is passed through)."""
+    if content_type and "html" not in content_type:
+        return {"title": "", "text": body.decode("utf-8", errors="replace")}
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(body, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    lines = (line.strip() for line in soup.get_text("\n").splitlines())
+    return {"title": title, "text": "\n".join(line for line in lines if line)}
+
+
+def load_web_documents(urls: List[str], cache_dir: Path = DEFAULT_CACHE_DIR, changed_only: bool = False,
+                       per_host: int = 4) -> List:
+    """
+    Fetches `urls` and returns one Document per page. Parsed text is cached per body hash, so
+    unchanged pages are not parsed again; `changed_only` also leaves them out of the result.
+    """
+    from langchain_core.documents import Document
+
+    cache = PageCache(cache_dir)
+    results = WebFetcher(cache, per_host=per_host).fetch(urls)
+    counts = defaultdict(int)
+    docs = []
+    for result in results:
+        counts[result.status] += 1
+        if result.status == ERROR:
+            logger.warning("Could not fetch %s: %s", result.url, result.error)
+            continue
+        if changed_only and not result.changed:
+            continue
+        parsed_path = cache.parsed_path(result.sha256)
+        if parsed_path.exists():
+            parsed = json.loads(parsed_path.read_text(encoding="utf-8"))
+        else:
+            parsed = parse_page(cache.object_path(result.sha256).read_bytes(), result.content_type)
+            _atomic_write(parsed_path, json.dumps(parsed).encode("utf-8"))
+        docs.append(Document(page_content=parsed["text"], metadata={"source": result.url, "title": parsed["title"]}))
+    logger.info("Web sources: %s", dict(counts))
+    return docs
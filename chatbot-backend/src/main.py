@@ -1,13 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from langserve import add_routes
-from langchain.schema.runnable import RunnableLambda
 from pydantic import BaseModel
 from .core.api.endpoints import router as api_router
-from .core.chatbot import run_educational_assistant
-from .core.components import LearningAnalyzer
+from .core.api.debug import router as debug_router
+from .core.profiling import ProfilingMiddleware, request_profiler
+from .core.jobs import job_queue
+from .core.chatbot import EducationalAssistantRunnable, analyzer
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -23,15 +24,23 @@ LANGSMITH_API_KEY="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"
 LANGSMITH_PROJECT="DirectEd"
 
 
-limiter = Limiter(key_func=get_remote_address, default_limits=["5/minute"])
+# Counters live in each process with the default memory:// storage; with several workers
+# (gunicorn.conf.py) point DIRECTED_RATE_LIMIT_STORAGE at a shared backend such as redis://.
+limiter = Limiter(key_func=get_remote_address,
+                  default_limits=[os.getenv("DIRECTED_RATE_LIMIT", "5/minute")],
+                  storage_uri=os.getenv("DIRECTED_RATE_LIMIT_STORAGE", "memory://"))
 
 
 # Define output schema
 class AssistantOutput(BaseModel):
-    user_type: str
-    content_type: str
-    output: str
-    updated_profile: Dict[str, Any]  
+    user_type: Optional[str] = None
+    content_type: Optional[str] = None
+    # {"text": ...} for tutoring, the quiz itself for quizzes
+    output: Optional[Dict[str, Any]] = None
+    updated_profile: Dict[str, Any] = {}
+    # Set instead of the fields above when the request failed
+    error: Optional[str] = None
+    details: Optional[str] = None
 
 
 class AssistantInput(BaseModel):
@@ -39,14 +48,8 @@ class AssistantInput(BaseModel):
     user_id: str = "anonymous"
     is_instructor: bool = False
 
-educational_chain = RunnableLambda(
-    lambda inp: run_educational_assistant(
-        request=inp['request'],
-        user_id=inp.get("user_id", "0"),
-        analyzer=LearningAnalyzer(),
-        is_instructor=inp.get("is_instructor", False)
-    )
-).with_types(
+# /assistant/batch runs the whole batch together (see EducationalAssistantRunnable).
+educational_chain = EducationalAssistantRunnable(analyzer).with_types(
     input_type=AssistantInput,
     output_type=AssistantOutput
 )
@@ -77,9 +80,22 @@ app.add_middleware(CORSMiddleware,
                    allow_credentials = True,
                    allow_headers = ["*"]
                    )
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
 app.include_router(api_router)
+app.include_router(debug_router)
 add_routes(app, educational_chain, path="/assistant")
 
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+
+
 @app.get("/")
 async def root():
     return {"message": "DirectEd API is running. Visit /docs or /assistant/playground"}
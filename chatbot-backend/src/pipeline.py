@@ -1,7 +1,7 @@
 #  Educational Pipeline using Google Gemini
 from langchain.chains import LLMChain, SequentialChain
 from langchain_google_vertexai import ChatGoogleGenerativeAI
-from langchain.callbacks import LangSmithTracer
+from src.core.tracing import tracer, TracingCallbackHandler
 from src.templates import (
     content_retrieval_prompt,
     adaptive_conversation_prompt,
@@ -14,8 +14,8 @@ TEMPERATURE = 0.2
 
 llm = ChatGoogleGenerativeAI(model=MODEL_NAME, temperature=TEMPERATURE)
 
-# Ensure LANGCHAIN_TRACING_V2 and LANGCHAIN_API_KEY environment variables are set.
-tracer = LangSmithTracer(project_name="DirectEd_Education_Pipeline_Gemini")
+# Spans are recorded locally (see src/core/tracing.py); nothing is sent over the network.
+trace_handler = TracingCallbackHandler(tracer)
 
 # Content Retrieval Chain
 # This chain takes user_question and retrieved_documents and generates the retrieved_content.
@@ -23,7 +23,7 @@ content_retrieval_chain = LLMChain(
     llm=llm,
     prompt=content_retrieval_prompt,
     output_key="retrieved_content",
-    callbacks=[tracer]
+    callbacks=[trace_handler]
 )
 
 #  Adaptive Conversation Chain
@@ -32,7 +32,7 @@ adaptive_conversation_chain = LLMChain(
     llm=llm,
     prompt=adaptive_conversation_prompt,
     output_key="conversation_response",
-    callbacks=[tracer]
+    callbacks=[trace_handler]
 )
 
 # Content Generation Chain
@@ -41,7 +41,7 @@ content_generation_chain = LLMChain(
     llm=llm,
     prompt=content_generation_prompt,
     output_key="generated_content",
-    callbacks=[tracer]
+    callbacks=[trace_handler]
 )
 
 # Learning Analysis Chain
@@ -50,7 +50,7 @@ learning_analysis_chain = LLMChain(
     llm=llm,
     prompt=learning_analysis_prompt,
     output_key="learning_analysis",
-    callbacks=[tracer]
+    callbacks=[trace_handler]
 )
 
 # SEQUENTIAL PIPELINE
@@ -84,13 +84,14 @@ if __name__ == "__main__":
     """
     conversation_history = "The student has previously asked about basic design principles and has a solid grasp of visual hierarchy."
 
-    outputs = education_pipeline({
-        "user_question": user_question,
-        "topic": topic,
-        "difficulty_level": difficulty_level,
-        "retrieved_documents": retrieved_documents,
-        "conversation_history": conversation_history
-    })
+    with tracer.trace("education_pipeline"):
+        outputs = education_pipeline({
+            "user_question": user_question,
+            "topic": topic,
+            "difficulty_level": difficulty_level,
+            "retrieved_documents": retrieved_documents,
+            "conversation_history": conversation_history
+        })
 
     # Display outputs
     print("\n--- Retrieved Content ---")
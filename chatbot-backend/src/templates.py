@@ -101,4 +101,11 @@ Output format:
 learning_analysis_prompt = PromptTemplate(
     input_variables=["conversation_history", "generated_content"],
     template=learning_analysis_template
-)
\ No newline at end of file
+)
+
+PROMPT_TEMPLATES = (
+    content_retrieval_prompt,
+    adaptive_conversation_prompt,
+    content_generation_prompt,
+    learning_analysis_prompt,
+)
@@ -0,0 +1,28 @@
+from fastapi.testclient import TestClient
+
+from src.core.app import app, scheduler
+
+
+def test_correct_answers_unlock_dependent_topics():
+    client = TestClient(app)
+    served = []
+    for _ in range(12):
+        lesson = client.post("/api/assistant/adaptive_learning", params={"user_id": "adaptive-test"})
+        assert lesson.status_code == 200
+        topic = lesson.json()["topic"]
+        served.append(topic)
+        if scheduler.graph.prerequisites[topic]:
+            break
+        answer = client.post("/api/assistant/answer",
+                             json={"user_id": "adaptive-test", "topic": topic, "correct": True})
+        assert answer.status_code == 200
+        assert answer.json()["mastery"] >= 0.5
+
+    assert scheduler.graph.prerequisites[served[-1]], served
+    assert all(p in served for p in scheduler.graph.prerequisites[served[-1]])
+
+
+def test_answers_on_unknown_topics_are_rejected():
+    response = TestClient(app).post("/api/assistant/answer",
+                                    json={"user_id": "adaptive-test", "topic": "Knitting", "correct": True})
+    assert response.status_code == 404
@@ -0,0 +1,17 @@
+from fastapi.testclient import TestClient
+
+from src.main import app
+
+
+def test_batch_route_returns_one_result_per_input():
+    client = TestClient(app)
+    response = client.post("/assistant/batch", json={"inputs": [
+        {"request": "explain embeddings to me", "user_id": "batch-test"},
+        {"request": "quiz me on embeddings", "user_id": "batch-test"},
+    ]})
+
+    assert response.status_code == 200
+    tutoring, quiz = response.json()["output"]
+    assert tutoring["content_type"] == "TUTORING" and tutoring["output"]["text"]
+    assert quiz["content_type"] == "QUIZ" and quiz["output"]["questions"]
+    assert tutoring["error"] is None and quiz["error"] is None
@@ -0,0 +1,41 @@
+from src.core.curriculum import DAY, EXPOSURE_DELAY, CurriculumGraph, SpacedRepetitionScheduler
+
+
+def _scheduler():
+    graph = CurriculumGraph.from_entries([
+        ("Tokenization", "Gen AI", []),
+        ("Embeddings", "Gen AI", ["Tokenization"]),
+        ("User Research", "UI/UX", []),
+    ])
+    return SpacedRepetitionScheduler(graph)
+
+
+def test_repeated_adaptive_requests_keep_serving_lessons():
+    scheduler = _scheduler()
+    served = []
+    for step in range(6):
+        now = 100.0 + step
+        topic = scheduler.next_lesson("u", now=now)
+        assert topic is not None
+        served.append(topic)
+        # The adaptive route only logs that the lesson was requested.
+        scheduler.record("u", f"explain {topic} to me in detail.", "tutoring_requested", now=now)
+
+    assert served[:2] == ["Tokenization", "User Research"]
+    # Nothing is due after the roots were explained: the topic due first comes back early.
+    assert served[2] == "Tokenization"
+    assert scheduler.next_topic("u", now=106.0) is None
+    assert not scheduler.finished("u")
+    assert scheduler.upcoming_topic("u")[1] > 106.0
+
+
+def test_next_lesson_is_none_only_once_everything_is_mastered():
+    scheduler = _scheduler()
+    now = 100.0
+    for topic in ("Tokenization", "Embeddings", "User Research"):
+        assert scheduler.next_lesson("u", now=now) == topic
+        scheduler.record("u", topic, "correct", now=now)
+    assert scheduler.finished("u")
+    assert scheduler.next_lesson("u", now=now + EXPOSURE_DELAY) is None
+    # Mastered topics still come back for review once they are due.
+    assert scheduler.next_lesson("u", now=now + DAY) == "Tokenization"
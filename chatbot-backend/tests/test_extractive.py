@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from src.core.services.extractive import ExtractiveGenerator, _SUBORDINATORS
+
+COURSE = Path(__file__).resolve().parent.parent / "knowledge" / "the-basics-of-ux-design.txt"
+
+
+def _generator():
+    return ExtractiveGenerator([COURSE.read_text(encoding="utf-8", errors="ignore")], seed=0)
+
+
+def test_definitions_of_a_course_file_are_noun_phrases():
+    generator = _generator()
+    terms = [definition.term for definition in generator.definitions]
+
+    assert {"Design thinking", "User personas", "Findable"} <= set(terms)
+    for term in terms:
+        assert term.split()[0].lower() not in _SUBORDINATORS
+    fronts = [card.front for card in generator.flashcards(20)]
+    assert "What is Whether you?" not in fronts
+    assert "What is User Personas User personas?" not in fronts
+
+
+def test_titles_and_footers_of_a_course_file_are_not_sentences():
+    texts = [sentence.text for sentence in _generator().sentences]
+
+    assert texts
+    assert "What is Design Thinking and Why Is It So Popular?" not in texts
+    assert not any(text.startswith("Mads Soegaard Founder") for text in texts)
+    assert not any("INTERACTION-DESIGN.ORG" in text for text in texts)
+    assert "In general, user experience is simply how people feel when they use a product or service." in texts
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+from src.core.ingestion import COLLECTIONS_MANIFEST, build_collections, knowledge_path, load_knowledge, tag_documents
+
+
+def test_bundled_files_are_tagged_with_their_track():
+    tracks = {doc.metadata["source"]: doc.metadata["track"] for doc in tag_documents(load_knowledge(knowledge_path))}
+
+    assert tracks["the-basics-of-ux-design.txt"] == "UI/UX"
+    assert tracks["UX_Design_for_Startups.txt"] == "UI/UX"
+    assert tracks["09-UX.txt"] == "UI/UX"
+    assert tracks["big-book-generative-ai-databricks.pdf"] == "Gen AI"
+    assert tracks["LangChain_From_0_To_1_public_1_PpuSgEN.pdf"] == "Gen AI"
+    # One "user interface" in a git cheat sheet, or "endpoint" in a FastAPI chapter, makes no track.
+    assert tracks["git-cheat-sheet-education_2.pdf"] == "General"
+    assert tracks["chapter1.pdf"] == "General"
+
+
+class _Connection:
+    """Collections kept in a dict; creating `fail_on` raises, like an embedding API error."""
+
+    def __init__(self, fail_on=None):
+        self.collections = {}
+        self.fail_on = fail_on
+
+    def create_collection(self, name, documents):
+        if name.startswith(self.fail_on or "\0"):
+            raise RuntimeError("embedding API unavailable")
+        self.collections[name] = list(documents)
+        return name
+
+    def delete_collection(self, name):
+        self.collections.pop(name, None)
+
+
+def _chunks():
+    return [Document(page_content=f"chunk {track}", metadata={"track": track}) for track in ("Gen AI", "UI/UX")]
+
+
+def test_a_failed_rebuild_keeps_the_previous_collections(tmp_path):
+    connection = _Connection()
+    build_collections(_chunks(), None, tmp_path, connection=connection)
+    manifest = json.loads((tmp_path / COLLECTIONS_MANIFEST).read_text())
+    names = {entry["name"] for entry in manifest["collections"].values()}
+    assert names == set(connection.collections)
+
+    connection.fail_on = "directed_ui_ux"
+    with pytest.raises(RuntimeError):
+        build_collections(_chunks(), None, tmp_path, connection=connection)
+    assert json.loads((tmp_path / COLLECTIONS_MANIFEST).read_text()) == manifest
+    assert names <= set(connection.collections)
+
+    connection.fail_on = None
+    build_collections(_chunks(), None, tmp_path, connection=connection)
+    rebuilt = json.loads((tmp_path / COLLECTIONS_MANIFEST).read_text())
+    assert set(connection.collections) == {entry["name"] for entry in rebuilt["collections"].values()}
+    assert not names & set(connection.collections)
@@ -0,0 +1,29 @@
+import threading
+import time
+
+from src.core.prefetch import LessonPrefetcher
+
+
+def test_a_click_during_a_prefetch_queues_the_next_lesson():
+    lesson = {"u": 0}
+    started, release = threading.Event(), threading.Event()
+
+    def generate(request):
+        started.set()
+        release.wait(5)
+        return request
+
+    prefetcher = LessonPrefetcher(lambda user_id: f"lesson {lesson[user_id]}", generate,
+                                  lambda user_id: lesson[user_id], workers=1, enabled=True)
+    prefetcher.schedule("u")
+    assert started.wait(5)
+    # The click arrives while lesson 0 is generating; the adaptive route then schedules lesson 1.
+    lesson["u"] = 1
+    assert prefetcher.schedule("u")
+    release.set()
+
+    deadline = time.monotonic() + 5
+    while prefetcher.to_dict()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert prefetcher.take("u", "lesson 1") == "lesson 1"
+    assert prefetcher.to_dict()["requeued"] == 1
@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+from src.core.components import ANSWER_TEMPLATE, PROMPT_TEMPLATES, QUIZ_TEMPLATE
+from src.core.local_llm import INSTRUCTION_TEMPLATE, LocalLLM, instruction_prefix
+from src.core.prefix_cache import PrefixKVCache
+
+
+def _local_llm(cache):
+    return LocalLLM(SimpleNamespace(engine=SimpleNamespace(prefix_cache=cache)))
+
+
+def test_registered_prefixes_match_formatted_prompts():
+    cache = PrefixKVCache()
+    assert _local_llm(cache).register_templates(*PROMPT_TEMPLATES) == len(PROMPT_TEMPLATES)
+
+    prompts = {
+        ANSWER_TEMPLATE: ANSWER_TEMPLATE.format(question="What does a retriever do?", content="Notes."),
+        QUIZ_TEMPLATE: QUIZ_TEMPLATE.format(topic="RAG", level="beginner", num_questions=3, content="Notes."),
+    }
+    for template, text in prompts.items():
+        prompt = INSTRUCTION_TEMPLATE.format(prompt=text)
+        assert cache.match(prompt) == instruction_prefix(template)
+        assert cache.match_all([prompt, prompt]) == instruction_prefix(template)
+
+
+def test_instruction_prefix_excludes_the_response_marker():
+    prefix = instruction_prefix(ANSWER_TEMPLATE)
+    assert prefix.startswith("### Instruction:\n")
+    assert "### Response:" not in prefix
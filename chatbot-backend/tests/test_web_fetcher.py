@@ -0,0 +1,29 @@
+import asyncio
+from collections import defaultdict
+
+import httpx
+
+from src.core.web_fetcher import ERROR, NEW, PageCache, WebFetcher
+
+
+def _handler(request):
+    if request.url.path == "/loop":
+        return httpx.Response(302, headers={"Location": "/loop"})
+    if request.url.path == "/gzip":
+        return httpx.Response(200, headers={"Content-Encoding": "gzip"}, content=b"not gzip")
+    return httpx.Response(200, headers={"Content-Type": "text/html"}, content=b"<p>ok</p>")
+
+
+def test_a_failing_url_is_reported_without_failing_the_others(tmp_path):
+    fetcher = WebFetcher(PageCache(tmp_path), retries=0)
+    urls = ["http://a.test/loop", "http://a.test/gzip", "http://[bad/page", "http://a.test/ok"]
+
+    async def fetch():
+        semaphores = defaultdict(lambda: asyncio.Semaphore(fetcher.per_host))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(_handler), follow_redirects=True) as client:
+            return await asyncio.gather(*(fetcher._fetch(client, semaphores, url) for url in urls))
+
+    results = asyncio.run(fetch())
+    assert [r.status for r in results] == [ERROR, ERROR, ERROR, NEW]
+    assert results[0].error.startswith("TooManyRedirects")
+    assert results[1].error.startswith("DecodingError")